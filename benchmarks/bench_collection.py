@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: memory used by a list of Movie instances vs a MovieCollection.
+
+Builds both containers from the same generated movie arguments (creating
+fresh strings for every movie, as parsing a config file does), then
+reports the memory each one retains and its peak memory while being
+built (traced by tracemalloc), and how long it takes to build it and to
+render every tile (timed separately, without tracing).
+
+Usage:
+  python -m benchmarks.bench_collection [<movie_count>]
+
+Run from the top level of the repo.  Requires Python 3 (for tracemalloc).
+"""
+
+from __future__ import print_function, unicode_literals
+import gc
+import sys
+import time
+import tracemalloc
+
+from fresh_tomatillos.media import Movie, MovieCollection
+from fresh_tomatillos.render import MOVIE_TILE_PATH, TileTemplate, _read_file
+
+
+def generate_args(count):
+    """Yield Movie arguments, built from new string objects each time."""
+    for i in range(count):
+        yield ('Movie number {0}'.format(i),
+               'A summary of the plot of movie number {0}, which is about'
+               ' as long as a typical one.'.format(i),
+               'https://upload.wikimedia.org/wikipedia/en/{0}/{0}{1}/'
+               'Poster_{2}.jpg'.format(i % 10, i % 7, i),
+               'abcdefg{0:04d}'.format(i % 10000))
+
+
+def measure_memory(build):
+    """Return the memory retained by the result of `build()`, and its peak."""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return current, peak
+
+
+def measure_time(build, template):
+    """Return the seconds taken to build movies, and to render them all."""
+    gc.collect()
+    started = time.perf_counter()
+    movies = build()
+    built = time.perf_counter()
+    for movie in movies:
+        template.render(movie)
+    return built - started, time.perf_counter() - built
+
+
+def main(argv):
+    count = int(argv[0]) if argv else 1000000
+    template = TileTemplate(_read_file(MOVIE_TILE_PATH))
+
+    print('Storing {0:,} movies:'.format(count))
+    print('  {0:16} {1:>12} {2:>12} {3:>9} {4:>12}'.format(
+        '', 'retained', 'peak', 'build', 'render'))
+
+    for name, build in (
+            ('list[Movie]', lambda: [Movie(*args)
+                                     for args in generate_args(count)]),
+            ('MovieCollection', lambda: MovieCollection(
+                generate_args(count)))):
+        current, peak = measure_memory(build)
+        seconds, render_seconds = measure_time(build, template)
+
+        print('  {0:16} {1:9.1f} MiB {2:9.1f} MiB {3:8.2f}s {4:11.2f}s'
+              .format(name, current / 2.0 ** 20, peak / 2.0 ** 20, seconds,
+                      render_seconds))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: config file parsing.
+
+Times `get_config()` with `RawConfigParser` against the single-pass
+`FastConfig` reader, both followed by key validation, on a generated config
+file of roughly the requested number of lines.
+
+Usage:
+  python -m benchmarks.bench_config [<line_count>]
+
+Run from the top level of the repo.
+"""
+
+from __future__ import print_function, unicode_literals
+import io
+import os
+import sys
+import tempfile
+import timeit
+
+from fresh_tomatillos.get_config import get_config
+
+
+VALID_KEYS = ('summary', 'poster', 'youtube')
+
+SECTION_TEMPLATE = '''[Movie {0}]
+# A comment line
+summary: A summary of the plot of movie number {0}.
+poster: https://example.com/posters/{0}.jpg
+youtube: https://www.youtube.com/watch?v=abcdefg{1:04d}
+
+'''
+LINES_PER_SECTION = SECTION_TEMPLATE.count('\n')
+
+
+def write_config(path, line_count):
+    """Write a config file with approximately `line_count` lines."""
+    with io.open(path, 'w', encoding='utf-8') as config_file:
+        for i in range(line_count // LINES_PER_SECTION):
+            config_file.write(SECTION_TEMPLATE.format(i, i % 10000))
+
+
+def best_time(function, repeat=3):
+    """Return the fastest of `repeat` runs of `function`, in seconds."""
+    return min(timeit.repeat(function, number=1, repeat=repeat))
+
+
+def main(argv):
+    line_count = int(argv[0]) if argv else 1000000
+    handle, path = tempfile.mkstemp(suffix='.cfg')
+    os.close(handle)
+
+    try:
+        write_config(path, line_count)
+
+        standard = get_config(path, VALID_KEYS)
+        fast = get_config(path, VALID_KEYS, fast=True)
+        assert standard.sections() == fast.sections()
+
+        before = best_time(lambda: get_config(path, VALID_KEYS))
+        after = best_time(lambda: get_config(path, VALID_KEYS, fast=True))
+    finally:
+        os.remove(path)
+
+    print('Parsing {0} lines ({1} movies):'.format(
+        line_count, len(fast.sections())))
+    print('  RawConfigParser:  {0:8.3f} s'.format(before))
+    print('  FastConfig:       {0:8.3f} s'.format(after))
+    print('  Speedup:          {0:8.2f}x'.format(before / after))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: poster mirroring against a local stand-in image server.
+
+Serves generated "posters" from a local HTTP server which adds a fixed
+delay to every response, standing in for a remote origin server.  Times a
+cold mirror (every poster downloaded) and a warm mirror (every poster
+revalidated with a conditional request) for one worker and for the
+default pool of workers.
+
+Usage:
+  python -m benchmarks.bench_mirror [<poster_count> [<latency_ms>]]
+
+Run from the top level of the repo.
+"""
+
+from __future__ import print_function, unicode_literals
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+from fresh_tomatillos.posters import DEFAULT_WORKERS, mirror_urls
+from fresh_tomatillos.serve import (
+    ArtifactRequestHandler, ArtifactServer, ArtifactStore)
+
+try:
+    _timer = time.perf_counter  # Python 3
+except AttributeError:
+    _timer = time.time  # Python 2
+
+
+def make_server(image_dir, latency):
+    """Return a stand-in server for `image_dir`, delaying every response."""
+    class SlowRequestHandler(ArtifactRequestHandler):
+        store = ArtifactStore(image_dir, 'index.html')
+
+        def do_GET(self):
+            time.sleep(latency)
+            ArtifactRequestHandler.do_GET(self)
+
+    return ArtifactServer(('127.0.0.1', 0), SlowRequestHandler)
+
+
+def main(argv):
+    count = int(argv[0]) if argv else 200
+    latency = (float(argv[1]) if len(argv) > 1 else 20) / 1000
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        image_dir = os.path.join(temp_dir, 'origin')
+        os.mkdir(image_dir)
+        for i in range(count):
+            with open(os.path.join(image_dir, '{0}.jpg'.format(i)),
+                      'wb') as image_file:
+                image_file.write(os.urandom(50000))
+
+        server = make_server(image_dir, latency)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+        base_url = 'http://127.0.0.1:{0}/'.format(server.server_address[1])
+        urls = [base_url + '{0}.jpg'.format(i) for i in range(count)]
+
+        print('Mirroring {0} posters with {1:g} ms of server latency:'.format(
+            count, latency * 1000))
+        for workers in (1, DEFAULT_WORKERS):
+            store_dir = os.path.join(temp_dir, 'store-{0}'.format(workers))
+            for run in ('cold', 'warm'):
+                started = _timer()
+                result = mirror_urls(urls, store_dir, workers)
+                seconds = _timer() - started
+                assert not result.errors, result.errors
+                print('  {0} worker(s), {1}: {2:8.3f}s  ({3} downloaded,'
+                      ' {4} unchanged)'.format(
+                          workers, run, seconds, result.downloaded,
+                          result.not_modified))
+
+        server.shutdown()
+        server.server_close()
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
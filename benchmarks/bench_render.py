@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: movie tile rendering throughput.
+
+Compares rendering tiles by parsing the `movie_tile.html` format string for
+every movie (the original approach) with the compiled `TileTemplate`.
+
+Usage:
+  python -m benchmarks.bench_render [<movie_count>]
+
+Run from the top level of the repo.
+"""
+
+from __future__ import print_function, unicode_literals
+import sys
+import timeit
+
+from fresh_tomatillos.media import Movie
+from fresh_tomatillos.render import MOVIE_TILE_PATH, TileTemplate, _read_file
+
+
+def make_movies(count):
+    """Return a list of `count` distinct Movie instances."""
+    return [Movie('Movie {0}'.format(i),
+                  'A summary of the plot of movie number {0}.'.format(i),
+                  'https://example.com/posters/{0}.jpg'.format(i),
+                  'abcdefg{0:04d}'.format(i % 10000))
+            for i in range(count)]
+
+
+def best_time(function, repeat=5):
+    """Return the fastest of `repeat` runs of `function`, in seconds."""
+    return min(timeit.repeat(function, number=1, repeat=repeat))
+
+
+def main(argv):
+    count = int(argv[0]) if argv else 100000
+    movies = make_movies(count)
+    source = _read_file(MOVIE_TILE_PATH)
+    template = TileTemplate(source)
+
+    # Both approaches must produce identical output
+    assert all(source.format(movie=movie) == template.render(movie)
+               for movie in movies[:100])
+
+    before = best_time(lambda: [source.format(movie=movie)
+                                for movie in movies])
+    after = best_time(lambda: [template.render(movie) for movie in movies])
+
+    print('Rendering {0} tiles:'.format(count))
+    print('  str.format():   {0:12,.0f} tiles/s'.format(count / before))
+    print('  TileTemplate:   {0:12,.0f} tiles/s'.format(count / after))
+    print('  Speedup:        {0:12.2f}x'.format(before / after))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
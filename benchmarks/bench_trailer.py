@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: time to the first frame of a trailer, with and without a facade.
+
+Renders the sample page twice: as it is by default, which embeds YouTube's
+player as the trailer modal opens, and with `--trailer-facade`, which shows
+a thumbnail until the play button is pressed.  Serves both from a
+background thread on a free localhost port, then plays several trailers on
+each page in headless Chromium, with a fresh browser context (and so an
+empty cache) for each run.
+
+Each trailer is timed from the click which starts it (the click on its
+poster, or with the facade, the click on the play button, made `THINK_TIME`
+seconds after the modal opened) until the `<video>` element in YouTube's
+player frame is playing.  The first trailer of each run, which has to load
+the player, is reported separately from the later ones.
+
+Requires the `playwright` package and its Chromium browser (`pip install
+playwright && playwright install chromium`), and network access to
+YouTube.  Results depend on the network, so only compare the two pages of
+a single run of the benchmark.
+
+Usage:
+  python -m benchmarks.bench_trailer [<runs> [<trailers>]]
+
+Run from the top level of the repo.
+"""
+
+from __future__ import print_function, unicode_literals
+import io
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+try:
+    from playwright.sync_api import Error as PlaywrightError
+    from playwright.sync_api import sync_playwright
+except ImportError:
+    sync_playwright = None  # Optional dependency, checked in main()
+
+from fresh_tomatillos.get_config import get_config
+from fresh_tomatillos.media import Movie
+from fresh_tomatillos.movie_args import generate_movie_args
+from fresh_tomatillos.render import (
+    MODULE_DIR, get_templates, stream_movies_page)
+from fresh_tomatillos.serve import ArtifactStore, make_server, server_url
+
+try:
+    _timer = time.perf_counter  # Python 3
+except AttributeError:
+    _timer = time.time  # Python 2
+
+
+SAMPLE_PATH = os.path.join(MODULE_DIR, 'sample.cfg')
+VALID_KEYS = ('summary', 'poster', 'youtube')
+
+# (<page name>, <trailer_facade setting>)
+PAGES = (('embed.html', False), ('facade.html', True))
+
+THINK_TIME = 1.0  # Seconds between the modal opening and pressing play
+TIMEOUT = 30.0  # Seconds to wait for a trailer to start playing
+POLL_MS = 5
+BROWSER_ARGS = ['--autoplay-policy=no-user-gesture-required']
+
+ROW = '  {0:12} {1:>15} {2:>16}'
+
+VIDEO_PLAYING = '''() => {
+    var video = document.querySelector('video');
+    return !!video && !video.paused && video.currentTime > 0;
+}'''
+
+
+def write_pages(output_dir):
+    """Render the sample page once for each of PAGES."""
+    config = get_config(SAMPLE_PATH, VALID_KEYS)
+    movies = [Movie(*args) for args in generate_movie_args(config)]
+
+    for name, trailer_facade in PAGES:
+        path = os.path.join(output_dir, name)
+        with io.open(path, 'w', encoding='utf-8') as page_file:
+            stream_movies_page(movies, page_file, get_templates(
+                trailer_facade=trailer_facade))
+
+    return len(movies)
+
+
+def wait_for_first_frame(page):
+    """Wait until a video is playing in YouTube's player frame."""
+    deadline = _timer() + TIMEOUT
+    while _timer() < deadline:
+        for frame in page.frames:
+            if '/embed/' not in frame.url:
+                continue
+            try:
+                if frame.evaluate(VIDEO_PLAYING):
+                    return
+            except PlaywrightError:
+                pass  # The frame is still loading, or was just removed
+        page.wait_for_timeout(POLL_MS)
+
+    raise RuntimeError('No trailer started playing within {0:g}s'.format(
+        TIMEOUT))
+
+
+def time_trailers(browser, url, trailer_facade, trailers):
+    """Return the time to the first frame of each trailer, in seconds."""
+    context = browser.new_context()
+    try:
+        page = context.new_page()
+        page.goto(url, wait_until='load')
+
+        times = []
+        for index in range(trailers):
+            tile = page.locator('.movie-tile').nth(index)
+            tile.hover()  # Where the facade warms up its connections
+
+            start = _timer()
+            tile.click()
+            if trailer_facade:
+                page.wait_for_timeout(THINK_TIME * 1000)
+                start = _timer()
+                page.click('.trailer-facade')
+
+            wait_for_first_frame(page)
+            times.append(_timer() - start)
+
+            page.click('.hanging-close')
+            page.wait_for_timeout(500)  # Let the modal finish closing
+
+        return times
+    finally:
+        context.close()
+
+
+def median(values):
+    """Return the median of a non-empty list of numbers."""
+    values = sorted(values)
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2
+
+
+def main(argv):
+    runs = int(argv[0]) if argv else 5
+    trailers = int(argv[1]) if len(argv) > 1 else 3
+
+    if sync_playwright is None:
+        print('This benchmark requires the playwright package (and its'
+              ' Chromium browser).', file=sys.stderr)
+        return 1
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        movie_count = write_pages(temp_dir)
+        trailers = min(trailers, movie_count)
+
+        store = ArtifactStore(temp_dir, PAGES[0][0],
+                              names=[name for name, _ in PAGES])
+        server = make_server(store, port=0)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+        # {<page name>: ([<first trailer times>], [<later trailer times>])}
+        results = dict((name, ([], [])) for name, _ in PAGES)
+        with sync_playwright() as playwright:
+            browser = playwright.chromium.launch(args=BROWSER_ARGS)
+            try:
+                # Alternate between the pages, so both see the same network
+                for _ in range(runs):
+                    for name, trailer_facade in PAGES:
+                        times = time_trailers(
+                            browser, server_url(server) + name,
+                            trailer_facade, trailers)
+                        results[name][0].append(times[0])
+                        results[name][1].extend(times[1:])
+            finally:
+                browser.close()
+
+        server.shutdown()
+        server.server_close()
+    finally:
+        shutil.rmtree(temp_dir)
+
+    print('Time to first frame, median of {0} runs of {1} trailers:'.format(
+        runs, trailers))
+    print(ROW.format('', 'first trailer', 'later trailers'))
+    for name, _ in PAGES:
+        first, later = results[name]
+        print(ROW.format(
+            name, '{0:.0f} ms'.format(median(first) * 1000),
+            '{0:.0f} ms'.format(median(later) * 1000) if later else '-'))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
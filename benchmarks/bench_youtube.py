@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: YouTube video ID normalization.
+
+Normalizes a mix of bare video IDs, long URLs (with extra query
+parameters), short `youtu.be` URLs and scheme-less mobile URLs, with
+trailer URLs repeated across the catalog the way real configs repeat them.
+Compares the original per-value approach (a frozenset check and uncached
+URL parsing) with the memoized `_get_youtube_id()` used by builds and
+the streaming `normalize_youtube_sources()` API.
+
+Usage:
+  python -m benchmarks.bench_youtube [<source_count> [<distinct_count>]]
+
+Run from the top level of the repo.
+"""
+
+from __future__ import print_function, unicode_literals
+import random
+import sys
+import timeit
+try:
+    from urllib.parse import urlsplit, parse_qs  # Python 3
+except ImportError:
+    from urlparse import urlsplit, parse_qs  # Python 2
+
+from fresh_tomatillos import movie_args
+from fresh_tomatillos.movie_args import (
+    LONG_HOSTNAMES, SHORT_HOSTNAMES, YOUTUBE_ID_CHARACTERS,
+    normalize_youtube_sources)
+
+
+SOURCE_TEMPLATES = (
+    '{0}',
+    'https://www.youtube.com/watch?v={0}',
+    'https://www.youtube.com/watch?feature=youtu.be&v={0}&t=42s',
+    'https://youtu.be/{0}',
+    'm.youtube.com/watch?v={0}',
+)
+
+
+def legacy_get_youtube_id(source):
+    """Normalize one source the way fresh_tomatillos 0.4.0 did."""
+    def is_potential_id(id_string):
+        return (len(id_string) > 0 and
+                frozenset(id_string).issubset(YOUTUBE_ID_CHARACTERS))
+
+    if is_potential_id(source):
+        return source
+
+    split_url = urlsplit(source)
+    if not split_url.scheme:
+        split_url = urlsplit('https://' + source)
+
+    if split_url.hostname in LONG_HOSTNAMES:
+        values = parse_qs(split_url.query).get('v')
+        if values and is_potential_id(values[0]):
+            return values[0]
+    elif split_url.hostname in SHORT_HOSTNAMES:
+        if is_potential_id(split_url.path[1:]):
+            return split_url.path[1:]
+
+    return None
+
+
+def make_sources(count, distinct_count):
+    """Return `count` sources drawn from `distinct_count` distinct videos."""
+    rng = random.Random(0)
+    video_ids = ['{0:011d}'.format(i)[-11:] for i in range(distinct_count)]
+    return [rng.choice(SOURCE_TEMPLATES).format(rng.choice(video_ids))
+            for _ in range(count)]
+
+
+def best_time(function, repeat=5):
+    """Return the fastest of `repeat` runs of `function`, in seconds."""
+    return min(timeit.repeat(function, number=1, repeat=repeat))
+
+
+def main(argv):
+    count = int(argv[0]) if argv else 100000
+    distinct_count = int(argv[1]) if len(argv) > 1 else 500
+    sources = make_sources(count, distinct_count)
+
+    def memoized():
+        return [movie_args._get_youtube_id(source, 'title')
+                for source in sources]
+
+    expected = [legacy_get_youtube_id(source) for source in sources]
+    assert memoized() == expected
+    assert list(normalize_youtube_sources(sources)) == expected
+
+    results = [
+        ('Original', best_time(
+            lambda: [legacy_get_youtube_id(source) for source in sources])),
+        ('_get_youtube_id()', best_time(memoized)),
+        ('normalize_youtube_sources()', best_time(
+            lambda: list(normalize_youtube_sources(sources)))),
+    ]
+
+    print('Normalizing {0} sources ({1} distinct videos):'.format(
+        count, distinct_count))
+    for name, seconds in results:
+        print('  {0:30} {1:12,.0f} sources/s'.format(name, count / seconds))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+Check: FastConfig reads config files exactly as RawConfigParser does.
+
+Reads each of the config files in CASES with `get_config()`, once with
+`RawConfigParser` and once with the single-pass `FastConfig` reader, and
+fails if the sections or the options of any section differ.  The cases
+cover the parts of the format FastConfig has to reproduce by hand, such as
+options which are defined more than once.
+
+Prints the result of each case, and exits with status 1 if any check
+fails, so it can be run as a regression test.
+
+Usage:
+  python -m benchmarks.check_config
+
+Run from the top level of the repo.
+"""
+
+from __future__ import print_function, unicode_literals
+import io
+import os
+import sys
+import tempfile
+
+from fresh_tomatillos.get_config import get_config
+
+
+VALID_KEYS = ('summary', 'poster', 'youtube')
+MOVIE = '''poster: https://example.com/poster.jpg
+youtube: abcdefghijk
+'''
+
+# {<name>: <config file contents>}
+CASES = {
+    'single-line options': '''[Movie]
+summary: A summary.
+''' + MOVIE,
+
+    'multi-line option': '''[Movie]
+summary: The first line,
+  the second line,
+
+  and a line after a blank one.
+''' + MOVIE,
+
+    'multi-line option redefined on one line': '''[Movie]
+summary: The first line,
+  the second line.
+''' + MOVIE + '''summary: The final summary.
+''',
+
+    'multi-line option redefined on several lines': '''[Movie]
+summary: The first line,
+  the second line.
+''' + MOVIE + '''summary: The final summary,
+  on two lines.
+''',
+
+    'one-line option redefined on several lines': '''[Movie]
+summary: The first summary.
+''' + MOVIE + '''summary: The final summary,
+  on two lines.
+''',
+
+    'multi-line option redefined in a repeated section': '''[Movie]
+summary: The first line,
+  the second line.
+''' + MOVIE + '''
+[Other movie]
+summary: Another summary.
+''' + MOVIE + '''
+[Movie]
+Summary = The final summary.
+''',
+
+    'defaults, comments and delimiters': '''[DEFAULT]
+poster = https://example.com/default.jpg
+
+[Movie]
+# A comment
+; Another comment
+summary = Uses = and : in its value.
+youtube: abcdefghijk
+''',
+}
+
+
+def read_sections(path, fast):
+    """Return every section of a config file, with its options."""
+    config = get_config(path, VALID_KEYS, fast=fast)
+    return [(title, sorted(config.items(title)))
+            for title in config.sections()]
+
+
+def main(argv):
+    failures = []
+
+    for name in sorted(CASES):
+        handle, path = tempfile.mkstemp(suffix='.cfg')
+        os.close(handle)
+        try:
+            with io.open(path, 'w', encoding='utf-8') as config_file:
+                config_file.write(CASES[name])
+            expected = read_sections(path, fast=False)
+            actual = read_sections(path, fast=True)
+        finally:
+            os.remove(path)
+
+        if actual == expected:
+            print('ok    ' + name)
+        else:
+            print('FAIL  ' + name)
+            failures.append('{0}:\n  RawConfigParser: {1!r}\n'
+                            '  FastConfig:      {2!r}'.format(
+                                name, expected, actual))
+
+    for failure in failures:
+        print('FAIL: ' + failure, file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
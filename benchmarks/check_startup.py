@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+Check: the CLI starts quickly when it has no real work to do.
+
+Runs `fresh_tomatillos --version` and `fresh_tomatillos --help` under
+`python -X importtime`, and fails if either of them:
+
+ - imports any of the modules in SLOW_MODULES (beyond those which the
+   interpreter imports on its own), or
+ - spends longer than the budget importing fresh_tomatillos modules and
+   everything they import (the best of several runs is used).
+
+Prints the import time of each command, and exits with status 1 if any
+check fails, so it can be run as a regression test.
+
+Usage:
+  python -m benchmarks.check_startup [<runs> [<budget_ms>]]
+
+Run from the top level of the repo.  Requires Python 3.7 or later.
+"""
+
+from __future__ import print_function, unicode_literals
+import os
+import subprocess
+import sys
+
+
+COMMANDS = (['--version'], ['--help'])
+
+# Modules which only the phases of a build (or opening a browser) need
+SLOW_MODULES = frozenset([
+    'concurrent.futures', 'configparser', 'csv', 'http.client', 'json',
+    'PIL', 'sqlite3', 'tracemalloc', 'urllib.parse', 'webbrowser',
+    'fresh_tomatillos.assets', 'fresh_tomatillos.catalog',
+    'fresh_tomatillos.catalog_cache',
+    'fresh_tomatillos.get_config', 'fresh_tomatillos.incremental',
+    'fresh_tomatillos.media', 'fresh_tomatillos.movie_args',
+    'fresh_tomatillos.offline', 'fresh_tomatillos.posters',
+    'fresh_tomatillos.profiling', 'fresh_tomatillos.readers',
+    'fresh_tomatillos.render', 'fresh_tomatillos.search',
+    'fresh_tomatillos.serve',
+    'fresh_tomatillos.thumbnails', 'fresh_tomatillos.watch',
+])
+PACKAGE = 'fresh_tomatillos'
+DEFAULT_RUNS = 5
+DEFAULT_BUDGET_MS = 20
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_times(args):
+    """Run Python with `-X importtime`, and parse what it imported.
+
+    Args:
+        args (list[str]): The arguments to pass to Python.
+
+    Returns:
+        list[tuple[str, int, int]]: The (name, self_us, depth) of each
+            imported module, in the order in which imports finished.
+    """
+    process = subprocess.Popen(
+        [sys.executable, '-X', 'importtime'] + args, cwd=REPO_DIR,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    _, stderr = process.communicate()
+    if process.returncode != 0:
+        raise RuntimeError('Command failed: {0}\n{1}'.format(
+            ' '.join(args), stderr.decode('utf-8', 'replace')))
+
+    imports = []
+    for line in stderr.decode('utf-8').splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        imports.append((name.strip(), int(self_us), depth))
+    return imports
+
+
+def package_import_us(imports):
+    """Return the time spent importing the package and its dependencies.
+
+    Args:
+        imports (list[tuple[str, int, int]]): As returned by
+                                              `import_times()`.
+
+    Returns:
+        int: The total time, in microseconds.
+    """
+    # Each module is listed after the modules it imported, one level deeper
+    total = 0
+    stack = []  # [(<depth>, <imported by the package>)]
+    for name, self_us, depth in reversed(imports):
+        while stack and stack[-1][0] >= depth:
+            stack.pop()
+        in_package = (name == PACKAGE or name.startswith(PACKAGE + '.') or
+                      bool(stack and stack[-1][1]))
+        stack.append((depth, in_package))
+        if in_package:
+            total += self_us
+    return total
+
+
+def main(argv):
+    runs = int(argv[0]) if argv else DEFAULT_RUNS
+    budget_us = 1000 * (float(argv[1]) if len(argv) > 1 else
+                        DEFAULT_BUDGET_MS)
+
+    interpreter_modules = set(
+        name for name, _, _ in import_times(['-c', 'pass']))
+    failures = []
+
+    for command in COMMANDS:
+        label = 'fresh_tomatillos ' + ' '.join(command)
+        runs_imports = [import_times(['-m', PACKAGE] + command)
+                        for _ in range(runs)]
+        best_us = min(package_import_us(imports) for imports in runs_imports)
+
+        imported = set(name for name, _, _ in runs_imports[0])
+        slow = sorted(name for name in imported - interpreter_modules
+                      if name in SLOW_MODULES or
+                      name.split('.')[0] in SLOW_MODULES)
+
+        print('{0:32} {1:8.1f} ms  ({2} modules imported)'.format(
+            label, best_us / 1000.0, len(imported - interpreter_modules)))
+
+        if slow:
+            failures.append('{0} imported: {1}'.format(
+                label, ', '.join(slow)))
+        if best_us > budget_us:
+            failures.append('{0} took {1:.1f} ms to import, over the budget'
+                            ' of {2:g} ms'.format(label, best_us / 1000.0,
+                                                 budget_us / 1000.0))
+
+    for failure in failures:
+        print('FAIL: ' + failure, file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+Generate a synthetic config file of any size, shaped like `sample.cfg`.
+
+Movies use a mix of bare YouTube video IDs and long (sometimes with extra
+query parameters), short and scheme-less mobile YouTube URLs.  Some titles
+contain non-ASCII characters, some sections have comments or keys with odd
+capitalization, some keys are repeated (the last value wins) and some
+sections are repeated (later sections override values from earlier ones),
+just like in the sample config.  The output depends only on the movie count
+and the seed.
+
+Usage:
+  python -m benchmarks.generate_catalog <movie_count> <file_path> [<seed>]
+
+Run from the top level of the repo.
+"""
+
+from __future__ import print_function, unicode_literals
+import io
+import os
+import random
+import string
+import sys
+
+
+TITLE_WORDS = (
+    'Star', 'Wars', 'Lion', 'King', 'Breakfast', 'Club', 'Galaxy', 'Quest',
+    'Frozen', 'Return', 'Night', 'Empire', 'Secret', 'Garden', 'River',
+    'Amélie', 'Léon', 'Café', 'Señor', 'Müller', 'Ørsted', 'Crème',
+    'Brûlée', 'Жизнь', 'Город', '千と千尋', '東京', '영화', 'Ἰθάκη',
+)
+SUMMARY_WORDS = (
+    'an', 'evil', 'empire', 'orphaned', 'prince', 'students', 'detention',
+    'shy', 'woman', 'whimsical', 'adventures', 'actors', 'aliens', 'queen',
+    'magic', 'freedom', 'duty', 'galaxy', 'kingdom', 'uncle', 'help',
+    'must', 'find', 'herself', 'stopped', 'across', 'the', 'of', 'and',
+)
+COMMENTS = (
+    '# Using raw YouTube video ID',
+    '# Using full YouTube URL',
+    "; Comments may also start with a semicolon",
+    "# This title has non-ASCII characters, which is fine in UTF-8",
+)
+VIDEO_ID_CHARACTERS = string.ascii_letters + string.digits + '-_'
+YOUTUBE_TEMPLATES = (
+    '{0}',
+    'https://www.youtube.com/watch?v={0}',
+    'https://www.youtube.com/watch?feature=youtu.be&v={0}',
+    'https://youtu.be/{0}',
+    'm.youtube.com/watch?v={0}',
+)
+YOUTUBE_KEYS = ('youtube', 'youtube', 'youtube', 'YouTube', 'YOUtube')
+
+# One in this many movies has a repeated key or a repeated section
+REPEATED_KEY_INTERVAL = 37
+REPEATED_SECTION_INTERVAL = 50
+
+
+def _video_id(rng):
+    """Return a random YouTube video ID."""
+    return ''.join(rng.choice(VIDEO_ID_CHARACTERS) for _ in range(11))
+
+
+def _movie_sections(number, rng):
+    """Return the config text for one movie, as one or more sections."""
+    title = '{0} {1} {2}'.format(
+        rng.choice(TITLE_WORDS), rng.choice(TITLE_WORDS), number)
+    summary = ' '.join(rng.choice(SUMMARY_WORDS)
+                       for _ in range(rng.randint(8, 24)))
+    poster = ('https://upload.wikimedia.org/wikipedia/en/{0:x}/{0:x}{1:x}/'
+              'Poster_{2}.jpg'.format(number % 16, rng.randrange(16),
+                                      number))
+    youtube = rng.choice(YOUTUBE_TEMPLATES).format(_video_id(rng))
+
+    lines = ['[{0}]'.format(title)]
+    if rng.random() < 0.25:
+        lines.append(rng.choice(COMMENTS))
+    if number % REPEATED_KEY_INTERVAL == 0:
+        lines.append('summary: THIS SUMMARY IS OVERWRITTEN BY THE NEXT LINE')
+    lines.append('summary: {0}.'.format(summary.capitalize()))
+    lines.append('poster: ' + poster)
+
+    if number % REPEATED_SECTION_INTERVAL == 0:
+        lines.append("youtube: THIS VALUE IS OVERWRITTEN IN THE NEXT SECTION")
+        lines.extend(('', '[{0}]'.format(title),
+                      '# Overriding the video of the previous section'))
+
+    lines.append('{0}: {1}'.format(rng.choice(YOUTUBE_KEYS), youtube))
+    return '\n'.join(lines) + '\n\n'
+
+
+def write_catalog(path, movie_count, seed=0):
+    """Write a config file describing `movie_count` distinct movies.
+
+    Args:
+        path (str): The path of the config file to write.
+        movie_count (int): The number of movies in the file.
+        seed (int): The seed for the (deterministic) random choices.
+
+    Returns:
+        int: The size of the file, in bytes.
+    """
+    rng = random.Random(seed)
+    with io.open(path, 'w', encoding='utf-8') as config_file:
+        for number in range(movie_count):
+            config_file.write(_movie_sections(number, rng))
+
+    return os.path.getsize(path)
+
+
+def main(argv):
+    if len(argv) < 2:
+        print(__doc__.split('\n\n')[-2], file=sys.stderr)
+        return 1
+
+    size = write_catalog(argv[1], int(argv[0]),
+                         int(argv[2]) if len(argv) > 2 else 0)
+    print('Wrote {0:,} movies ({1:,} bytes) to {2}'.format(
+        int(argv[0]), size, argv[1]))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+Load test: the `--serve` HTTP server.
+
+Renders a page for a generated catalog, serves it from a background thread
+on a free localhost port, then has several client threads (each with one
+keep-alive connection) fetch it as fast as they can.  Reports throughput
+and latency for uncompressed, gzip-compressed and conditional (304)
+requests.
+
+Usage:
+  python -m benchmarks.load_serve [<movie_count> [<seconds> [<clients>]]]
+
+Run from the top level of the repo.
+"""
+
+from __future__ import print_function, unicode_literals
+import io
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+try:
+    from http.client import HTTPConnection  # Python 3
+except ImportError:
+    from httplib import HTTPConnection  # Python 2
+
+from benchmarks.bench_render import make_movies
+from fresh_tomatillos.render import stream_movies_page
+from fresh_tomatillos.serve import ArtifactStore, make_server
+
+try:
+    _timer = time.perf_counter  # Python 3
+except AttributeError:
+    _timer = time.time  # Python 2
+
+
+def client(port, headers, deadline, latencies):
+    """Send requests on one connection until `deadline`, timing each one."""
+    connection = HTTPConnection('127.0.0.1', port)
+    try:
+        while _timer() < deadline:
+            started = _timer()
+            connection.request('GET', '/', headers=headers)
+            response = connection.getresponse()
+            response.read()
+            latencies.append(_timer() - started)
+            assert response.status in (200, 304), response.status
+    finally:
+        connection.close()
+
+
+def run(port, headers, seconds, clients):
+    """Return the latency of every request made by `clients` threads."""
+    deadline = _timer() + seconds
+    results = [[] for _ in range(clients)]
+    threads = [threading.Thread(target=client,
+                                args=(port, headers, deadline, latencies))
+               for latencies in results]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sorted(latency for latencies in results for latency in latencies)
+
+
+def main(argv):
+    count = int(argv[0]) if argv else 1000
+    seconds = float(argv[1]) if len(argv) > 1 else 3
+    clients = int(argv[2]) if len(argv) > 2 else 8
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(temp_dir, 'movies.html')
+        with io.open(path, 'w', encoding='utf-8') as output_file:
+            stream_movies_page(make_movies(count), output_file)
+
+        store = ArtifactStore(temp_dir, 'movies.html', names=['movies.html'])
+        server = make_server(store, port=0)
+        port = server.server_address[1]
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+        etag = store.get('/').negotiate('gzip')[2]
+        scenarios = [
+            ('identity', {}),
+            ('gzip', {'Accept-Encoding': 'gzip'}),
+            ('304', {'Accept-Encoding': 'gzip', 'If-None-Match': etag}),
+        ]
+
+        print('Serving a {0:,} byte page ({1} movies) to {2} clients for'
+              ' {3:g}s each:'.format(os.path.getsize(path), count, clients,
+                                    seconds))
+        for name, headers in scenarios:
+            latencies = run(port, headers, seconds, clients)
+            print('  {0:9} {1:10,.0f} req/s   p50 {2:7.2f} ms'
+                  '   p99 {3:7.2f} ms'.format(
+                      name, len(latencies) / seconds,
+                      latencies[len(latencies) // 2] * 1000,
+                      latencies[int(len(latencies) * 0.99)] * 1000))
+
+        server.shutdown()
+        server.server_close()
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark suite: every stage of a build, at several catalog sizes.
+
+For each movie count, generates a config file (see `generate_catalog.py`),
+then times each stage of building the page from it in a fresh process:
+`get_config()`, `generate_movie_args()`, building the `MovieCollection`,
+building the search index, `compile_movies_page()` and writing the page.
+Reports each stage's wall and CPU time and throughput, and the peak
+resident memory (RSS) of the process after each stage, along with the
+size of the search index.
+
+Results can be saved as JSON, and compared with results saved earlier (for
+example by another version of fresh_tomatillos) to show regressions.
+
+Usage:
+  python -m benchmarks.suite [options] [<movie_count>...]
+
+Options:
+  --fast-config   Read config files with the single-pass reader.
+  --repeat=N      Run each size N times, keeping the best times.
+  --save=FILE     Save the results to FILE as JSON.
+  --compare=FILE  Show each stage's time relative to the results in FILE.
+
+The default movie counts are 1000, 100000 and 1000000.  The largest needs
+a few GiB of memory with the single-pass reader, and roughly twice that
+without it.  Run from the top level of the repo.
+"""
+
+from __future__ import print_function, unicode_literals
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+try:
+    import resource  # Unix only
+except ImportError:
+    resource = None
+
+from benchmarks.generate_catalog import write_catalog
+from fresh_tomatillos import __version__, profiling
+from fresh_tomatillos.get_config import get_config
+from fresh_tomatillos.media import MovieCollection
+from fresh_tomatillos.movie_args import generate_movie_args
+from fresh_tomatillos.profiling import Profiler
+from fresh_tomatillos.render import compile_movies_page
+from fresh_tomatillos.search import SearchIndex
+
+
+DEFAULT_MOVIE_COUNTS = (1000, 100000, 1000000)
+RESULTS_FORMAT = 1
+VALID_KEYS = ('summary', 'poster', 'youtube')
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def peak_rss():
+    """Return the peak resident memory of this process so far, in bytes."""
+    if resource is None:
+        return None
+
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kibibytes, macOS reports bytes
+    return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+
+def run_stages(config_path, movie_count, fast_config):
+    """Run and time every stage of a build, in this process.
+
+    Args:
+        config_path (str): The path of a generated config file.
+        movie_count (int): The number of movies in the config file.
+        fast_config (bool): Whether to read the file with `FastConfig`.
+
+    Returns:
+        list[dict]: The measurements of each stage (and of the phases
+                    nested within stages), in order.
+    """
+    profiler = Profiler(trace_memory=False)
+    rss = {}
+    output_dir = tempfile.mkdtemp()
+
+    def stage(name):
+        rss[name] = None
+        return profiling.phase(name)
+
+    try:
+        with profiler.activate():
+            with stage('get_config'):
+                config = get_config(config_path, VALID_KEYS, fast_config)
+            rss['get_config'] = peak_rss()
+
+            with stage('generate_movie_args'):
+                movie_args = list(generate_movie_args(config))
+            del config
+            rss['generate_movie_args'] = peak_rss()
+
+            with stage('movie_collection'):
+                movies = MovieCollection(movie_args)
+            del movie_args
+            rss['movie_collection'] = peak_rss()
+
+            with stage('search_index'):
+                index = SearchIndex(movies)
+                profiling.count('terms', len(index.terms))
+                profiling.count('index_bytes',
+                                len(index.to_script().encode('utf-8')))
+            del index
+            rss['search_index'] = peak_rss()
+
+            with stage('compile_movies_page'):
+                page = compile_movies_page(movies)
+            del movies
+            rss['compile_movies_page'] = peak_rss()
+
+            with stage('write_page'):
+                output_path = os.path.join(output_dir, 'page.html')
+                with io.open(output_path, 'w', encoding='utf-8') as output:
+                    output.write(page)
+                profiling.count('bytes_written',
+                                os.path.getsize(output_path))
+            rss['write_page'] = peak_rss()
+    finally:
+        shutil.rmtree(output_dir)
+
+    stages = []
+    for record in profiler.records:
+        data = record.as_dict()
+        data['movies_per_second'] = (
+            movie_count / record.wall_seconds if record.wall_seconds else None)
+        data['peak_rss_bytes'] = rss.get(record.name)
+        stages.append(data)
+    return stages
+
+
+def measure(movie_count, fast_config, temp_dir):
+    """Generate a config file, and run every stage in a fresh process.
+
+    A separate process is used for each run, so peak memory reflects only
+    that run.
+
+    Args:
+        movie_count (int): The number of movies to generate.
+        fast_config (bool): Whether to read the file with `FastConfig`.
+        temp_dir (str): A directory for the config file.
+
+    Returns:
+        dict: The movie count, config size and stage measurements.
+    """
+    config_path = os.path.join(temp_dir, '{0}.cfg'.format(movie_count))
+    if not os.path.isfile(config_path):
+        write_catalog(config_path, movie_count)
+
+    command = [sys.executable, '-m', 'benchmarks.suite',
+               '--run=' + config_path, str(movie_count)]
+    if fast_config:
+        command.append('--fast-config')
+
+    stages = json.loads(
+        subprocess.check_output(command, cwd=REPO_DIR).decode('utf-8'))
+    return {'movie_count': movie_count,
+            'config_bytes': os.path.getsize(config_path),
+            'stages': stages}
+
+
+def best_of(results):
+    """Combine repeated results for one size, keeping the best times."""
+    best = results[0]
+    for result in results[1:]:
+        for best_stage, stage in zip(best['stages'], result['stages']):
+            for key in ('wall_seconds', 'cpu_seconds'):
+                best_stage[key] = min(best_stage[key], stage[key])
+            best_stage['movies_per_second'] = max(
+                best_stage['movies_per_second'], stage['movies_per_second'])
+    return best
+
+
+def format_bytes(size):
+    """Return a size in bytes as a human-readable string."""
+    if size is None:
+        return '-'
+    return '{0:,.1f} MiB'.format(size / 2.0 ** 20)
+
+
+def print_results(results, baseline=None):
+    """Print a table of results, optionally relative to a baseline.
+
+    Args:
+        results (list[dict]): The results for each movie count.
+        baseline (Optional[dict]): Results loaded from an earlier run.
+    """
+    baseline_times = {}
+    if baseline is not None:
+        for result in baseline['results']:
+            for stage in result['stages']:
+                key = (result['movie_count'], stage['phase'])
+                baseline_times[key] = stage['wall_seconds']
+
+    for result in results:
+        movie_count = result['movie_count']
+        print('\n{0:,} movies ({1}):'.format(
+            movie_count, format_bytes(result['config_bytes'])))
+        print('  {0:24} {1:>10} {2:>10} {3:>14} {4:>12} {5:>8}'.format(
+            'Stage', 'Wall (s)', 'CPU (s)', 'Movies/s', 'Peak RSS',
+            'vs base' if baseline is not None else '').rstrip())
+
+        index_counts = []
+        for stage in result['stages']:
+            previous = baseline_times.get((movie_count, stage['phase']))
+            relative = ('{0:7.2f}x'.format(stage['wall_seconds'] / previous)
+                        if previous else '')
+            print('  {0:24} {1:10.3f} {2:10.3f} {3:>14} {4:>12} {5:>8}'
+                  .format('  ' * stage['depth'] + stage['phase'],
+                          stage['wall_seconds'], stage['cpu_seconds'],
+                          '{0:,.0f}'.format(stage['movies_per_second'] or 0),
+                          format_bytes(stage['peak_rss_bytes']), relative)
+                  .rstrip())
+
+            if 'index_bytes' in stage['counts']:
+                index_counts.append('{0:,} terms, {1:,} bytes'.format(
+                    stage['counts']['terms'], stage['counts']['index_bytes']))
+
+        for counts in index_counts:
+            print('  Search index: ' + counts)
+
+
+def main(argv):
+    movie_counts = []
+    options = {}
+    for arg in argv:
+        name, equals, value = arg.partition('=')
+        if name in ('--fast-config',):
+            options[name] = True
+        elif name in ('--compare', '--repeat', '--run', '--save'):
+            options[name] = value
+        else:
+            movie_counts.append(int(arg))
+
+    fast_config = options.get('--fast-config', False)
+
+    # In a child process: run one size and report the measurements
+    if '--run' in options:
+        stages = run_stages(options['--run'], movie_counts[0], fast_config)
+        sys.stdout.write(json.dumps(stages))
+        return 0
+
+    baseline = None
+    if '--compare' in options:
+        with io.open(options['--compare'], encoding='utf-8') as base_file:
+            baseline = json.load(base_file)
+
+    repeat = int(options.get('--repeat', 1))
+    temp_dir = tempfile.mkdtemp()
+    try:
+        results = [best_of([measure(count, fast_config, temp_dir)
+                            for _ in range(repeat)])
+                   for count in movie_counts or DEFAULT_MOVIE_COUNTS]
+    finally:
+        shutil.rmtree(temp_dir)
+
+    print('fresh_tomatillos {0} on {1} {2} ({3})'.format(
+        __version__, platform.python_implementation(),
+        platform.python_version(), platform.platform()))
+    if fast_config:
+        print('Reading config files with the single-pass reader')
+    if baseline is not None:
+        print('Compared with fresh_tomatillos {0} on {1} {2}{3}'.format(
+            baseline['version'], baseline['implementation'],
+            baseline['python'],
+            ' (single-pass reader)' if baseline['fast_config'] else ''))
+    print_results(results, baseline)
+
+    if '--save' in options:
+        with io.open(options['--save'], 'w', encoding='utf-8') as save_file:
+            save_file.write(json.dumps({
+                'format': RESULTS_FORMAT,
+                'version': __version__,
+                'implementation': platform.python_implementation(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'fast_config': fast_config,
+                'started_at': time.strftime('%Y-%m-%dT%H:%M:%SZ',
+                                            time.gmtime()),
+                'results': results}, indent=2, sort_keys=True))
+        print('\nSaved the results to ' + options['--save'])
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -13,4 +13,4 @@ import sys
 from fresh_tomatillos.cli import main
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
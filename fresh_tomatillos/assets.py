@@ -0,0 +1,401 @@
+# -*- coding: utf-8 -*-
+"""
+fresh_tomatillos.assets
+~~~~~~~~~~~~~~~~~~~~~~~
+
+Implements the asset pipeline: minifying the templates and static files,
+and writing a page's CSS and JavaScript as external files named after a
+hash of their contents.
+
+The minifiers are deliberately conservative, and only remove what can't
+change how a page looks or behaves: comments, indentation and (outside of
+strings) redundant whitespace.  If the `rcssmin` or `rjsmin` package is
+installed, it is used for CSS or JavaScript instead.  Minified output is
+cached on disk by a hash of its source, so unchanged files are never
+minified twice.
+
+Content-hashed files (such as `assets/styles.0123abcdef.css`) never change
+once written, so they are only written if they don't already exist, and
+can be cached by browsers forever (see `serve.HASHED_NAME_PATTERN`).
+"""
+
+from __future__ import unicode_literals
+import hashlib
+import io
+import os
+import re
+
+try:
+    import rcssmin
+except ImportError:
+    rcssmin = None  # Optional dependency: the built-in minifier is used
+
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None  # Optional dependency: the built-in minifier is used
+
+from fresh_tomatillos.catalog_cache import cache_dir
+from fresh_tomatillos.output import atomic_open
+
+
+# Change this whenever a built-in minifier changes, to invalidate the cache
+MINIFIER_VERSION = 2
+
+ASSETS_DIRNAME = 'assets'
+ASSET_EXTENSIONS = {'scripts': '.js', 'styles': '.css',
+                    'deferred_styles': '.css'}
+HASH_LENGTH = 10
+
+# Elements whose contents must be left exactly as they are by minify_html()
+_RAW_ELEMENT_RE = re.compile(
+    r'(<(script|style|pre|textarea)\b.*?</\2\s*>)', re.DOTALL | re.IGNORECASE)
+_HTML_COMMENT_RE = re.compile(r'<!--(?!\[if).*?-->', re.DOTALL)
+_LINE_BREAK_RE = re.compile(r'[ \t]*\n\s*')
+
+_CSS_TOKEN_RE = re.compile(
+    r'("(?:[^"\\]|\\.)*"|\'(?:[^\'\\]|\\.)*\')|(/\*.*?\*/)|(\s+)',
+    re.DOTALL)
+_CSS_PUNCTUATION = frozenset('{};,>')
+
+# After these characters, a `/` starts a regular expression, not a division
+_JS_REGEX_PRECEDERS = frozenset('(,=:[!&|?{};+-*%<>~^\n')
+_JS_REGEX_KEYWORDS = ('return', 'typeof', 'case', 'in', 'of')
+# Spaces next to these characters are never needed
+_JS_PUNCTUATION = frozenset('{}()[];,=:<>!&|?')
+# A line break after these characters can't end a statement
+_JS_CONTINUATIONS = frozenset('{;,([=:&|?')
+# A line break before these characters can't end a statement
+_JS_CLOSERS = frozenset(')]}')
+
+# Process-wide cache of minified sources: {<cache key>: <minified>}
+_minified_cache = {}
+
+
+def minify_html(html):
+    """Return HTML without comments, indentation or blank lines.
+
+    Each run of whitespace containing a line break is replaced by a single
+    line break, which browsers render exactly as they did the original
+    whitespace.  The contents of `<script>`, `<style>`, `<pre>` and
+    `<textarea>` elements are left untouched.
+
+    Args:
+        html (str): HTML, or an HTML template.
+
+    Returns:
+        str: The minified HTML.
+    """
+    parts = _RAW_ELEMENT_RE.split(html)
+    minified = []
+
+    # split() returns [text, raw element, element name, text, ...]
+    for index in range(0, len(parts), 3):
+        text = _HTML_COMMENT_RE.sub('', parts[index])
+        minified.append(_LINE_BREAK_RE.sub('\n', text))
+        if index + 1 < len(parts):
+            minified.append(parts[index + 1])
+
+    return ''.join(minified)
+
+
+def minify_css(css):
+    """Return CSS without comments or unneeded whitespace.
+
+    Args:
+        css (str): A style sheet.
+
+    Returns:
+        str: The minified style sheet.
+    """
+    if rcssmin is not None:
+        return rcssmin.cssmin(css)
+
+    # [(<text>, <is string>), ...], with None as the text of whitespace
+    tokens = []
+    position = 0
+
+    for match in _CSS_TOKEN_RE.finditer(css):
+        if match.start() > position:
+            tokens.append((css[position:match.start()], False))
+        position = match.end()
+        string, comment, space = match.groups()
+        if string:
+            tokens.append((string, True))
+        elif space:
+            tokens.append((None, False))
+    if position < len(css):
+        tokens.append((css[position:], False))
+
+    # Drop spaces around punctuation, and semicolons ending a block, leaving
+    # strings as they are
+    minified = []
+    space = False
+    for text, is_string in tokens:
+        if text is None:
+            space = True
+            continue
+
+        if not is_string:
+            text = text.replace(';}', '}')
+            # Strings end with a quote, so this is never inside one
+            if text[0] == '}' and minified and minified[-1].endswith(';'):
+                minified[-1] = minified[-1][:-1]
+                if not minified[-1]:
+                    minified.pop()
+
+        if (space and minified and
+                minified[-1][-1] not in _CSS_PUNCTUATION and
+                text[0] not in _CSS_PUNCTUATION and
+                minified[-1][-1] != ':'):
+            minified.append(' ')
+        space = False
+        minified.append(text)
+
+    return ''.join(minified)
+
+
+def _skip_js_string(js, start):
+    """Return the index just past a JavaScript string starting at `start`."""
+    quote = js[start]
+    index = start + 1
+    while index < len(js) and js[index] != quote:
+        if js[index] == '\\':
+            index += 1
+        index += 1
+    return index + 1
+
+
+def _skip_js_regex(js, start):
+    """Return the index just past a regular expression literal and flags."""
+    index = start + 1
+    in_class = False
+    while index < len(js):
+        char = js[index]
+        if char == '\\':
+            index += 1
+        elif char == '[':
+            in_class = True
+        elif char == ']':
+            in_class = False
+        elif char == '/' and not in_class:
+            break
+        index += 1
+
+    index += 1
+    while index < len(js) and (js[index].isalnum() or js[index] == '_'):
+        index += 1
+    return index
+
+
+def _regex_allowed(output):
+    """Return whether a `/` after the output so far starts a regex."""
+    index = len(output) - 1
+    while index >= 0 and output[index] == ' ':
+        index -= 1
+    if index < 0 or output[index][-1] in _JS_REGEX_PRECEDERS:
+        return True
+
+    # Otherwise it's a division, unless it follows a keyword
+    word = []
+    while index >= 0 and (output[index].isalnum() or output[index] in '_$'):
+        word.append(output[index])
+        index -= 1
+    return ''.join(reversed(word)) in _JS_REGEX_KEYWORDS
+
+
+def minify_js(js):
+    """Return JavaScript without comments or unneeded whitespace.
+
+    Line breaks which might end a statement are kept, so automatic
+    semicolon insertion works exactly as it did in the original.
+
+    Args:
+        js (str): A script.
+
+    Returns:
+        str: The minified script.
+    """
+    if rjsmin is not None:
+        return rjsmin.jsmin(js)
+
+    output = []
+    index = 0
+    length = len(js)
+
+    while index < length:
+        char = js[index]
+
+        if char in '\'"`':
+            end = _skip_js_string(js, index)
+            output.append(js[index:end])
+            index = end
+        elif js.startswith('//', index):
+            end = js.find('\n', index)
+            index = length if end == -1 else end
+        elif js.startswith('/*', index):
+            end = js.find('*/', index + 2)
+            index = length if end == -1 else end + 2
+            output.append(' ')
+        elif char == '/' and _regex_allowed(output):
+            end = _skip_js_regex(js, index)
+            output.append(js[index:end])
+            index = end
+        elif char.isspace():
+            end = index
+            while end < length and js[end].isspace():
+                end += 1
+            output.append('\n' if '\n' in js[index:end] else ' ')
+            index = end
+        else:
+            output.append(char)
+            index += 1
+
+    return _squeeze_js_whitespace(output)
+
+
+def _squeeze_js_whitespace(tokens):
+    """Join tokens, dropping the whitespace tokens that aren't needed.
+
+    Args:
+        tokens (list[str]): Code, with each run of whitespace replaced by a
+                            ' ' or '\\n' token.
+
+    Returns:
+        str: The joined code.
+    """
+    minified = []
+
+    for index, token in enumerate(tokens):
+        if token not in (' ', '\n'):
+            minified.append(token)
+            continue
+
+        before = minified[-1][-1:] if minified else ''
+        after = ''
+        for following in tokens[index + 1:]:
+            if following not in (' ', '\n'):
+                after = following[:1]
+                break
+
+        if not before or not after or before in (' ', '\n'):
+            # Leading, trailing or repeated whitespace
+            if before == ' ' and token == '\n':
+                minified[-1] = minified[-1][:-1] + '\n'
+            continue
+
+        if token == '\n' and (before in _JS_CONTINUATIONS or
+                              after in _JS_CLOSERS):
+            token = ''
+        if token == ' ' and (before in _JS_PUNCTUATION or
+                             after in _JS_PUNCTUATION):
+            token = ''
+        if token:
+            minified.append(token)
+
+    return ''.join(minified).strip()
+
+
+MINIFIERS = {'.css': minify_css, '.html': minify_html, '.js': minify_js}
+
+
+def _minifier_name(extension):
+    """Return a name identifying the minifier used for a file extension."""
+    if extension == '.css' and rcssmin is not None:
+        return 'rcssmin-' + rcssmin.__version__
+    if extension == '.js' and rjsmin is not None:
+        return 'rjsmin-' + rjsmin.__version__
+    return 'builtin-{0}'.format(MINIFIER_VERSION)
+
+
+def minify_source(text, extension):
+    """Return a minified template or static file, using the cache.
+
+    Args:
+        text (str): The contents of the file.
+        extension (str): The file's extension: '.css', '.html' or '.js'.
+                         Other files are returned unchanged.
+
+    Returns:
+        str: The minified contents.
+    """
+    minify = MINIFIERS.get(extension)
+    if minify is None:
+        return text
+
+    key = hashlib.sha1('\0'.join((
+        _minifier_name(extension), extension, text)).encode('utf-8')
+    ).hexdigest()
+
+    minified = _minified_cache.get(key)
+    if minified is not None:
+        return minified
+
+    path = os.path.join(cache_dir(), 'minified', key + extension)
+    try:
+        with io.open(path, 'r', encoding='utf-8') as cached_file:
+            minified = cached_file.read()
+    except (IOError, OSError):
+        minified = minify(text)
+        try:
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with atomic_open(path) as cached_file:
+                cached_file.write(minified)
+        except (IOError, OSError):
+            pass  # The cache is only an optimization
+
+    _minified_cache[key] = minified
+    return minified
+
+
+def hashed_asset_name(name, content):
+    """Return the file name of an asset, containing a hash of its content.
+
+    Args:
+        name (str): The kind of asset, such as 'scripts' or 'styles'.
+        content (str): The contents of the asset.
+
+    Returns:
+        str: A name such as `styles.0123abcdef.css`.
+    """
+    digest = hashlib.sha1(content.encode('utf-8')).hexdigest()[:HASH_LENGTH]
+    return '{0}.{1}{2}'.format(name, digest, ASSET_EXTENSIONS[name])
+
+
+def write_hashed_assets(assets, output_dir):
+    """Write assets under content-hashed names, unless already written.
+
+    Args:
+        assets (dict[str, str]): The content of each kind of asset, such as
+                                 returned by `PageTemplates.page_assets()`.
+        output_dir (str): The directory of the page(s) using the assets.
+                          The assets are written to its ASSETS_DIRNAME
+                          subdirectory.
+
+    Returns:
+        tuple[dict[str, str], list[str]]: The URL of each asset, relative
+            to `output_dir`, and the paths of the files which were written.
+
+    Raises:
+        IOError: Raised if an asset can't be written.
+    """
+    assets_dir = os.path.join(output_dir, ASSETS_DIRNAME)
+    if not os.path.isdir(assets_dir):
+        os.makedirs(assets_dir)
+
+    urls = {}
+    written = []
+    for name, content in sorted(assets.items()):
+        file_name = hashed_asset_name(name, content)
+        path = os.path.join(assets_dir, file_name)
+
+        # The name changes whenever the content does
+        if not os.path.isfile(path):
+            with atomic_open(path) as asset_file:
+                asset_file.write(content)
+            written.append(path)
+
+        urls[name] = ASSETS_DIRNAME + '/' + file_name
+
+    return urls, written
@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+"""
+fresh_tomatillos.batch
+~~~~~~~~~~~~~~~~~~~~~~
+
+Implements building a page for each of many config files in one run, as
+done by the `fresh_tomatillos build` command.
+
+Config files are built in parallel worker processes when possible.  The
+templates are compiled once before the workers start, so workers which are
+forked from this process share them.  Every page is written atomically, and
+a config file with errors doesn't stop the others from being built: the
+errors of every config file are collected and returned together.
+"""
+
+from __future__ import unicode_literals
+import glob
+import os
+from collections import OrderedDict, namedtuple
+try:
+    from concurrent.futures import ProcessPoolExecutor  # Python 3
+except ImportError:
+    ProcessPoolExecutor = None  # Python 2, without the `futures` backport
+
+from fresh_tomatillos.exceptions import ConfigError
+from fresh_tomatillos.get_config import ParsingError, get_config
+from fresh_tomatillos.media import MovieCollection
+from fresh_tomatillos.movie_args import generate_movie_args
+from fresh_tomatillos.output import atomic_open
+from fresh_tomatillos.readers import (
+    CONFIG_FORMAT, EXTENSION_FORMATS, input_format, read_movie_args)
+from fresh_tomatillos.render import (
+    get_templates, stream_movies_page, stream_virtual_page)
+
+
+CONFIG_EXTENSION = '.cfg'
+PAGE_EXTENSION = '.html'
+GLOB_CHARACTERS = frozenset('*?[')
+VALID_CONFIG_KEYS = ('summary', 'poster', 'youtube')
+
+
+# The outcome of build_configs():
+#   pages: [(<config path>, <page path>, <movie count>)] for each page built
+#   errors: {<config path>: <error message>} for each config file which
+#           couldn't be built, in the order the config files were given
+BatchResult = namedtuple('BatchResult', ['pages', 'errors'])
+
+
+def _is_data_file_name(name):
+    """Return whether a file name has the extension of a movie data file."""
+    extension = os.path.splitext(name)[1].lower()
+    return extension == CONFIG_EXTENSION or extension in EXTENSION_FORMATS
+
+
+def expand_config_paths(inputs):
+    """Return the config files named by paths, directories and glob patterns.
+
+    Args:
+        inputs (Iterable[str]): Paths of config files, directories (standing
+            for every config or movie data file directly inside them) and
+            glob patterns.
+
+    Returns:
+        list[str]: The config file paths, in the order given (directories
+                   and patterns are expanded in sorted order).  Each file is
+                   included only once.
+
+    Raises:
+        ValueError: Raised if a directory or pattern matches no files.
+    """
+    paths = []
+    seen = set()
+
+    for path in inputs:
+        if os.path.isdir(path):
+            matches = sorted(
+                os.path.join(path, name) for name in os.listdir(path)
+                if _is_data_file_name(name) and
+                os.path.isfile(os.path.join(path, name)))
+        elif GLOB_CHARACTERS.intersection(path) and not os.path.exists(path):
+            matches = sorted(match for match in glob.glob(path)
+                             if os.path.isfile(match))
+        else:
+            matches = [path]  # Missing files are reported by the build
+
+        if not matches:
+            raise ValueError('No config files were found for: ' + path)
+
+        for match in matches:
+            key = os.path.normcase(os.path.abspath(match))
+            if key not in seen:
+                seen.add(key)
+                paths.append(match)
+
+    return paths
+
+
+def page_paths(config_paths, out_dir):
+    """Return the path of the page to build for each config file.
+
+    Each page is named after its config file: `a.cfg` becomes `a.html`.
+
+    Args:
+        config_paths (list[str]): The paths of the config files.
+        out_dir (str): The directory in which to write the pages.
+
+    Returns:
+        list[str]: The page paths, in the same order as `config_paths`.
+
+    Raises:
+        ValueError: Raised if two config files would have the same page.
+    """
+    owners = {}
+    paths = []
+
+    for config_path in config_paths:
+        name = os.path.splitext(os.path.basename(config_path))[0]
+        path = os.path.join(out_dir, name + PAGE_EXTENSION)
+
+        if path in owners:
+            raise ValueError(
+                'Config files {0} and {1} would both be built as {2}'.format(
+                    owners[path], config_path, path))
+        owners[path] = config_path
+        paths.append(path)
+
+    return paths
+
+
+def build_page(job):
+    """Build the page for one config file.
+
+    This is a module-level function so that it can run in a worker process.
+    Errors are returned as messages, rather than raised, since not every
+    exception can be sent back from a worker process.
+
+    Args:
+        job (tuple[str, str, bool, bool, Optional[str]]): The config file
+            path, the page path, whether to read the config file with
+            `FastConfig` and to build a virtual page (see
+            `render.stream_virtual_page()`), and the format of the file (see
+            `readers.input_format()`).
+
+    Returns:
+        tuple[int, Optional[str]]: The number of movies on the page, and an
+                                   error message if the page wasn't built.
+    """
+    config_path, page_path, fast_config, virtual, format_name = job
+
+    try:
+        if input_format(config_path, format_name) == CONFIG_FORMAT:
+            movie_args = generate_movie_args(get_config(
+                config_path, VALID_CONFIG_KEYS, fast=fast_config))
+        else:
+            movie_args = read_movie_args(config_path, format_name)
+        movies = MovieCollection(movie_args)
+
+        with atomic_open(page_path) as page_file:
+            if virtual:
+                stream_virtual_page(movies, page_file, get_templates())
+            else:
+                stream_movies_page(movies, page_file, get_templates())
+    except ConfigError as e:
+        return 0, e.details.strip('\n')
+    except UnicodeDecodeError as e:
+        return 0, 'The file is not valid UTF-8: {0}'.format(e)
+    except (ParsingError, IOError, OSError, ValueError) as e:
+        return 0, '{0}'.format(e) or type(e).__name__
+
+    return len(movies), None
+
+
+def build_configs(config_paths, out_dir, fast_config=False, virtual=False,
+                  format_name=None, max_workers=None):
+    """Build a page for each config file, in parallel.
+
+    Args:
+        config_paths (list[str]): The paths of the config files.
+        out_dir (str): The directory in which to write the pages.  It is
+                       created if it doesn't exist.
+        fast_config (bool): Whether to read config files with `FastConfig`.
+        virtual (bool): Whether to build virtual pages (see
+                        `render.stream_virtual_page()`).
+        format_name (Optional[str]): The format of every file, if it
+            shouldn't be told from each file's extension.
+        max_workers (Optional[int]): The maximum number of processes to use.
+                                     1 builds every page in the current
+                                     process.
+
+    Returns:
+        BatchResult: The pages which were built, and the errors of the
+                     config files which couldn't be built.
+
+    Raises:
+        ValueError: Raised if two config files would have the same page.
+        IOError: Raised if a template can't be read, or if the output
+                 directory can't be created.
+    """
+    paths = page_paths(config_paths, out_dir)
+
+    # Compile the templates before any workers are forked
+    get_templates()
+
+    if not os.path.isdir(out_dir):
+        os.makedirs(out_dir)
+
+    jobs = [(config_path, page_path, fast_config, virtual, format_name)
+            for config_path, page_path in zip(config_paths, paths)]
+
+    if ProcessPoolExecutor is None or len(jobs) < 2 or max_workers == 1:
+        outcomes = [build_page(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers) as executor:
+            outcomes = list(executor.map(build_page, jobs))
+
+    pages = []
+    errors = OrderedDict()
+    for (config_path, page_path, _, _, _), (movie_count, error) in zip(
+            jobs, outcomes):
+        if error is None:
+            pages.append((config_path, page_path, movie_count))
+        else:
+            errors[config_path] = error
+
+    return BatchResult(pages, errors)
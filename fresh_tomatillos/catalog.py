@@ -0,0 +1,376 @@
+# -*- coding: utf-8 -*-
+"""
+fresh_tomatillos.catalog
+~~~~~~~~~~~~~~~~~~~~~~~~
+
+Implements a persistent catalog of movies, stored in an SQLite database.
+
+A catalog is kept in sync with a config (or other movie data) file by
+`CatalogStore.sync()`, which only writes the movies that were added,
+changed or removed since the last sync, all in one transaction.  Movies
+are keyed by title, so (as with config sections) a title which appears
+more than once is stored once, with its last values.  The key of the file
+which was synced last is stored too, so an unchanged file doesn't need to
+be read at all.
+
+Movies are read back one batch at a time, in the order in which they
+appear in the file, optionally limited to a page of movies or to the
+movies changed since a given time.  Other programs may also write to the
+`movies` table directly, and build pages from it without any config file:
+
+    title       TEXT PRIMARY KEY
+    summary     TEXT
+    poster_url  TEXT
+    youtube_id  TEXT
+    position    INTEGER  (the order of the movies on the page; only the
+                          order matters, so positions may have gaps or
+                          be negative)
+    updated_at  REAL     (when the movie was added or last changed, in
+                          seconds since the epoch)
+"""
+
+from __future__ import unicode_literals
+import sqlite3
+import time
+from collections import namedtuple
+
+from fresh_tomatillos.catalog_cache import CatalogKey
+
+
+SCHEMA_VERSION = 1
+BATCH_SIZE = 10000
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS movies (
+    title TEXT PRIMARY KEY NOT NULL,
+    summary TEXT NOT NULL,
+    poster_url TEXT NOT NULL,
+    youtube_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS movies_position ON movies (position, title);
+CREATE INDEX IF NOT EXISTS movies_updated_at ON movies (updated_at);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY NOT NULL,
+    value
+);
+'''
+
+INSERT_MOVIE = '''
+INSERT OR IGNORE INTO movies
+    (title, summary, poster_url, youtube_id, position, updated_at)
+VALUES (?, ?, ?, ?, ?, ?)
+'''
+
+# Only touch a row if one of its values actually changed, and only count a
+# movie as changed (stamping it) if its content did, not its position
+UPDATE_MOVIE = '''
+UPDATE movies
+SET summary = ?, poster_url = ?, youtube_id = ?, updated_at = ?
+WHERE title = ? AND (summary IS NOT ? OR poster_url IS NOT ? OR
+                     youtube_id IS NOT ?)
+'''
+MOVE_MOVIE = '''
+UPDATE movies SET position = ? WHERE title = ? AND position IS NOT ?
+'''
+
+SELECT_MOVIES = '''
+SELECT title, summary, poster_url, youtube_id FROM movies
+WHERE updated_at >= ?
+ORDER BY position, title
+LIMIT ? OFFSET ?
+'''
+
+SOURCE_META_KEYS = ('source_path', 'source_size', 'source_mtime',
+                    'source_digest')
+
+
+# The outcome of CatalogStore.sync(): the number of movies in each state
+SyncResult = namedtuple('SyncResult',
+                        ['inserted', 'updated', 'deleted', 'unchanged'])
+
+
+class CatalogStore(object):
+    """A catalog of movies, stored in an SQLite database file.
+
+    A CatalogStore can be used as a context manager, which closes it.
+
+    Constructor Args:
+        path (str): The path of the database file.  It is created (along
+                    with its tables) if it doesn't exist.
+
+    Instance Attributes:
+        path (str): The path of the database file.
+
+    Raises:
+        sqlite3.Error: Raised if the file is not a usable catalog.
+    """
+
+    __slots__ = ['path', '_connection']
+
+    def __init__(self, path):
+        """Initialize a CatalogStore instance."""
+        self.path = path
+
+        # Transactions are managed explicitly, the same way in Python 2 and 3
+        self._connection = sqlite3.connect(path, isolation_level=None)
+        try:
+            self._connection.execute('PRAGMA journal_mode = WAL')
+            self._connection.execute('PRAGMA synchronous = NORMAL')
+            self._connection.executescript(SCHEMA)
+
+            version = self._meta('schema_version')
+            if version is None:
+                self._set_meta('schema_version', SCHEMA_VERSION)
+            elif version != SCHEMA_VERSION:
+                raise sqlite3.DatabaseError(
+                    'Unsupported catalog version: {0}'.format(version))
+        except sqlite3.Error:
+            self._connection.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Close the database file."""
+        self._connection.close()
+
+    def __len__(self):
+        """Return the number of movies in the catalog."""
+        return self._connection.execute(
+            'SELECT COUNT(*) FROM movies').fetchone()[0]
+
+    def _meta(self, key):
+        """Return a value from the meta table, or None if it isn't set."""
+        row = self._connection.execute(
+            'SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return None if row is None else row[0]
+
+    def _set_meta(self, key, value):
+        """Set a value in the meta table."""
+        self._connection.execute(
+            'INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)',
+            (key, value))
+
+    def source_key(self):
+        """Return the key of the file the catalog was last synced with.
+
+        Returns:
+            Optional[CatalogKey]: The key, or None if the catalog has never
+                                  been synced with a file.
+        """
+        values = [self._meta(key) for key in SOURCE_META_KEYS]
+        if None in values:
+            return None
+
+        path, size, mtime, digest = values
+        return CatalogKey(path, size, mtime, bytes(digest))
+
+    def is_current(self, key):
+        """Return whether the catalog was last synced with a file's contents.
+
+        Args:
+            key (CatalogKey): The current key of the file, as returned by
+                              `catalog_cache.catalog_key()`.
+
+        Returns:
+            bool: True if the file hasn't changed since the last sync.
+        """
+        return self.source_key() == key
+
+    def sync(self, movie_args, key=None):
+        """Make the catalog hold exactly the given movies.
+
+        New movies are inserted, and changed movies are updated, changing
+        their `updated_at` time, while unchanged movies are left alone.
+        Movies which only moved get a new position, without counting as
+        changed.  Movies which aren't given are deleted.  Rows are written
+        in batches, within a single transaction: if `movie_args` raises an
+        exception, the catalog is left as it was.
+
+        Positions are numbered from the first movie which was already in
+        the catalog, which keeps its position, so adding or removing movies
+        at the top doesn't rewrite the position of every other movie.
+
+        Args:
+            movie_args (Iterable[tuple[str, str, str, str]]): The arguments
+                for each movie, as yielded by `generate_movie_args()`.
+            key (Optional[CatalogKey]): The key of the file the movies were
+                                        read from, to be returned by
+                                        `source_key()`.
+
+        Returns:
+            SyncResult: The number of movies inserted, updated, deleted and
+                        left unchanged.
+
+        Raises:
+            sqlite3.Error: Raised if the catalog can't be written.
+        """
+        connection = self._connection
+        now = time.time()
+        inserted = 0
+        updated = 0
+        base = None  # Added to each movie's index to give its position
+
+        # The titles seen in this sync, to find the movies to delete
+        connection.execute('CREATE TEMP TABLE IF NOT EXISTS synced'
+                           ' (title TEXT PRIMARY KEY)')
+
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.execute('DELETE FROM temp.synced')
+
+            batch = []
+            for position, args in enumerate(movie_args):
+                batch.append((position, args))
+                if len(batch) == BATCH_SIZE:
+                    if base is None:
+                        base = self._position_base(batch)
+                    batch_inserted, batch_updated = self._write_batch(
+                        batch, now, base)
+                    inserted += batch_inserted
+                    updated += batch_updated
+                    batch = []
+
+            if base is None:
+                base = self._position_base(batch)
+            batch_inserted, batch_updated = self._write_batch(
+                batch, now, base)
+            inserted += batch_inserted
+            updated += batch_updated
+
+            changes = connection.total_changes
+            connection.execute('DELETE FROM movies WHERE title NOT IN'
+                               ' (SELECT title FROM temp.synced)')
+            deleted = connection.total_changes - changes
+
+            if key is None:
+                connection.execute(
+                    'DELETE FROM meta WHERE key IN ({0})'.format(
+                        ', '.join('?' * len(SOURCE_META_KEYS))),
+                    SOURCE_META_KEYS)
+            else:
+                path, size, mtime, digest = key
+                for meta_key, value in zip(SOURCE_META_KEYS, (
+                        path, size, mtime, sqlite3.Binary(digest))):
+                    self._set_meta(meta_key, value)
+
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+
+        # A repeated title may be counted as both inserted and updated
+        return SyncResult(inserted, updated, deleted,
+                          max(0, len(self) - inserted - updated))
+
+    def _position_base(self, batch):
+        """Return the number to add to each movie's index in a sync.
+
+        Args:
+            batch (list[tuple[int, tuple[str, str, str, str]]]): The index
+                and arguments of each movie in the first batch of the sync.
+
+        Returns:
+            int: The number which keeps the position of the first movie in
+                 `batch` which is already in the catalog, or 0 if there is
+                 none.
+        """
+        for index, args in batch:
+            row = self._connection.execute(
+                'SELECT position FROM movies WHERE title = ?',
+                (args[0],)).fetchone()
+            if row is not None:
+                return row[0] - index
+        return 0
+
+    def _write_batch(self, batch, now, base):
+        """Insert or update a batch of movies.
+
+        Args:
+            batch (list[tuple[int, tuple[str, str, str, str]]]): The index
+                and arguments of each movie.
+            now (float): The time at which the movies are updated.
+            base (int): The number to add to each index to give the movie's
+                        position.
+
+        Returns:
+            tuple[int, int]: The number of movies inserted and updated.
+        """
+        connection = self._connection
+
+        changes = connection.total_changes
+        connection.executemany(INSERT_MOVIE, [
+            (title, summary, poster_url, youtube_id, base + index, now)
+            for index, (title, summary, poster_url, youtube_id) in batch])
+        inserted = connection.total_changes - changes
+
+        changes = connection.total_changes
+        connection.executemany(UPDATE_MOVIE, [
+            (summary, poster_url, youtube_id, now,
+             title, summary, poster_url, youtube_id)
+            for _, (title, summary, poster_url, youtube_id) in batch])
+        updated = connection.total_changes - changes
+
+        connection.executemany(MOVE_MOVIE, [
+            (base + index, args[0], base + index) for index, args in batch])
+
+        connection.executemany(
+            'INSERT OR IGNORE INTO temp.synced (title) VALUES (?)',
+            [(args[0],) for _, args in batch])
+
+        return inserted, updated
+
+    def movie_args(self, offset=0, limit=None, updated_since=None):
+        """Yield the arguments for movies in the catalog, in page order.
+
+        Movies are fetched from the database a batch at a time, so the
+        whole catalog is never held in memory.  The catalog shouldn't be
+        synced until the iterator is exhausted.
+
+        Args:
+            offset (int): The number of movies to skip.
+            limit (Optional[int]): The maximum number of movies to yield.
+            updated_since (Optional[float]): If given, only yield movies
+                added or changed at or after this time (in seconds since
+                the epoch).
+
+        Yields:
+            tuple[str, str, str, str]: The arguments for each movie, as
+                                       yielded by `generate_movie_args()`.
+        """
+        cursor = self._connection.execute(SELECT_MOVIES, (
+            updated_since if updated_since is not None else float('-inf'),
+            limit if limit is not None else -1, offset))
+
+        try:
+            while True:
+                rows = cursor.fetchmany(BATCH_SIZE)
+                if not rows:
+                    break
+                for row in rows:
+                    yield row
+        finally:
+            cursor.close()
+
+    def count(self, updated_since=None):
+        """Return the number of movies, optionally only those changed lately.
+
+        Args:
+            updated_since (Optional[float]): If given, only count movies
+                added or changed at or after this time.
+
+        Returns:
+            int: The number of movies.
+        """
+        if updated_since is None:
+            return len(self)
+
+        return self._connection.execute(
+            'SELECT COUNT(*) FROM movies WHERE updated_at >= ?',
+            (updated_since,)).fetchone()[0]
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""
+fresh_tomatillos.catalog_cache
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+Implements a persistent cache of parsed, validated and normalized movie
+arguments, so an unchanged config file doesn't need to be parsed again.
+
+Each config file gets its own cache file, stored in a compact binary format
+which is loaded with a single memory-mapped read:
+
+    header:  magic, format version, config size, config mtime,
+             SHA-1 digest of the config contents, movie count, lengths of
+             the config path, package version and data blob
+    strings: the config path and package version, encoded as UTF-8
+    data:    every movie's (title, summary, poster_url, youtube_id) fields,
+             joined by NUL characters and encoded as UTF-8
+"""
+
+from __future__ import unicode_literals
+import hashlib
+import io
+import mmap
+import os
+import struct
+from collections import namedtuple
+
+from fresh_tomatillos import __version__
+from fresh_tomatillos.output import atomic_open
+
+
+MAGIC = b'FTMC'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sHQd20sIHHQ')
+FIELD_SEPARATOR = '\0'
+FIELDS_PER_MOVIE = 4
+CHUNK_SIZE = 1 << 20
+
+
+CatalogKey = namedtuple('CatalogKey', ['path', 'size', 'mtime', 'digest'])
+
+
+def cache_dir():
+    """Return the directory in which fresh_tomatillos stores cache files.
+
+    The directory is `$FRESH_TOMATILLOS_CACHE_DIR` if that is set, or else
+    a `fresh_tomatillos` directory in `$XDG_CACHE_HOME` (`~/.cache`).
+
+    Returns:
+        str: The path of the cache directory (which may not exist yet).
+    """
+    path = os.environ.get('FRESH_TOMATILLOS_CACHE_DIR')
+    if path:
+        return path
+
+    base = (os.environ.get('XDG_CACHE_HOME') or
+            os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(base, 'fresh_tomatillos')
+
+
+def _cache_path(config_path):
+    """Return the path of the cache file for a given config file.
+
+    Args:
+        config_path (str): The absolute path of a config file.
+
+    Returns:
+        str: The path of its cache file.
+    """
+    name = hashlib.sha1(config_path.encode('utf-8')).hexdigest() + '.bin'
+    return os.path.join(cache_dir(), 'catalogs', name)
+
+
+def catalog_key(config_path):
+    """Return the key identifying the current contents of a config file.
+
+    Args:
+        config_path (str): The path of a config file.
+
+    Returns:
+        CatalogKey: The absolute path, size, modification time and content
+                    digest of the config file.
+
+    Raises:
+        IOError: Raised if the config file can't be read.
+    """
+    config_path = os.path.abspath(config_path)
+    digest = hashlib.sha1()
+
+    with io.open(config_path, 'rb') as config_file:
+        stat = os.fstat(config_file.fileno())
+        for chunk in iter(lambda: config_file.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+
+    return CatalogKey(config_path, stat.st_size, stat.st_mtime,
+                      digest.digest())
+
+
+def load_catalog(key):
+    """Return the cached movie arguments for a config file, if still valid.
+
+    Args:
+        key (CatalogKey): The current key of the config file.
+
+    Returns:
+        Optional[list[tuple[str, str, str, str]]]: The arguments for each
+            movie, as yielded by `generate_movie_args()`, or None if there
+            is no usable cache for `key`.
+    """
+    try:
+        with io.open(_cache_path(key.path), 'rb') as cache_file:
+            data = mmap.mmap(cache_file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (IOError, OSError, ValueError):
+        return None  # Missing or empty cache file
+
+    try:
+        (magic, format_version, size, mtime, digest, count, path_length,
+         version_length, data_length) = HEADER.unpack_from(data)
+
+        if (magic != MAGIC or format_version != FORMAT_VERSION or
+                (size, mtime, digest) != key[1:]):
+            return None
+
+        offset = HEADER.size
+        strings = data[offset:offset + path_length + version_length]
+        if strings != (key.path + __version__).encode('utf-8'):
+            return None
+
+        offset += path_length + version_length
+        fields = data[offset:offset + data_length].decode('utf-8').split(
+            FIELD_SEPARATOR)
+    except (struct.error, UnicodeDecodeError):
+        return None
+    finally:
+        data.close()
+
+    if count == 0:
+        return []
+
+    if len(fields) != count * FIELDS_PER_MOVIE:
+        return None
+
+    # Group the flat list of fields into one tuple per movie
+    return list(zip(*[iter(fields)] * FIELDS_PER_MOVIE))
+
+
+def save_catalog(key, movie_args):
+    """Store movie arguments in the cache for a config file.
+
+    Args:
+        key (CatalogKey): The key of the config file the movie arguments
+                          were read from.
+        movie_args (Iterable[tuple[str, str, str, str]]): The arguments for
+            each movie, as yielded by `generate_movie_args()`.
+
+    Returns:
+        bool: True if the cache was written, or False if the data can't be
+              stored (a value contains a NUL character).
+
+    Raises:
+        IOError: Raised if the cache file can't be written.
+    """
+    movie_args = list(movie_args)
+    fields = [field for args in movie_args for field in args]
+
+    if any(FIELD_SEPARATOR in field for field in fields):
+        return False
+
+    path = _cache_path(key.path)
+    config_path = key.path.encode('utf-8')
+    version = __version__.encode('utf-8')
+    data = FIELD_SEPARATOR.join(fields).encode('utf-8')
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, key.size, key.mtime,
+                         key.digest, len(movie_args), len(config_path),
+                         len(version), len(data))
+
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    with atomic_open(path, binary=True) as cache_file:
+        cache_file.write(header + config_path + version + data)
+
+    return True
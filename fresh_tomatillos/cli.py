@@ -7,13 +7,87 @@ Implements the command-line interface for fresh_tomatillos.
 
 
 Usage:
-  fresh_tomatillos
-  fresh_tomatillos <file_path>
+  fresh_tomatillos [options]
+  fresh_tomatillos [options] <file_path>
+  fresh_tomatillos build --out-dir=DIR [options] <config>...
   fresh_tomatillos -v | --version
   fresh_tomatillos -h | --help
 
 Where:
   <file_path> is a path to a config file from which to read movie data.
+  It may be left out when --catalog is used, to build the page from the
+  catalog as it is.
+  <config> is a movie data file, a directory of them, or a glob pattern.
+  The build command writes a page for each config file to DIR, naming
+  each after its config file, and reports every config file's errors at
+  the end.  It accepts the --fast-config, --format, --virtual and --jobs
+  options.
+
+Options:
+  -o, --output=PATH
+                 Write the page to PATH (default: fresh_tomatillos.html in
+                 the package directory), or with --page-size, write the
+                 pages to the directory PATH.  A page whose content didn't
+                 change isn't written again.
+  --compress     Also write gzip (and brotli, if the brotli package is
+                 installed) compressed copies of the page(s), such as
+                 page.html.gz, for web servers to send as they are.
+  --cache        Cache the movie data read from the config file, and skip
+                 reading it again until the file changes.
+  --catalog=FILE Keep the movie data in an SQLite catalog at FILE, which is
+                 only updated where the config file changed, and build the
+                 page from the catalog.
+  --fast-config  Read the config file with the single-pass reader, which is
+                 much faster for very large files.
+  --format=FMT   The format of the movie data file: cfg (a config file),
+                 jsonl (JSON Lines) or csv.  By default, .jsonl, .ndjson
+                 and .csv files are read as JSON Lines or CSV, and any
+                 other file as a config file.
+  --incremental  Reuse the rendered movies from the previous build for any
+                 movie whose config section hasn't changed.
+  --page-size=N  Split the movies across pages of at most N movies each,
+                 plus an index page linking to every page.
+  --jobs=N       Use at most N processes to render pages (default: one per
+                 CPU).
+  --virtual      Embed the movie data in the page and only create tiles as
+                 they scroll into view, for very large single pages.
+  --search       Add a search box which filters the movies as you type,
+                 using a search index written next to the page.
+  --minify       Minify the HTML, CSS and JavaScript of the page(s).
+  --hashed-assets
+                 Write the CSS and JavaScript to files named after a hash
+                 of their content, which browsers may cache forever,
+                 instead of including them in the page.
+  --standalone   Include small replacements for jQuery and Bootstrap in
+                 the page(s) instead of loading them from CDNs, so pages
+                 render sooner and work without network access.  The CSS
+                 needed for the first paint is always inlined.
+  --trailer-facade
+                 Show each trailer's thumbnail and a play button, and only
+                 load YouTube's player (once, for every trailer) when it
+                 is pressed, instead of embedding the player right away.
+  --offline      Write a service worker which keeps the page(s), their
+                 CSS and JavaScript and the posters in the browser's
+                 cache, for fast repeat visits and offline use.  Only
+                 works for pages served over HTTP, such as with --serve.
+  --mirror-posters
+                 Download the poster images next to the page, and use the
+                 local copies.  Unchanged posters aren't downloaded again.
+  --thumbnails   Save small copies of local (or mirrored) posters for the
+                 page to load instead of the full-size images.  Requires
+                 the Pillow package.
+  --watch        Keep running, and rebuild the page whenever the config
+                 file or a template changes.  Press Ctrl+C to stop.
+  --serve        Serve the page over HTTP (with compression and caching)
+                 instead of opening it as a file.  Press Ctrl+C to stop.
+  --port=N       The port to serve the page on (default: 8000).
+  --bind=ADDR    The address to serve the page on (default: 127.0.0.1).
+                 Use 0.0.0.0 to share the page with other computers.
+  --out-dir=DIR  The directory in which the build command writes pages.
+  --profile      Print the time and memory used by each phase of the build.
+  --profile-json=FILE
+                 Append the time and memory used by each phase of the build
+                 to FILE as JSON lines (use - for stdout).
 
 Config File Format:
   [Movie Title]
@@ -24,6 +98,8 @@ Config File Format:
 Config File notes:
  - `youtube` value may also be a full YouTube URL.
  - Any number of movie sections may be included in a single config file.
+ - Movie data may also be read from a JSON Lines or CSV file, in which
+   each record has the keys (or columns) title, summary, poster and youtube.
 """
 
 from __future__ import print_function, unicode_literals
@@ -31,14 +107,12 @@ import errno
 import io
 import os
 import sys
-import webbrowser
 
 from fresh_tomatillos import __version__
-from fresh_tomatillos.exceptions import InvalidConfigKeys, InvalidVideoID
-from fresh_tomatillos.get_config import get_config
-from fresh_tomatillos.media import Movie
-from fresh_tomatillos.movie_args import generate_movie_args
-from fresh_tomatillos.render import compile_movies_page
+
+# Everything else is imported by the functions which need it, so that
+# `--help` and `--version` (and scripted builds) start quickly.  See
+# benchmarks/check_startup.py.
 
 
 try:
@@ -49,6 +123,18 @@ except NameError:
 
 
 USAGE = __doc__.split('\n\n\n')[1]
+FLAG_OPTIONS = frozenset(['--cache', '--compress', '--fast-config',
+                          '--hashed-assets',
+                          '--incremental', '--minify', '--mirror-posters',
+                          '--offline', '--profile', '--search', '--serve',
+                          '--standalone', '--thumbnails',
+                          '--trailer-facade', '--virtual', '--watch'])
+VALUE_OPTIONS = frozenset(['--bind', '--catalog', '--format', '--jobs',
+                           '--out-dir', '--output', '--page-size', '--port',
+                           '--profile-json'])
+SHORT_OPTIONS = {'-o': '--output'}
+BUILD_OPTIONS = frozenset(['--fast-config', '--format', '--jobs',
+                           '--out-dir', '--virtual'])
 VERSION = 'Fresh Tomatillos ' + __version__
 DIRNAME = os.path.dirname(os.path.abspath(__file__))
 
@@ -74,43 +160,392 @@ def print_err(message):
     print(str(message), file=sys.stderr)
 
 
-def main(argv=None):
-    """Display movie trailer page in a browser using data from config file.
+def _parse_args(argv):
+    """Separate command line options from positional arguments.
+
+    Options which take a value may be written as `--option value` or as
+    `--option=value`.  Short options (see `SHORT_OPTIONS`) are stored under
+    their long names.
 
     Args:
-        argv (list): An optional list to use in place of `sys.argv[1:]`.
+        argv (list[str]): The command line arguments.
 
     Returns:
-        int: A return code, 0 or 1, to pass to `sys.exit()`.
+        tuple[list[str], dict]: The positional arguments, followed by a dict
+            mapping each option that was passed to its value (True for
+            options which don't take a value).
+
+    Raises:
+        ValueError: Raised if an unrecognized option is passed, or if an
+                    option is missing its value.
     """
-    # Get command line arguments
-    if argv is None:
-        argv = sys.argv[1:]
+    args = []
+    options = {}
+    argv = iter(argv)
+
+    for arg in argv:
+        name, equals, value = arg.partition('=')
+        name = SHORT_OPTIONS.get(name, name)
+
+        if arg in FLAG_OPTIONS:
+            options[arg] = True
+        elif name in VALUE_OPTIONS:
+            if not equals:
+                value = next(argv, None)
+                if value is None:
+                    raise ValueError('Missing a value for option: ' + name)
+            options[name] = value
+        elif arg.startswith('-') and arg != '-':
+            raise ValueError('Unrecognized option: ' + arg)
+        else:
+            args.append(arg)
 
-    # Did the user ask for help?
-    if any(arg in ('-h', '--help') for arg in argv):
-        print(VERSION + '\n\n' + USAGE)
-        return 0
+    return args, options
 
-    # Did the user ask for the version?
-    if any(arg in ('-v', '--version') for arg in argv):
-        print(VERSION)
-        return 0
 
-    # Did the user pass to many arguments?
-    if len(argv) > 1:
-        print_err('Whoops, fresh_tomatillos only accepts 1 argument.\n')
-        print_err('USAGE INFO')
-        return 1
+def _positive_int_option(options, name):
+    """Return the value of an option as a positive integer, if it was passed.
+
+    Args:
+        options (dict): Options returned by `_parse_args()`.
+        name (str): The name of the option, such as '--jobs'.
+
+    Returns:
+        Optional[int]: The option's value, or None if it wasn't passed.
+
+    Raises:
+        ValueError: Raised if the value is not a positive integer.
+    """
+    if name not in options:
+        return None
+
+    try:
+        value = int(options[name])
+    except ValueError:
+        value = 0
+
+    if value < 1:
+        raise ValueError('Expected a positive whole number for option {0},'
+                         ' but got: {1}'.format(name, options[name]))
+
+    return value
+
+
+def _print_template_error(error):
+    """Print a message describing a failure to read a template file.
+
+    Args:
+        error (EnvironmentError): The exception raised while reading.
+    """
+    if error.errno == errno.ENOENT:
+        print_err('Unable to find template file: ' + error.filename)
+    elif error.errno == errno.EACCES:
+        print_err("Insufficient permissions to read template file: " +
+                  error.filename)
+    elif error.errno == errno.EISDIR:
+        print_err('Expected a template file, but found a directory: ' +
+                  error.filename)
+    else:
+        # TODO raise error instead, or optionally provide the stack trace
+        print_err(error)
+
+
+def _print_output_error(error):
+    """Print a message describing a failure to write an output file.
+
+    Args:
+        error (EnvironmentError): The exception raised while writing.
+    """
+    if error.errno == errno.EACCES:
+        print_err("Fresh Tomatillos couldn't write the output file: " +
+                  error.filename)
+    # TODO raise error or optionally provide the stack trace
+    print_err(error)
+
+
+def _open_in_browser(url):
+    """Open a URL in the browser (in a new tab, if possible).
+
+    Args:
+        url (str): The URL to open.
+    """
+    # webbrowser is slow to import, so only import it when it's needed
+    import webbrowser
+    webbrowser.open_new_tab(url)
+
+
+def _page_path(options):
+    """Return the absolute path of the (single) page to write.
 
-    # Load settings from the config file
-    config_path = argv[0] if argv else _module_path('sample.cfg')
-    valid_config_keys = ('summary', 'poster', 'youtube')
+    Args:
+        options (dict): Options returned by `_parse_args()`.
+
+    Returns:
+        str: The path passed with --output, or by default, the path of
+             `fresh_tomatillos.html` in our package directory.
+    """
+    return os.path.abspath(
+        options.get('--output') or _module_path('fresh_tomatillos.html'))
+
+
+def _make_server(output_path, options):
+    """Create an HTTP server for the generated page(s).
+
+    Args:
+        output_path (str): The path of the generated (index) HTML file.
+        options (dict): Options returned by `_parse_args()`.
+
+    Returns:
+        Optional[ArtifactServer]: The server, or None if it couldn't be
+                                  started (in which case an error message
+                                  has been printed).
+    """
+    from fresh_tomatillos.serve import (
+        DEFAULT_HOST, DEFAULT_PORT, ArtifactStore, make_server)
+
+    output_dir, output_name = os.path.split(output_path)
+
+    subdirs = []
+    if options.get('--mirror-posters'):
+        from fresh_tomatillos.posters import POSTERS_DIRNAME
+        subdirs.append(POSTERS_DIRNAME)
+    if options.get('--thumbnails'):
+        from fresh_tomatillos.thumbnails import THUMBNAILS_DIRNAME
+        subdirs.append(THUMBNAILS_DIRNAME)
+    if options.get('--hashed-assets'):
+        from fresh_tomatillos.assets import ASSETS_DIRNAME
+        subdirs.append(ASSETS_DIRNAME)
+
+    if options.get('--page-size'):
+        # Serve every page and asset of the paged site
+        store = ArtifactStore(output_dir, output_name, subdirs=subdirs)
+    else:
+        names = [output_name]
+        if options.get('--search'):
+            from fresh_tomatillos.search import search_index_path
+            names.append(search_index_path(output_name))
+        if options.get('--offline'):
+            from fresh_tomatillos.offline import service_worker_path
+            names.append(service_worker_path(output_name))
+        store = ArtifactStore(output_dir, output_name, names=names,
+                              subdirs=subdirs)
+
+    host = options.get('--bind', DEFAULT_HOST)
+    port = _positive_int_option(options, '--port') or DEFAULT_PORT
+
+    try:
+        return make_server(store, host, port)
+    except (IOError, OSError) as e:
+        print_err('Unable to serve the page at {0}:{1}: {2}'.format(
+            host, port, e))
+        return None
+
+
+def _watch(config_path, output_path, options, server=None):
+    """Build the movies page, then rebuild it until the user interrupts.
+
+    The page is opened in the browser after the first successful build
+    only, so rebuilds don't open new tabs.
+
+    Args:
+        config_path (str): The path of the config file.
+        output_path (str): The path of the generated HTML file.
+        options (dict): Options returned by `_parse_args()`.
+        server (Optional[ArtifactServer]): A server for the generated page,
+            to run in the background while watching.
+
+    Returns:
+        int: A return code to pass to `sys.exit()`.
+    """
+    import threading
+    from fresh_tomatillos.serve import server_url
+    from fresh_tomatillos.watch import watch
+
+    if server is None:
+        url = 'file://' + output_path
+    else:
+        url = server_url(server)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        print('Serving the page at ' + url)
+
+    opened = []
+
+    def on_build(report):
+        print('Built {0} in {1:.1f} ms (rendered {2} of {3} movies)'.format(
+            output_path, report.seconds * 1000, report.rendered_count,
+            report.movie_count))
+
+        if not opened:
+            opened.append(True)
+            _open_in_browser(url)
+
+    def on_error(error):
+        if isinstance(error, UnicodeDecodeError):
+            print_err('The file is not valid UTF-8: {0}'.format(error))
+        else:
+            print_err(getattr(error, 'message', error))
+
+    print('Watching {0} for changes.  Press Ctrl+C to stop.'.format(
+        config_path))
     try:
-        config = get_config(config_path, valid_config_keys)
+        watch(config_path, output_path,
+              fast_config=options.get('--fast-config', False),
+              virtual=options.get('--virtual', False),
+              on_build=on_build, on_error=on_error)
+    except KeyboardInterrupt:
+        print('Stopped watching.')
+    finally:
+        if server is not None:
+            server.server_close()
+
+    return 0
+
+
+def _serve(server):
+    """Open the page from a server, then serve it until interrupted.
+
+    Args:
+        server (ArtifactServer): A server for the generated page.
+
+    Returns:
+        int: A return code to pass to `sys.exit()`.
+    """
+    from fresh_tomatillos.serve import server_url
+
+    url = server_url(server)
+    print('Serving the page at {0}  Press Ctrl+C to stop.'.format(url))
+    _open_in_browser(url)
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print('Stopped serving.')
+    finally:
+        server.server_close()
+
+    return 0
+
+
+def _build(config_path, options, page_size=None, jobs=None):
+    """Build the movies page(s) from a config file.
+
+    Each phase of the build is recorded by the active profiler, if any.
+
+    Args:
+        config_path (Optional[str]): The path of the config file, or None
+                                     to build from the catalog (with
+                                     `--catalog`) as it is.
+        options (dict): Options returned by `_parse_args()`.
+        page_size (Optional[int]): The maximum number of movies per page, if
+                                   the movies are split across pages.
+        jobs (Optional[int]): The maximum number of processes to use.
+
+    Returns:
+        Optional[tuple[str, MovieCollection]]: The path of the generated
+            (index) HTML file and the movies on the page(s), or None if the
+            build failed (in which case an error message has been printed).
+    """
+    from fresh_tomatillos import profiling
+    from fresh_tomatillos.exceptions import ConfigError, InvalidConfigKeys
+    from fresh_tomatillos.get_config import get_config
+    from fresh_tomatillos.media import MovieCollection
+    from fresh_tomatillos.movie_args import generate_movie_args
+    from fresh_tomatillos.readers import (
+        CONFIG_FORMAT, input_format, read_movie_args)
+    from fresh_tomatillos.output import output_file
+    from fresh_tomatillos.render import (
+        INDEX_FILENAME, get_templates, stream_movies_page,
+        stream_virtual_page, write_movies_page, write_paged_site)
+
+    if config_path is not None:
+        data_format = input_format(config_path, options.get('--format'))
+    incremental = options.get('--incremental', False)
+    if incremental:
+        from fresh_tomatillos.incremental import (
+            BuildManifest, build_movie_tiles, manifest_path,
+            reuse_movie_tiles, templates_fingerprint)
+    if options.get('--cache') or options.get('--catalog'):
+        from fresh_tomatillos.catalog_cache import (
+            catalog_key, load_catalog, save_catalog)
+
+    # Errors from the catalog's database, if one is used
+    catalog_errors = ()
+    if options.get('--catalog'):
+        import sqlite3
+        from fresh_tomatillos.catalog import CatalogStore
+        catalog_errors = (sqlite3.Error,)
+
+    # Load the compiled templates before touching the output file
+    minify = options.get('--minify', False)
+    standalone = options.get('--standalone', False)
+    compress = options.get('--compress', False)
+    try:
+        with profiling.phase('load_templates'):
+            templates = get_templates(
+                minify, standalone, options.get('--trailer-facade', False))
+    except (IOError, OSError) as e:
+        _print_template_error(e)
+        return None
+
+    # Unless told otherwise, create output in our package directory so we
+    # don't take the chance of overwriting the user's files
+    if page_size:
+        output_dir = os.path.abspath(
+            options.get('--output') or _module_path('fresh_tomatillos_pages'))
+        output_path = os.path.join(output_dir, INDEX_FILENAME)
+    else:
+        output_path = _page_path(options)
+        output_dir = os.path.dirname(output_path)
+
+    try:
+        if not os.path.isdir(output_dir):
+            os.makedirs(output_dir)
+    except OSError as e:
+        _print_output_error(e)
+        return None
+
+    if incremental:
+        with profiling.phase('load_manifest'):
+            previous = BuildManifest.load(
+                manifest_path(output_path),
+                templates_fingerprint(templates))
+
+    # Load movie data from the catalog cache, if it's enabled and current
+    # Or from the catalog, if there's no config file or it hasn't changed
+    cache_key = None
+    movie_args = None
+    store = None
+    try:
+        if options.get('--cache'):
+            with profiling.phase('load_catalog'):
+                cache_key = catalog_key(config_path)
+                movie_args = load_catalog(cache_key)
+        elif options.get('--catalog'):
+            with profiling.phase('load_catalog'):
+                store = CatalogStore(options['--catalog'])
+                if config_path is not None:
+                    cache_key = catalog_key(config_path)
+                if config_path is None or store.is_current(cache_key):
+                    movie_args = store.movie_args()
+        from_cache = movie_args is not None
+
+        # Otherwise, load settings from the config file
+        if not from_cache and data_format == CONFIG_FORMAT:
+            valid_config_keys = ('summary', 'poster', 'youtube')
+            with profiling.phase('read_config'):
+                config = get_config(config_path, valid_config_keys,
+                                    fast=options.get('--fast-config', False))
+
+        # Or open a movie data file, whose records are read one at a time
+        # as the movies are built (without holding the whole file)
+        elif not from_cache:
+            with profiling.phase('read_config'):
+                movie_args = read_movie_args(config_path, data_format)
     except InvalidConfigKeys as e:
         print_err(e.message)
-        return 1
+        return None
     except (IOError, OSError) as e:
         if e.errno == errno.ENOENT:
             print_err('The specified filename was not found: ' + e.filename)
@@ -121,54 +556,455 @@ def main(argv=None):
         else:
             # TODO raise e instead, or optionally provide the stack trace
             print_err(e)
-        return 1
-
-    # Compile our list of Movie instances
+        return None
+    except catalog_errors as e:
+        print_err('Unable to read the catalog {0}: {1}'.format(
+            options['--catalog'], e))
+        return None
+
+    # Write only the movies which changed to the catalog, then read the
+    # movies back from it
+    synced = None
     try:
-        movies = [Movie(*args) for args in generate_movie_args(config)]
-    except InvalidVideoID as e:
+        if store is not None and not from_cache:
+            with profiling.phase('sync_catalog'):
+                if movie_args is None:
+                    movie_args = generate_movie_args(config)
+                synced = store.sync(movie_args, cache_key)
+                profiling.count('rows_written', synced.inserted +
+                                synced.updated + synced.deleted)
+            movie_args = store.movie_args()
+    except ConfigError as e:
         print_err(e.message)
-        return 1
+        return None
+    except catalog_errors as e:
+        print_err('Unable to update the catalog {0}: {1}'.format(
+            options['--catalog'], e))
+        return None
+
+    # Compile our collection of movies
+    # In incremental mode, also collect their tiles, reusing unchanged ones
+    try:
+        with profiling.phase('build_movies'):
+            if movie_args is not None and incremental:
+                movies, tiles, manifest, rebuilt = reuse_movie_tiles(
+                    movie_args, templates, previous)
+            elif movie_args is not None:
+                movies = MovieCollection(movie_args)
+            elif incremental:
+                movies, tiles, manifest, rebuilt = build_movie_tiles(
+                    config, templates, previous)
+            else:
+                movies = MovieCollection(generate_movie_args(config))
+            profiling.count('movies', len(movies))
+    except ConfigError as e:
+        print_err(e.message)
+        return None
+    except catalog_errors as e:
+        print_err('Unable to read the catalog {0}: {1}'.format(
+            options['--catalog'], e))
+        return None
+    finally:
+        if store is not None:
+            store.close()
+
+    if synced is not None:
+        print('Updated the catalog: {0} movies added, {1} changed and {2}'
+              ' removed.'.format(synced.inserted, synced.updated,
+                                 synced.deleted))
+
+    # Update the catalog cache if it was out of date
+    if options.get('--cache') and not from_cache:
+        try:
+            with profiling.phase('save_catalog'):
+                save_catalog(cache_key, ((movie.title, movie.summary,
+                                          movie.poster_url, movie.youtube_id)
+                                         for movie in movies))
+        except (IOError, OSError) as e:
+            print_err('Unable to update the catalog cache: ' + str(e))
+
+    # Download posters next to the output, and point the movies at them
+    if options.get('--mirror-posters'):
+        from fresh_tomatillos.posters import POSTERS_DIRNAME, mirror_posters
+
+        posters_dir = os.path.join(os.path.dirname(output_path),
+                                   POSTERS_DIRNAME)
+        try:
+            with profiling.phase('mirror_posters'):
+                mirrored = mirror_posters(movies, posters_dir)
+        except (IOError, OSError) as e:
+            _print_output_error(e)
+            return None
+
+        for url in sorted(mirrored.errors):
+            print_err('Unable to mirror poster {0}: {1}'.format(
+                url, mirrored.errors[url]))
+        print('Mirrored {0} posters ({1} downloaded, {2} unchanged).'.format(
+            len(mirrored.files), mirrored.downloaded, mirrored.not_modified))
+
+    # Downscale local posters, and list the copies in each movie's tile
+    if options.get('--thumbnails'):
+        from fresh_tomatillos.thumbnails import add_thumbnails
+
+        try:
+            with profiling.phase('thumbnails'):
+                result = add_thumbnails(
+                    movies, os.path.dirname(output_path), jobs)
+        except (IOError, OSError) as e:
+            _print_output_error(e)
+            return None
+
+        for path in sorted(result.errors):
+            print_err('Unable to create thumbnails for poster {0}: {1}'
+                      .format(path, result.errors[path]))
+        print('Added thumbnails for {0} posters.'.format(
+            result.thumbnail_count))
+
+    # Write the search index next to the page, for the page to load
+    search_url = None
+    if options.get('--search'):
+        from fresh_tomatillos.search import write_search_index
+
+        try:
+            with profiling.phase('search_index'):
+                index_path, index, index_size = write_search_index(
+                    movies, output_path)
+                profiling.count('terms', len(index.terms))
+                profiling.count('bytes_written', index_size)
+        except (IOError, OSError) as e:
+            _print_output_error(e)
+            return None
+        search_url = os.path.basename(index_path)
+
+    # Write the page's CSS and JavaScript once, under content-hashed names
+    asset_urls = None
+    if options.get('--hashed-assets') and not page_size:
+        from fresh_tomatillos.assets import write_hashed_assets
+
+        try:
+            with profiling.phase('write_assets'):
+                asset_urls, asset_paths = write_hashed_assets(
+                    templates.page_assets(options.get('--virtual', False),
+                                          search_url is not None),
+                    os.path.dirname(output_path))
+                profiling.count('files_written', len(asset_paths))
+        except (IOError, OSError) as e:
+            _print_output_error(e)
+            return None
+
+    service_worker_url = None
+    if options.get('--offline') and not page_size:
+        from fresh_tomatillos.offline import service_worker_path
+        service_worker_url = os.path.basename(
+            service_worker_path(output_path))
 
     # Uncomment this line for repr output
     # TODO add a command line option for this
     # print(repr(movies))
 
-    # Get HTML for the movies page
+    # Write HTML for the movies page(s) to disk, one movie tile at a time
     try:
-        page_content = compile_movies_page(movies)
+        with profiling.phase('render_page'):
+            if page_size:
+                written_paths = write_paged_site(
+                    movies, output_dir, page_size,
+                    tiles if incremental else None, jobs, minify,
+                    options.get('--hashed-assets', False), standalone,
+                    options.get('--offline', False), compress,
+                    options.get('--trailer-facade', False))
+            else:
+                with output_file(output_path, compress) as page_file:
+                    writer = profiling.timed_writer(page_file)
+                    if options.get('--virtual'):
+                        stream_virtual_page(movies, writer, templates,
+                                            search_url, asset_urls,
+                                            service_worker_url)
+                    elif incremental:
+                        write_movies_page(tiles, writer, templates,
+                                          search_url, asset_urls,
+                                          service_worker_url)
+                    else:
+                        stream_movies_page(movies, writer, templates,
+                                           search_url, asset_urls,
+                                           service_worker_url)
+                written_paths = page_file.written_paths
+                if not page_file.changed:
+                    profiling.count('files_unchanged', 1)
+                    print('The page is unchanged, so it was left as it was.')
+
+            profiling.count('files_written', len(written_paths))
+            profiling.count('bytes_written', sum(
+                os.path.getsize(path) for path in written_paths))
+
+        # List the page and everything it loads for the service worker
+        if service_worker_url is not None:
+            from fresh_tomatillos.offline import write_service_worker
+
+            page_dir = os.path.dirname(output_path)
+            cached_paths = [output_path]
+            if search_url is not None:
+                cached_paths.append(os.path.join(page_dir, search_url))
+            if asset_urls is not None:
+                cached_paths.extend(os.path.join(page_dir, url)
+                                    for url in sorted(asset_urls.values()))
+
+            with profiling.phase('service_worker'):
+                _, entry_count, version = write_service_worker(
+                    output_path, cached_paths, movies)
+                profiling.count('entries', entry_count)
+            print('Wrote a service worker caching {0} files (version {1}).'
+                  .format(entry_count, version))
+
+        if incremental:
+            with profiling.phase('save_manifest'):
+                manifest.save(manifest_path(output_path))
     except (IOError, OSError) as e:
-        if e.errno == errno.ENOENT:
-            print_err('Unable to find template file: ' + e.filename)
-        elif e.errno == errno.EACCES:
-            print_err("Insufficient permissions to read template file: " +
-                      e.filename)
-        elif e.errno == errno.EISDIR:
-            print_err('Expected a template file, but found a directory: ' +
-                      e.filename)
-        else:
-            # TODO raise e instead, or optionally provide the stack trace
-            print_err(e)
+        _print_output_error(e)
+        return None
+
+    if incremental:
+        print('Rendered {0} of {1} movies (the rest were unchanged).'.format(
+            rebuilt, len(movies)))
+
+    return output_path, movies
+
+
+def _report_profile(profiler, options):
+    """Output the phases recorded while building, as requested by options.
+
+    Args:
+        profiler (Profiler): The profiler which recorded the build.
+        options (dict): Options returned by `_parse_args()`.
+
+    Returns:
+        bool: Whether the report was output successfully.
+    """
+    if options.get('--profile'):
+        print_err(profiler.table())
+
+    json_path = options.get('--profile-json')
+    if json_path == '-':
+        sys.stdout.write(profiler.json_lines())
+    elif json_path is not None:
+        try:
+            with io.open(json_path, 'a', encoding='utf-8') as json_file:
+                json_file.write(profiler.json_lines())
+        except (IOError, OSError) as e:
+            print_err('Unable to write the profile: ' + str(e))
+            return False
+
+    return True
+
+
+def _build_many(inputs, options, jobs=None):
+    """Build a page for each of many config files (the build command).
+
+    Args:
+        inputs (list[str]): Config file paths, directories and glob patterns.
+        options (dict): Options returned by `_parse_args()`.
+        jobs (Optional[int]): The maximum number of processes to use.
+
+    Returns:
+        int: A return code, 0 or 1, to pass to `sys.exit()`.
+    """
+    from fresh_tomatillos.batch import build_configs, expand_config_paths
+    from fresh_tomatillos.render import get_templates
+
+    unsupported = sorted(set(options) - BUILD_OPTIONS)
+    if unsupported:
+        print_err('The build command does not accept the {0} option{1}.'
+                  .format(', '.join(unsupported),
+                          's' if len(unsupported) > 1 else ''))
+        return 1
+
+    if not options.get('--out-dir'):
+        print_err('The build command requires the --out-dir option.')
         return 1
 
-    # Save HTML string to disk
-    # For now, always create the file in our package directory so we don't
-    # take the chance of overwriting the user's files
-    output_path = _module_path('fresh_tomatillos.html')
     try:
-        with io.open(output_path, 'w', encoding='utf-8') as output_file:
-            output_file.write(page_content)
+        config_paths = expand_config_paths(inputs)
+    except ValueError as e:
+        print_err(e)
+        return 1
+
+    if not config_paths:
+        print_err('The build command requires at least one config file.')
+        return 1
+
+    # Load the compiled templates before touching any output files
+    try:
+        get_templates()
     except (IOError, OSError) as e:
-        if e.errno == errno.EACCES:
-            print_err("Fresh Tomatillos couldn't write the output file: " +
-                      e.filename)
-        # TODO raise e or optionally provide the stack trace
+        _print_template_error(e)
+        return 1
+
+    try:
+        result = build_configs(config_paths, options['--out-dir'],
+                               fast_config=options.get('--fast-config', False),
+                               virtual=options.get('--virtual', False),
+                               format_name=options.get('--format'),
+                               max_workers=jobs)
+    except ValueError as e:
         print_err(e)
         return 1
+    except (IOError, OSError) as e:
+        _print_output_error(e)
+        return 1
+
+    for config_path, page_path, movie_count in result.pages:
+        print('Built {0} ({1} movies)'.format(page_path, movie_count))
+
+    if not result.errors:
+        print('Built {0} pages.'.format(len(result.pages)))
+        return 0
+
+    # Report every failure together, rather than stopping at the first one
+    print_err('\nUnable to build {0} of {1} config files.'
+              '\nPlease update these config files and run the program again.'
+              .format(len(result.errors), len(config_paths)))
+    for config_path, error in result.errors.items():
+        print_err('\n{0}:\n{1}'.format(config_path, error))
+    return 1
+
+
+def main(argv=None):
+    """Display movie trailer page in a browser using data from config file.
+
+    Args:
+        argv (list): An optional list to use in place of `sys.argv[1:]`.
+
+    Returns:
+        int: A return code, 0 or 1, to pass to `sys.exit()`.
+    """
+    # Get command line arguments
+    if argv is None:
+        argv = sys.argv[1:]
+
+    # Did the user ask for help?
+    if any(arg in ('-h', '--help') for arg in argv):
+        print(VERSION + '\n\n' + USAGE)
+        return 0
+
+    # Did the user ask for the version?
+    if any(arg in ('-v', '--version') for arg in argv):
+        print(VERSION)
+        return 0
+
+    try:
+        args, options = _parse_args(argv)
+        page_size = _positive_int_option(options, '--page-size')
+        jobs = _positive_int_option(options, '--jobs')
+        _positive_int_option(options, '--port')
+
+        if '--format' in options:
+            from fresh_tomatillos.readers import input_format
+            input_format('', options['--format'])
+    except ValueError as e:
+        print_err(e)
+        print_err(USAGE)
+        return 1
+
+    for option in ('--search', '--virtual', '--watch'):
+        if page_size and options.get(option):
+            print_err('The --page-size and {0} options cannot be combined.'
+                      .format(option))
+            return 1
+
+    # Tiles reused by these modes would keep their old poster URLs
+    for poster_option in ('--mirror-posters', '--thumbnails'):
+        for option in ('--incremental', '--watch'):
+            if options.get(poster_option) and options.get(option):
+                print_err('The {0} and {1} options cannot be combined.'
+                          .format(poster_option, option))
+                return 1
+
+    for option in ('--cache', '--watch'):
+        if options.get('--catalog') and options.get(option):
+            print_err('The --catalog and {0} options cannot be combined.'
+                      .format(option))
+            return 1
+
+    for option in ('--compress', '--hashed-assets', '--minify', '--offline',
+                   '--search', '--standalone', '--trailer-facade'):
+        if options.get(option) and options.get('--watch'):
+            print_err('The {0} and --watch options cannot be combined.'
+                      .format(option))
+            return 1
+
+    profile = options.get('--profile') or '--profile-json' in options
+    if profile and options.get('--watch'):
+        print_err('The --profile options cannot be combined with --watch.')
+        return 1
+
+    if options.get('--thumbnails'):
+        from fresh_tomatillos.thumbnails import pillow_available
+        if not pillow_available():
+            print_err('The --thumbnails option requires the Pillow'
+                      ' package:\n  pip install Pillow')
+            return 1
+
+    if args[:1] == ['build']:
+        return _build_many(args[1:], options, jobs)
+
+    if '--out-dir' in options:
+        print_err('The --out-dir option is only used by the build command.')
+        return 1
+
+    # Did the user pass to many arguments?
+    if len(args) > 1:
+        print_err('Whoops, fresh_tomatillos only accepts 1 argument.\n')
+        print_err('USAGE INFO')
+        return 1
+
+    if args:
+        config_path = args[0]
+    elif options.get('--catalog'):
+        config_path = None  # Build from the catalog as it is
+    else:
+        config_path = _module_path('sample.cfg')
+
+    if options.get('--watch'):
+        from fresh_tomatillos.readers import CONFIG_FORMAT, input_format
+        if input_format(config_path,
+                        options.get('--format')) != CONFIG_FORMAT:
+            print_err('The --watch option only supports config files.')
+            return 1
+
+        output_path = _page_path(options)
+        server = None
+        if options.get('--serve'):
+            server = _make_server(output_path, options)
+            if server is None:
+                return 1
+        return _watch(config_path, output_path, options, server)
+
+    if not profile:
+        built = _build(config_path, options, page_size, jobs)
+    else:
+        from fresh_tomatillos.profiling import Profiler
+        profiler = Profiler()
+        with profiler.activate():
+            built = _build(config_path, options, page_size, jobs)
+        if not _report_profile(profiler, options):
+            return 1
+
+    if built is None:
+        return 1
+    output_path, movies = built
+
+    # Bind the server before listing the movies, so errors aren't buried
+    if options.get('--serve'):
+        server = _make_server(output_path, options)
+        if server is None:
+            return 1
 
     # Open the output file in the browser (in a new tab, if possible)
     print('Opening webpage for:')
     for movie in movies:
         print(str(movie))
-    webbrowser.open_new_tab('file://' + output_path)
+
+    if options.get('--serve'):
+        return _serve(server)
+
+    _open_in_browser('file://' + output_path)
     return 0
@@ -12,6 +12,7 @@ Base Exceptions (not to be used directly):
 Exceptions For Direct Use:
     InvalidConfigKeys
     InvalidVideoID
+    InvalidRecord
 """
 
 from __future__ import unicode_literals
@@ -34,6 +35,10 @@ class ConfigError(Error, ValueError):
     Constructor Args:
         message (str): The Error message to append to ConfigError's header.
 
+    Instance Attributes:
+        message (str): The heading, followed by the message.
+        details (str): The message, without the heading.
+
     ConfigError provides a heading in an instance's `self.message` string.
     In order to include this header, child classes must pass their own added
     messages to ConfigError's `__init__` method.  See example below:
@@ -48,6 +53,7 @@ class ConfigError(Error, ValueError):
         super(ConfigError, self).__init__()
 
         # Set `.message` explicitly, since it isn't set by default in Python 3
+        self.details = message
         self.message = (
             '\nERROR IN CONFIG FILE'
             '\nPlease update your config file and run the program again.'
@@ -69,19 +75,33 @@ class InvalidConfigKeys(ConfigError):
                     str: The title of the movie.
                     frozenset[str]: Missing config keys.
                     frozenset[str]: Unexpected config keys.
+
+        line_numbers (Optional[dict[str, list[int]]]): The line numbers on
+            which each movie's section header appears in the config file.
+            If provided, they are included in the error message.
     """
 
     __heading_template = '\nInvalid config settings for movie:  {title}'
+    __line_numbers_template = '  (line{plural} {numbers})'
 
-    def __init__(self, movie_errors):
+    def __init__(self, movie_errors, line_numbers=None):
         """Initialize an instance of InvalidConfigKeys."""
         self.config_errors = movie_errors
+        self.line_numbers = line_numbers
 
         # Create the error message string with a section for each movie
         message = []
 
         for title, missing_keys, extra_keys in movie_errors:
-            message.append(self.__heading_template.format(title=title))
+            heading = self.__heading_template.format(title=title)
+
+            if line_numbers and line_numbers.get(title):
+                numbers = line_numbers[title]
+                heading += self.__line_numbers_template.format(
+                    plural='s' if len(numbers) > 1 else '',
+                    numbers=', '.join(str(number) for number in numbers))
+
+            message.append(heading)
 
             if missing_keys:
                 message.append('   This information is missing:')
@@ -120,3 +140,26 @@ class InvalidVideoID(ConfigError):
 
         super(InvalidVideoID, self).__init__(
             self.__message_template.format(self=self))
+
+
+class InvalidRecord(ConfigError):
+    """A record in a JSON Lines or CSV movie data file can't be read.
+
+    Constructor Args:
+        file_path (str): The path of the file containing the record.
+        line_number (int): The line of the file on which the record is.
+        reason (str): A description of what is wrong with the record.
+    """
+
+    __message_template = (
+        '\nInvalid record in {self.file_path}, line {self.line_number}:'
+        '\n   {self.reason}')
+
+    def __init__(self, file_path, line_number, reason):
+        """Initialize an instance of InvalidRecord."""
+        self.file_path = file_path
+        self.line_number = line_number
+        self.reason = reason
+
+        super(InvalidRecord, self).__init__(
+            self.__message_template.format(self=self))
@@ -4,18 +4,193 @@ fresh_tomatillos.get_config
 ~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
 Implements the parsing and validating of user-created config files.
+
+Config files are read with `RawConfigParser` by default, or with the
+single-pass `FastConfig` reader, which is much quicker for large files.
 """
 
 from __future__ import unicode_literals, with_statement
 import io
+import os
+from collections import OrderedDict
 try:
-    from configparser import RawConfigParser  # Python 3
+    from configparser import (  # Python 3
+        MissingSectionHeaderError, ParsingError, RawConfigParser)
 except ImportError:
-    from ConfigParser import RawConfigParser  # Python 2
+    from ConfigParser import (  # Python 2
+        MissingSectionHeaderError, ParsingError, RawConfigParser)
 
+from fresh_tomatillos import profiling
 from fresh_tomatillos.exceptions import InvalidConfigKeys
 
 
+DEFAULT_SECTION = 'DEFAULT'
+COMMENT_PREFIXES = ('#', ';')
+
+
+class FastConfig(object):
+    """A minimal config file reader, which parses a file in a single pass.
+
+    FastConfig reads the same format as `RawConfigParser(strict=False)` with
+    default settings: keys are case-insensitive, later duplicate keys
+    overwrite earlier ones, duplicate sections are merged, values may span
+    multiple (indented) lines, and lines starting with `#` or `;` are
+    comments.  It provides the subset of the `RawConfigParser` interface
+    used by fresh_tomatillos, without any interpolation machinery.
+
+    Instance Attributes:
+        line_numbers (dict[str, list[int]]): The line numbers on which each
+                                             section's header appears.
+    """
+
+    __slots__ = ['_sections', '_defaults', 'line_numbers']
+
+    def __init__(self):
+        """Initialize an empty FastConfig instance."""
+        self._sections = OrderedDict()
+        self._defaults = {}
+        self.line_numbers = {}
+
+    def read_file(self, lines, source='<???>'):
+        """Parse config data from an iterable of lines, such as a file.
+
+        Args:
+            lines (Iterable[str]): The lines of the config file.
+            source (str): The name of the file, used in error messages.
+
+        Raises:
+            MissingSectionHeaderError: Raised if an option precedes the first
+                                       section header.
+            ParsingError: Raised after the whole file has been read if any
+                          line could not be parsed.
+        """
+        sections = self._sections
+        line_numbers = self.line_numbers
+        # {(<section id>, <option name>): <section dict>}
+        multiline = {}
+        section = None
+        option = None
+        indent_level = 0
+        blank_lines = 0
+        error = None
+
+        for line_number, line in enumerate(lines, 1):
+            value = line.strip()
+
+            # Blank lines only matter if a continuation line follows them
+            if not value:
+                if option is not None:
+                    blank_lines += 1
+                continue
+
+            first_character = value[0]
+
+            if first_character in COMMENT_PREFIXES:
+                continue
+
+            if line[0] == first_character:
+                indent = 0
+            else:
+                indent = len(line) - len(line.lstrip())
+
+            # Continuation of a multi-line value
+            if option is not None and indent > indent_level:
+                current = section[option]
+                if not isinstance(current, list):
+                    current = section[option] = [current]
+                    multiline[id(section), option] = section
+                current.extend([''] * blank_lines)
+                current.append(value)
+                blank_lines = 0
+                continue
+
+            indent_level = indent
+            option = None
+            blank_lines = 0
+            # Section header
+            if first_character == '[' and value.rfind(']') > 1:
+                title = value[1:value.rfind(']')]
+
+                if title == DEFAULT_SECTION:
+                    section = self._defaults
+                else:
+                    section = sections.get(title)
+                    if section is None:
+                        section = sections[title] = {}
+                        line_numbers[title] = []
+                    line_numbers[title].append(line_number)
+
+            elif section is None:
+                raise MissingSectionHeaderError(source, line_number, line)
+
+            # Option line, delimited by whichever of '=' or ':' comes first
+            else:
+                delimiter = value.find('=')
+                colon = value.find(':')
+                if colon >= 0 and (delimiter < 0 or colon < delimiter):
+                    delimiter = colon
+
+                name = value[:delimiter].rstrip()
+
+                if delimiter < 0 or not name:
+                    if error is None:
+                        error = ParsingError(source)
+                    error.append(line_number, repr(line))
+                    continue
+
+                option = name.lower()
+                section[option] = value[delimiter + 1:].lstrip()
+
+        # Options redefined on a single line afterwards are already strings
+        for (_, option), section in multiline.items():
+            value = section[option]
+            if isinstance(value, list):
+                section[option] = '\n'.join(value).rstrip()
+
+        if error is not None:
+            raise error
+
+    def sections(self):
+        """Return a list of section names, excluding the default section."""
+        return list(self._sections)
+
+    def options(self, section):
+        """Return a list of option names for the given section name."""
+        options = self._sections[section]
+        if not self._defaults:
+            return list(options)
+        return list(options) + [key for key in self._defaults
+                                if key not in options]
+
+    def get(self, section, option):
+        """Return the value of an option in the given section."""
+        try:
+            return self._sections[section][option]
+        except KeyError:
+            return self._defaults[option]
+
+    def items(self, section):
+        """Return a list of (name, value) tuples for each option in a section.
+        """
+        options = dict(self._defaults)
+        options.update(self._sections[section])
+        return list(options.items())
+
+    def records(self):
+        """Yield a title and a dict of options for each section, in order.
+
+        Records are only complete once the whole file has been read: a
+        section may be continued by a later duplicate header, and options
+        in a later DEFAULT section apply to every section.  So, as with
+        `RawConfigParser`, they are yielded after `read_file()` returns.
+
+        Yields:
+            tuple[str, dict[str, str]]: A section name and its options.
+        """
+        for title in self._sections:
+            yield title, dict(self.items(title))
+
+
 def _movie_key_frozensets(config):
     """Return a generator which yields titles and movie options.
 
@@ -46,12 +221,14 @@ def _verified_config(config, valid_keys):
     sections of `config` are not checked for duplicate values.
 
     Args:
-        config (ConfigParser): The configuration object to validate.
+        config (ConfigParser|FastConfig): The configuration object to
+                                          validate.
         valid_keys (frozenset): The valid data attributes which every movie
                                 in `config` must contain.
 
     Returns:
-        ConfigParser: The same object that was passed in as `config`.
+        ConfigParser|FastConfig: The same object that was passed in as
+                                 `config`.
 
     Raises:
         InvalidConfigKeys: Raised if there are missing or extra option keys
@@ -64,12 +241,13 @@ def _verified_config(config, valid_keys):
                    if not valid_keys == keys)
 
     if errors:
-        raise InvalidConfigKeys(errors)
+        # Only FastConfig instances record the line numbers of sections
+        raise InvalidConfigKeys(errors, getattr(config, 'line_numbers', None))
 
     return config
 
 
-def get_config(file_path, valid_keys):
+def get_config(file_path, valid_keys, fast=False):
     """Return a config object using data from the specified file.
 
     Each section (each movie) of `config` will be checked to confirm that it
@@ -81,25 +259,40 @@ def get_config(file_path, valid_keys):
         valid_keys (Iterable[str]): The valid data attributes which must be
                                     defined for every movie in the config
                                     file.
+        fast (bool): Whether to read the file with `FastConfig` instead of
+                     `RawConfigParser`.
 
     Returns:
-        ConfigParser: A config object containing data read from `file_path`.
+        ConfigParser|FastConfig: A config object containing data read from
+                                 `file_path`.
 
     Raises:
         InvalidConfigKeys: Raised if there are missing or extra data
                            attributes for any movie defined in the config
                            file.  (raised in a call to _verified_config())
     """
-    try:
-        # Not strict: Allow duplicate config entries to overwrite old values
-        config = RawConfigParser(strict=False)
-    except TypeError:
-        # Python 2 doesn't accept `strict` parameter, but is already not strict
-        config = RawConfigParser()
+    if fast:
+        config = FastConfig()
+    else:
+        try:
+            # Not strict: Allow duplicate entries to overwrite old values
+            config = RawConfigParser(strict=False)
+        except TypeError:
+            # Python 2 doesn't accept `strict` parameter, but is already not
+            # strict
+            config = RawConfigParser()
 
     # Use io.open so we can specify UTF-8 and handle non-ASCII data in Python 2
-    with io.open(file_path, 'r', encoding='utf-8') as config_file:
-        config.readfp(config_file)
+    with profiling.phase('parse_config'):
+        with io.open(file_path, 'r', encoding='utf-8') as config_file:
+            profiling.count('bytes_read',
+                            os.fstat(config_file.fileno()).st_size)
+            if fast:
+                config.read_file(config_file, file_path)
+            else:
+                config.readfp(config_file)
 
     # Exceptions raised by _verified_config() are not caught here
-    return _verified_config(config, frozenset(valid_keys))
+    with profiling.phase('verify_config'):
+        profiling.count('sections', len(config.sections()))
+        return _verified_config(config, frozenset(valid_keys))
@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+"""
+fresh_tomatillos.incremental
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+Implements incremental builds, which reuse the rendered tiles of movies
+whose config sections have not changed since the previous build.
+
+A manifest saved next to the output file maps each movie title to a hash
+of its raw config options, its Movie constructor arguments, and its
+rendered tile HTML.  The whole manifest is discarded (forcing a full
+rebuild) whenever the templates or static files change.
+"""
+
+from __future__ import unicode_literals
+import hashlib
+import io
+import json
+import os
+
+from fresh_tomatillos import __version__
+from fresh_tomatillos.media import Movie
+from fresh_tomatillos.movie_args import section_movie_args
+from fresh_tomatillos.output import atomic_open
+
+
+MANIFEST_FORMAT = 1
+
+
+def _hash_strings(strings):
+    """Return a hex digest identifying a sequence of strings.
+
+    Args:
+        strings (Iterable[str]): The strings to hash, in order.
+
+    Returns:
+        str: A SHA-1 hex digest.
+    """
+    digest = hashlib.sha1()
+    for string in strings:
+        digest.update(string.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def section_hash(config, title):
+    """Return a hash of the raw option values in one section of a config.
+
+    Args:
+        config (ConfigParser): The config object containing the section.
+        title (str): The name of the section.
+
+    Returns:
+        str: A hex digest which changes whenever an option in the section
+             changes.
+    """
+    return _hash_strings(value
+                         for option in sorted(config.items(title))
+                         for value in option)
+
+
+def templates_fingerprint(templates):
+    """Return a hash identifying a set of compiled templates.
+
+    Args:
+        templates (PageTemplates): The templates used for a build.
+
+    Returns:
+        str: A hex digest which changes whenever a template or static file
+             (or the version of fresh_tomatillos) changes.
+    """
+    return _hash_strings((__version__, templates.head, templates.tail,
+                          templates.tile.source))
+
+
+def manifest_path(output_path):
+    """Return the path of the manifest file for a given output file.
+
+    Args:
+        output_path (str): The path of the generated HTML file.
+
+    Returns:
+        str: The path at which to store the build manifest.
+    """
+    return os.path.splitext(output_path)[0] + '.manifest.json'
+
+
+class BuildManifest(object):
+    """Record of the movies rendered by a build, for use by the next build.
+
+    Constructor Args:
+        fingerprint (str): The `templates_fingerprint()` of the build.
+        entries (Optional[dict]): Previously saved entries, of the form:
+
+                {<title>: [<section_hash>, <movie_args>, <tile_html>]}
+
+    Instance Attributes:
+        fingerprint (str): The `templates_fingerprint()` of the build.
+        entries (dict): The manifest entries, keyed by movie title.
+    """
+
+    __slots__ = ['fingerprint', 'entries']
+
+    def __init__(self, fingerprint, entries=None):
+        """Initialize a BuildManifest instance."""
+        self.fingerprint = fingerprint
+        self.entries = {} if entries is None else entries
+
+    @classmethod
+    def load(cls, path, fingerprint):
+        """Return the manifest saved at `path` if it is still usable.
+
+        Args:
+            path (str): The path of a manifest file.
+            fingerprint (str): The `templates_fingerprint()` of the current
+                               build.
+
+        Returns:
+            BuildManifest: The saved manifest, or an empty one if the file
+                           doesn't exist, can't be read, or was created
+                           using different templates.
+        """
+        try:
+            with io.open(path, 'r', encoding='utf-8') as manifest_file:
+                data = json.load(manifest_file)
+        except (IOError, OSError, ValueError):
+            return cls(fingerprint)
+
+        if (not isinstance(data, dict) or
+                data.get('format') != MANIFEST_FORMAT or
+                data.get('fingerprint') != fingerprint or
+                not isinstance(data.get('movies'), dict)):
+            return cls(fingerprint)
+
+        return cls(fingerprint, data['movies'])
+
+    def save(self, path):
+        """Write the manifest to a file, replacing it atomically.
+
+        Args:
+            path (str): The path at which to save the manifest.
+        """
+        data = {'format': MANIFEST_FORMAT,
+                'fingerprint': self.fingerprint,
+                'movies': self.entries}
+
+        with atomic_open(path) as manifest_file:
+            manifest_file.write(json.dumps(data, ensure_ascii=False,
+                                           separators=(',', ':')))
+
+
+def build_movie_tiles(config, templates, previous):
+    """Return movies and their tiles, reusing tiles from a previous build.
+
+    Sections whose raw options are unchanged since `previous` was saved
+    skip `section_movie_args()` and tile rendering entirely.
+
+    Args:
+        config (ConfigParser): The verified config object for this build.
+        templates (PageTemplates): The templates to render changed tiles.
+        previous (BuildManifest): The manifest from the previous build.
+
+    Returns:
+        tuple[list[Movie], list[str], BuildManifest, int]: The movies, their
+            rendered tiles (in the same order), the manifest for this
+            build, and the number of movies which had to be re-rendered.
+
+    Raises:
+        InvalidVideoID: Raised if the 'youtube' key for a changed movie is
+                        not valid as a YouTube video ID or URL.
+                        (raised in a call to section_movie_args())
+    """
+    render_tile = templates.tile.render
+    manifest = BuildManifest(templates_fingerprint(templates))
+    movies = []
+    tiles = []
+    rebuilt = 0
+
+    for title in config.sections():
+        options_hash = section_hash(config, title)
+        entry = previous.entries.get(title)
+
+        if entry is not None and entry[0] == options_hash:
+            movie = Movie(title, *entry[1])
+            tile = entry[2]
+        else:
+            # Exceptions raised by section_movie_args() are not caught here
+            movie = Movie(*section_movie_args(config, title))
+            tile = render_tile(movie)
+            entry = [options_hash,
+                     [movie.summary, movie.poster_url, movie.youtube_id],
+                     tile]
+            rebuilt += 1
+
+        movies.append(movie)
+        tiles.append(tile)
+        manifest.entries[title] = entry
+
+    return movies, tiles, manifest, rebuilt
+
+
+def reuse_movie_tiles(movie_args, templates, previous):
+    """Return movies and their tiles, given already normalized arguments.
+
+    This is the counterpart of `build_movie_tiles()` for builds which skip
+    parsing the config file (such as a catalog cache hit).  Without the raw
+    config options, a cached tile is reused whenever the movie's arguments
+    are unchanged since `previous` was saved.
+
+    Args:
+        movie_args (Iterable[tuple[str, str, str, str]]): The arguments for
+            each movie, as yielded by `generate_movie_args()`.
+        templates (PageTemplates): The templates to render changed tiles.
+        previous (BuildManifest): The manifest from the previous build.
+
+    Returns:
+        tuple[list[Movie], list[str], BuildManifest, int]: The same values
+            returned by `build_movie_tiles()`.
+    """
+    render_tile = templates.tile.render
+    manifest = BuildManifest(templates_fingerprint(templates))
+    movies = []
+    tiles = []
+    rebuilt = 0
+
+    for args in movie_args:
+        title = args[0]
+        movie = Movie(*args)
+        entry = previous.entries.get(title)
+
+        if entry is None or entry[1] != list(args[1:]):
+            # Without the raw options, the next config-based build will
+            # render this movie again, since its section hash is unknown
+            entry = [None, list(args[1:]), render_tile(movie)]
+            rebuilt += 1
+
+        movies.append(movie)
+        tiles.append(entry[2])
+        manifest.entries[title] = entry
+
+    return movies, tiles, manifest, rebuilt
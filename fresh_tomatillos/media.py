@@ -3,13 +3,93 @@
 fresh_tomatillos.media
 ~~~~~~~~~~~~~~~~~~~~~~
 
-Defines the Movie class at the heart of fresh_tomatillos.
+Defines the Movie class at the heart of fresh_tomatillos, and
+MovieCollection, a compact container for very large numbers of movies.
 """
 
 from __future__ import unicode_literals
+from array import array
+from itertools import count, repeat
+try:
+    from itertools import imap as map  # Python 2
+except ImportError:
+    pass  # map() is already lazy in Python 3
 
 
-class Movie(object):
+# Typical length of a YouTube video ID, which MovieCollection packs into a
+# fixed-width buffer
+YOUTUBE_ID_LENGTH = 11
+
+
+class _MovieBase(object):
+    """Derived attributes shared by Movie and MovieView.
+
+    Subclasses provide the `title`, `summary`, `poster_url`, `youtube_id`
+    and `thumbnails` attributes.
+    """
+
+    __slots__ = []
+
+    __repr_template = ('Movie(title={self.title!r},'
+                       ' summary={self.summary!r},'
+                       ' poster_url={self.poster_url!r},'
+                       ' youtube_id={self.youtube_id!r})')
+
+    __str_template = '<Movie: {self.title}>'
+
+    __youtube_url_base = 'https://www.youtube.com/watch?v='
+
+    # The size at which posters are shown
+    __poster_width = 220
+    __poster_height = 342
+
+    __poster_template = (
+        '<img alt="" src="{url}" width="{width}" height="{height}">')
+
+    # Only posters with thumbnails list them, and let the browser choose
+    __responsive_poster_template = (
+        '<picture>'
+        '\n      <source type="image/webp" srcset="{webp_srcset}"'
+        ' sizes="{width}px">'
+        '\n      <img alt="" src="{url}" srcset="{srcset}" sizes="{width}px"'
+        ' width="{width}" height="{height}" loading="lazy">'
+        '\n    </picture>')
+
+    def __repr__(self):
+        """Return a string `s` such that `Movie(s)` replicates the instance."""
+        return self.__repr_template.format(self=self)
+
+    def __str__(self):
+        """Return a simple string identifying a Movie instance."""
+        return self.__str_template.format(self=self)
+
+    @property
+    def youtube_url(self):
+        return self.__youtube_url_base + self.youtube_id
+
+    @property
+    def poster_srcset(self):
+        return ', '.join('{0} {1}w'.format(fallback_url, width)
+                         for width, fallback_url, _ in self.thumbnails)
+
+    @property
+    def poster_webp_srcset(self):
+        return ', '.join('{0} {1}w'.format(webp_url, width)
+                         for width, _, webp_url in self.thumbnails)
+
+    @property
+    def poster_image(self):
+        if not self.thumbnails:
+            return self.__poster_template.format(
+                url=self.poster_url, width=self.__poster_width,
+                height=self.__poster_height)
+        return self.__responsive_poster_template.format(
+            url=self.poster_url, srcset=self.poster_srcset,
+            webp_srcset=self.poster_webp_srcset, width=self.__poster_width,
+            height=self.__poster_height)
+
+
+class Movie(_MovieBase):
     """Class for representing movie data.
 
     Constructor Args:
@@ -17,43 +97,361 @@ class Movie(object):
         summary (str): A brief summary of the movie's plot.
         poster_url (str): The URL of an image file of the movie's poster.
         youtube_id (str): A YouTube video ID for the movie's trailer.
+        thumbnails (Sequence[tuple[int, str, str]]): Optional downscaled
+            copies of the poster, as (width, fallback_url, webp_url) tuples
+            in order of increasing width.
 
     Instance Attributes:
         title (str): The title of the movie.
         summary (str): A brief summary of the movie's plot.
         poster_url (str): The URL of an image file of the movie's poster.
         youtube_id (str): A YouTube video ID for the movie's trailer.
+        thumbnails (tuple[tuple[int, str, str]]): Downscaled copies of the
+            poster, as (width, fallback_url, webp_url) tuples.
         youtube_url (str): The full YouTube URL for the movie's trailer.
                            (read only)
+        poster_srcset (str): A `srcset` attribute value listing the poster's
+                             fallback thumbnails, if any.  (read only)
+        poster_webp_srcset (str): A `srcset` attribute value listing the
+                                  poster's WebP thumbnails, if any.
+                                  (read only)
+        poster_image (str): HTML for the poster: a plain `<img>`, or if the
+                            poster has thumbnails, a `<picture>` letting
+                            the browser choose one of them.  (read only)
     """
 
-    __slots__ = ['title', 'summary', 'poster_url', 'youtube_id']
-
-    __repr_template = ('Movie(title={self.title!r},'
-                       ' summary={self.summary!r},'
-                       ' poster_url={self.poster_url!r},'
-                       ' youtube_id={self.youtube_id!r})')
-
-    __str_template = '<Movie: {self.title}>'
-
-    __youtube_url_base = 'https://www.youtube.com/watch?v={self.youtube_id}'
+    __slots__ = ['title', 'summary', 'poster_url', 'youtube_id', 'thumbnails']
 
-    def __init__(self, title, summary, poster_url, youtube_id):
+    def __init__(self, title, summary, poster_url, youtube_id,
+                 thumbnails=()):
         """Initialize a Movie instance."""
         self.title = title
         self.summary = summary
         # TODO verify that this is a valid URL (same for youtube, if URL?)
         self.poster_url = poster_url
         self.youtube_id = youtube_id
+        self.thumbnails = tuple(thumbnails)
 
-    def __repr__(self):
-        """Return a string `s` such that `Movie(s)` replicates the instance."""
-        return self.__repr_template.format(self=self)
 
-    def __str__(self):
-        """Return a simple string identifying a Movie instance."""
-        return self.__str_template.format(self=self)
+class _TextColumn(object):
+    """A compact, append-only sequence of strings.
+
+    Rather than one string object per value, values are stored in blocks:
+    each block is a single string holding BLOCK_SIZE consecutive values,
+    plus an array of the offsets at which each value ends.  Values
+    appended since the last full block are kept in a list until the block
+    fills up.  Replaced values are kept in a separate dict.
+    """
+
+    __slots__ = ['_blocks', '_ends', '_pending', '_replaced']
+
+    BLOCK_SIZE = 1024
+
+    def __init__(self):
+        """Initialize an empty _TextColumn instance."""
+        self._blocks = []
+        self._ends = array(str('I'))
+        self._pending = []
+        self._replaced = {}
+
+    def __len__(self):
+        """Return the number of values in the column."""
+        return len(self._blocks) * self.BLOCK_SIZE + len(self._pending)
+
+    def append(self, value):
+        """Add a value to the end of the column."""
+        self._pending.append(value)
+        if len(self._pending) == self.BLOCK_SIZE:
+            self._seal()
+
+    def _seal(self):
+        """Move the pending values into a new block."""
+        end = 0
+        for value in self._pending:
+            end += len(value)
+            self._ends.append(end)
+
+        self._blocks.append(''.join(self._pending))
+        self._pending = []
+
+    def __getitem__(self, index):
+        """Return the value at a (non-negative) index."""
+        if self._replaced and index in self._replaced:
+            return self._replaced[index]
+
+        block_number, position = divmod(index, self.BLOCK_SIZE)
+        if block_number == len(self._blocks):
+            return self._pending[position]
+
+        start = self._ends[index - 1] if position else 0
+        return self._blocks[block_number][start:self._ends[index]]
+
+    def __setitem__(self, index, value):
+        """Replace the value at a (non-negative) index."""
+        self._replaced[index] = value
+
+    def block_values(self, block_number):
+        """Return a list of the values in one block.
+
+        Reading a block at a time is much faster than indexing each value.
+
+        Args:
+            block_number (int): The number of the block, where the values
+                                still pending are in the last block.
+
+        Returns:
+            list[str]: Up to BLOCK_SIZE values.
+        """
+        first = block_number * self.BLOCK_SIZE
+
+        if block_number == len(self._blocks):
+            values = list(self._pending)
+        else:
+            block = self._blocks[block_number]
+            ends = self._ends[first:first + self.BLOCK_SIZE]
+            starts = [0]
+            starts.extend(ends[:-1])
+            values = [block[start:end] for start, end in zip(starts, ends)]
+
+        if self._replaced:
+            replaced = self._replaced
+            values = [replaced.get(index, value)
+                      for index, value in enumerate(values, first)]
+        return values
+
+
+class _IDColumn(object):
+    """A compact, append-only sequence of ASCII YouTube video IDs.
+
+    IDs of the usual length are packed into one fixed-width byte buffer.
+    Any others are kept in a dict.
+    """
+
+    __slots__ = ['_packed', '_count', '_other']
+
+    def __init__(self):
+        """Initialize an empty _IDColumn instance."""
+        self._packed = bytearray()
+        self._count = 0
+        self._other = {}
+
+    def __len__(self):
+        """Return the number of IDs in the column."""
+        return self._count
+
+    def append(self, youtube_id):
+        """Add an ID to the end of the column."""
+        if len(youtube_id) == YOUTUBE_ID_LENGTH:
+            try:
+                self._packed += youtube_id.encode('ascii')
+                self._count += 1
+                return
+            except UnicodeError:
+                pass  # Not a real video ID, but keep it all the same
+
+        self._packed += b'\0' * YOUTUBE_ID_LENGTH
+        self._other[self._count] = youtube_id
+        self._count += 1
+
+    def __getitem__(self, index):
+        """Return the ID at a (non-negative) index."""
+        if self._other and index in self._other:
+            return self._other[index]
+
+        start = index * YOUTUBE_ID_LENGTH
+        return self._packed[start:start + YOUTUBE_ID_LENGTH].decode('ascii')
+
+    def __setitem__(self, index, youtube_id):
+        """Replace the ID at a (non-negative) index."""
+        self._other[index] = youtube_id
+
+    def block_values(self, block_number):
+        """Return a list of the IDs in one block of _TextColumn.BLOCK_SIZE.
+
+        Args:
+            block_number (int): The number of the block.
+
+        Returns:
+            list[str]: Up to _TextColumn.BLOCK_SIZE IDs.
+        """
+        width = YOUTUBE_ID_LENGTH
+        first = block_number * _TextColumn.BLOCK_SIZE
+        block = self._packed[first * width:
+                             (first + _TextColumn.BLOCK_SIZE) * width]
+
+        # Decode the whole block at once, rather than each ID separately
+        text = block.decode('ascii')
+        values = [text[start:start + width]
+                  for start in range(0, len(text), width)]
+
+        if self._other:
+            other = self._other
+            values = [other.get(index, value)
+                      for index, value in enumerate(values, first)]
+        return values
+
+
+class MovieView(_MovieBase):
+    """A lightweight view of one movie in a MovieCollection.
+
+    A view has the same attributes as a Movie, so it can be used anywhere a
+    Movie is expected, such as in `render.TileTemplate.render()`.  Its
+    values are read from the collection when the view is created.  Setting
+    `poster_url` or `thumbnails` also updates the collection.
+
+    Views are created by MovieCollection, rather than directly.
+
+    Constructor Args:
+        collection (MovieCollection): The collection containing the movie.
+        index (int): The position of the movie in the collection.
+        title, summary, poster_url, youtube_id, thumbnails: The movie's
+            values, as for Movie.
+    """
+
+    __slots__ = ['title', 'summary', '_poster_url', 'youtube_id',
+                 '_thumbnails', '_collection', '_index']
+
+    def __init__(self, collection, index, title, summary, poster_url,
+                 youtube_id, thumbnails):
+        """Initialize a MovieView instance."""
+        self._collection = collection
+        self._index = index
+        self.title = title
+        self.summary = summary
+        self._poster_url = poster_url
+        self.youtube_id = youtube_id
+        self._thumbnails = thumbnails
 
     @property
-    def youtube_url(self):
-        return self.__youtube_url_base.format(self=self)
+    def poster_url(self):
+        return self._poster_url
+
+    @poster_url.setter
+    def poster_url(self, value):
+        self._poster_url = value
+        self._collection._poster_urls[self._index] = value
+
+    @property
+    def thumbnails(self):
+        return self._thumbnails
+
+    @thumbnails.setter
+    def thumbnails(self, value):
+        self._thumbnails = tuple(value)
+        self._collection._thumbnails[self._index] = self._thumbnails
+
+
+class MovieCollection(object):
+    """A compact, ordered collection of movies, stored column by column.
+
+    Storing each field in its own column avoids a Movie object and four
+    separate string objects per movie, which adds up for catalogs of
+    hundreds of thousands of movies.  Text is stored in large shared
+    blocks, and YouTube video IDs are packed into a byte buffer.
+
+    Iterating over (or indexing) a collection yields MovieView objects,
+    which are interchangeable with Movie instances.  Slicing a collection
+    returns a new MovieCollection.
+
+    Constructor Args:
+        movie_args (Iterable[tuple[str, str, str, str]]): The arguments for
+            each movie, as yielded by `generate_movie_args()`.
+    """
+
+    __slots__ = ['_titles', '_summaries', '_poster_urls', '_youtube_ids',
+                 '_thumbnails']
+
+    def __init__(self, movie_args=()):
+        """Initialize a MovieCollection instance."""
+        self._titles = _TextColumn()
+        self._summaries = _TextColumn()
+        self._poster_urls = _TextColumn()
+        self._youtube_ids = _IDColumn()
+        self._thumbnails = {}  # {<index>: <thumbnails>}
+
+        for args in movie_args:
+            self.append(*args)
+
+    def append(self, title, summary, poster_url, youtube_id,
+               thumbnails=()):
+        """Add a movie to the end of the collection.
+
+        Args:
+            The same arguments as Movie.
+        """
+        if thumbnails:
+            self._thumbnails[len(self._youtube_ids)] = tuple(thumbnails)
+
+        self._titles.append(title)
+        self._summaries.append(summary)
+        self._poster_urls.append(poster_url)
+        self._youtube_ids.append(youtube_id)
+
+    def __len__(self):
+        """Return the number of movies in the collection."""
+        return len(self._youtube_ids)
+
+    def __iter__(self):
+        """Yield a MovieView for each movie in the collection."""
+        block_size = _TextColumn.BLOCK_SIZE
+        thumbnails = self._thumbnails
+
+        # Read the columns a block at a time, and create the views in C
+        for first in range(0, len(self), block_size):
+            block_number = first // block_size
+            columns = [column.block_values(block_number)
+                       for column in (self._titles, self._summaries,
+                                      self._poster_urls, self._youtube_ids)]
+
+            if thumbnails:
+                block_thumbnails = [
+                    thumbnails.get(index, ())
+                    for index in range(first, first + len(columns[0]))]
+            else:
+                block_thumbnails = repeat(())
+
+            for view in map(MovieView, repeat(self), count(first), *(
+                    columns + [block_thumbnails])):
+                yield view
+
+    def __getitem__(self, key):
+        """Return a MovieView for an index, or a new collection for a slice.
+
+        Args:
+            key (Union[int, slice]): The index or slice to get.
+
+        Returns:
+            Union[MovieView, MovieCollection]: The view or the new
+                                               collection.
+
+        Raises:
+            IndexError: Raised if an index is out of range.
+        """
+        if isinstance(key, slice):
+            sliced = MovieCollection()
+            for index in range(*key.indices(len(self))):
+                sliced.append(*self.movie_args(index),
+                              thumbnails=self._thumbnails.get(index, ()))
+            return sliced
+
+        length = len(self)
+        if key < 0:
+            key += length
+        if not 0 <= key < length:
+            raise IndexError('MovieCollection index out of range')
+
+        return MovieView(self, key, *self.movie_args(key),
+                         thumbnails=self._thumbnails.get(key, ()))
+
+    def movie_args(self, index):
+        """Return the Movie constructor arguments for one movie.
+
+        Args:
+            index (int): The (non-negative) index of the movie.
+
+        Returns:
+            tuple[str, str, str, str]: The movie's title, summary, poster URL
+                                       and YouTube video ID.
+        """
+        return (self._titles[index], self._summaries[index],
+                self._poster_urls[index], self._youtube_ids[index])
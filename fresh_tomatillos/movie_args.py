@@ -7,17 +7,18 @@ Provides the glue between fresh_tomatillos.get_config and
 fresh_tomatillos.media.Movie.  The `generate_movie_args()` function
 defined here uses data from a config object to yield the arguments
 required by the Movie class's constructor.
+
+`normalize_youtube_sources()` converts a stream of YouTube IDs or URLs.
 """
 
 from __future__ import unicode_literals
+import re
 import string
 try:
-    # Python 3
-    from urllib.parse import urlsplit, parse_qs
+    from functools import lru_cache  # Python 3
 except ImportError:
-    # Python 2
-    from urlparse import urlsplit, parse_qs
-
+    def lru_cache(maxsize=128):  # Python 2: no memoization
+        return lambda function: function
 from fresh_tomatillos.exceptions import InvalidVideoID
 
 
@@ -25,6 +26,15 @@ YOUTUBE_ID_CHARACTERS = frozenset(string.ascii_letters + string.digits + '-_')
 LONG_HOSTNAMES = ('www.youtube.com', 'youtube.com', 'm.youtube.com')
 SHORT_HOSTNAMES = ('youtu.be',)
 
+# Equivalent to checking a string's characters against YOUTUBE_ID_CHARACTERS
+YOUTUBE_ID_PATTERN = re.compile(r'[A-Za-z0-9_-]+\Z')
+
+# Every hostname in LONG_HOSTNAMES and SHORT_HOSTNAMES contains this
+YOUTUBE_HOSTNAME_PATTERN = re.compile('youtu', re.IGNORECASE)
+
+# The number of distinct URLs for which to remember the extracted video ID
+URL_CACHE_SIZE = 4096
+
 
 def _is_potential_youtube_id(id_string):
     """Determine whether a string might be a valid YouTube video ID.
@@ -42,8 +52,7 @@ def _is_potential_youtube_id(id_string):
     """
     # Assume it's a valid ID if it only has YOUTUBE_ID_CHARACTERS
     # Don't require length of 11, since YouTube could change the length
-    return (len(id_string) > 0 and
-            frozenset(id_string).issubset(YOUTUBE_ID_CHARACTERS))
+    return YOUTUBE_ID_PATTERN.match(id_string) is not None
 
 
 def _parse_youtube_url(url):
@@ -55,6 +64,15 @@ def _parse_youtube_url(url):
     Returns:
         SplitResult: An object returned by `urllib.parse.urlsplit()`.
     """
+    # URL parsing is only imported once a source turns out not to be a bare
+    # video ID, which keeps it out of startup (and out of many builds)
+    try:
+        # Python 3
+        from urllib.parse import urlsplit
+    except ImportError:
+        # Python 2
+        from urlparse import urlsplit
+
     split_url = urlsplit(url)
 
     # Add a URL scheme if `url` doesn't already include one
@@ -65,6 +83,7 @@ def _parse_youtube_url(url):
     return split_url
 
 
+@lru_cache(maxsize=URL_CACHE_SIZE)
 def _get_youtube_id_from_url(url):
     """Extract a YouTube video ID from a URL.
 
@@ -79,7 +98,16 @@ def _get_youtube_id_from_url(url):
 
     Returns:
         Optional[str]: A YouTube video ID if one was found, otherwise None.
+                       Results are memoized, since catalogs often repeat
+                       the same trailer URLs.
     """
+    try:
+        # Python 3
+        from urllib.parse import parse_qs
+    except ImportError:
+        # Python 2
+        from urlparse import parse_qs
+
     youtube_id = None  # Initialize return value
     split_url = _parse_youtube_url(url)
 
@@ -107,6 +135,54 @@ def _get_youtube_id_from_url(url):
     return youtube_id
 
 
+def _youtube_id_from_source(youtube_source):
+    """Return the YouTube video ID for a video ID or URL, if there is one.
+
+    Args:
+        youtube_source (str): A YouTube video URL or a YouTube video ID.
+
+    Returns:
+        Optional[str]: A YouTube video ID if one was found, otherwise None.
+    """
+    # Return early if youtube_source already looks like an ID
+    if YOUTUBE_ID_PATTERN.match(youtube_source):
+        return youtube_source
+
+    # Only parse strings which could contain a YouTube hostname
+    if YOUTUBE_HOSTNAME_PATTERN.search(youtube_source):
+        return _get_youtube_id_from_url(youtube_source)
+
+    return None
+
+
+def normalize_youtube_sources(youtube_sources):
+    """Yield the YouTube video IDs for many video IDs or URLs.
+
+    Sources are converted one at a time, as they are consumed, so the
+    sources can be streamed from a file without holding them in memory.
+    URLs share the memoized parsing of `_get_youtube_id()`.
+
+    Args:
+        youtube_sources (Iterable[str]): YouTube video URLs or video IDs.
+
+    Yields:
+        Optional[str]: The video ID for each item in `youtube_sources`, in
+                       the same order.  Items which are neither a valid
+                       YouTube video ID nor a valid YouTube URL give None.
+    """
+    match_id = YOUTUBE_ID_PATTERN.match
+    search_hostname = YOUTUBE_HOSTNAME_PATTERN.search
+    get_id_from_url = _get_youtube_id_from_url
+
+    for source in youtube_sources:
+        if match_id(source):
+            yield source
+        elif search_hostname(source):
+            yield get_id_from_url(source)
+        else:
+            yield None
+
+
 def _get_youtube_id(youtube_source, title):
     """Return a YouTube video ID.
 
@@ -121,11 +197,7 @@ def _get_youtube_id(youtube_source, title):
         InvalidVideoID: Raised if `id_string` is neither a valid YouTube
                         video ID nor a valid YouTube URL.
     """
-    # Return early if youtube_source already looks like an ID
-    if _is_potential_youtube_id(youtube_source):
-        return youtube_source
-
-    youtube_id = _get_youtube_id_from_url(youtube_source)
+    youtube_id = _youtube_id_from_source(youtube_source)
 
     if not youtube_id:
         raise InvalidVideoID(
@@ -136,6 +208,31 @@ def _get_youtube_id(youtube_source, title):
     return youtube_id
 
 
+def section_movie_args(config, title):
+    """Return the arguments to pass to the Movie constructor for one movie.
+
+    Args:
+        config (ConfigParser): The config object containing the movie.
+        title (str): The section of `config` describing the movie.  It is
+                     assumed to have string values for all of the keys
+                     listed in `generate_movie_args()`.
+
+    Returns:
+        tuple[str, str, str, str]: The arguments for a single movie, in the
+            same form as the tuples yielded by `generate_movie_args()`.
+
+    Raises:
+        InvalidVideoID: Raised if the 'youtube' key for the movie is not
+                        valid as a YouTube video ID or URL.
+                        (raised in a call to _get_youtube_id())
+    """
+    return (title,
+            config.get(title, 'summary'),
+            config.get(title, 'poster'),
+            # Exceptions raised by _get_youtube_id() are not caught here
+            _get_youtube_id(config.get(title, 'youtube'), title))
+
+
 def generate_movie_args(config):
     """Return a generator, yielding arguments to pass to the Movie constructor.
 
@@ -160,25 +257,7 @@ def generate_movie_args(config):
     Raises:
         InvalidVideoID: Raised if the 'youtube' key for any movie in
                         `config` is not valid as a YouTube video ID or URL.
-                        (raised in a call to _get_youtube_id())
+                        (raised in a call to section_movie_args())
     """
-    def lookup_function(title):
-        """Create a function for looking up keys in the `title` config section.
-
-        Args:
-            title: (str): The section of `config` in which the returned
-                          function will look up values by key.
-
-        Returns:
-            Callable[str] -> str: A function to look up values by key, specific
-                                  to the `title` section of `config`.
-        """
-        return lambda key: config.get(title, key)
-
     for title in config.sections():
-        get_key = lookup_function(title)
-        yield (title,
-               get_key('summary'),
-               get_key('poster'),
-               # Exceptions raised by _get_youtube_id() are not caught here
-               _get_youtube_id(get_key('youtube'), title))
+        yield section_movie_args(config, title)
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+fresh_tomatillos.offline
+~~~~~~~~~~~~~~~~~~~~~~~~
+
+Implements writing a service worker for a generated page, which keeps the
+page, its static files and its posters in the browser's cache, so repeat
+visits load them from the cache (and the page works offline).
+
+The service worker (`static/service_worker.js`) is written next to the
+page, preceded by its precache manifest: the URL of every file to cache,
+with a revision which changes whenever the file does.  Posters have no
+revision, since mirrored posters and thumbnails are named after their
+content, and posters on other websites can't be read.  The manifest
+is versioned by a hash of every entry, so the service worker changes, and
+is updated by the browser, exactly when something it caches changed; only
+the changed entries are then fetched again.
+
+Browsers only run service workers for pages served over HTTP(S), such as
+with `--serve`, not for `file://` pages.
+"""
+
+from __future__ import unicode_literals
+import hashlib
+import io
+import json
+import os
+
+
+SERVICE_WORKER_SUFFIX = '.sw.js'
+SERVICE_WORKER_SOURCE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'static', 'service_worker.js')
+SERVICE_WORKER_HEADER = (
+    'var PRECACHE_VERSION = {version};\n'
+    'var PRECACHE_PAGE = {page};\n'
+    'var PRECACHE_ENTRIES = {entries};\n\n')
+REVISION_LENGTH = 10
+
+
+def service_worker_path(output_path):
+    """Return the path of the service worker for a page.
+
+    Args:
+        output_path (str): The path of the page, such as `movies.html`.
+
+    Returns:
+        str: The path of its service worker, such as `movies.sw.js`.
+    """
+    return os.path.splitext(output_path)[0] + SERVICE_WORKER_SUFFIX
+
+
+def file_revision(path):
+    """Return a short hash of a file's contents.
+
+    Args:
+        path (str): The path of the file.
+
+    Returns:
+        str: A hex digest, which changes whenever the file does.
+
+    Raises:
+        IOError: Raised if the file can't be read.
+    """
+    digest = hashlib.sha1()
+    with io.open(path, 'rb') as input_file:
+        for block in iter(lambda: input_file.read(65536), b''):
+            digest.update(block)
+    return digest.hexdigest()[:REVISION_LENGTH]
+
+
+def poster_urls(movies):
+    """Return the URLs of the posters (or thumbnails) shown for movies.
+
+    Args:
+        movies (Iterable[Movie]): The movies on the page(s).
+
+    Returns:
+        list[str]: The URLs, without duplicates.  For a movie with
+                   thumbnails, those are listed instead of its poster,
+                   since the page loads one of them instead.
+    """
+    urls = set()
+    for movie in movies:
+        if movie.thumbnails:
+            for _, fallback_url, webp_url in movie.thumbnails:
+                urls.add(fallback_url)
+                urls.add(webp_url)
+        else:
+            urls.add(movie.poster_url)
+    return sorted(urls)
+
+
+def precache_entries(output_dir, paths, movies):
+    """Return the precache manifest for a page.
+
+    Args:
+        output_dir (str): The directory of the page and its service worker.
+        paths (Iterable[str]): The paths of the page(s) and the files they
+                               load, in `output_dir` or its subdirectories.
+        movies (Iterable[Movie]): The movies on the page(s).
+
+    Returns:
+        list[tuple[str, Optional[str]]]: The URL of each entry, relative to
+            `output_dir`, and its revision (or None if its URL changes
+            whenever its content does), sorted by URL.
+
+    Raises:
+        IOError: Raised if a file can't be read.
+    """
+    entries = dict.fromkeys(poster_urls(movies))
+
+    for path in paths:
+        url = os.path.relpath(path, output_dir).replace(os.sep, '/')
+        entries[url] = file_revision(path)
+
+    return sorted(entries.items())
+
+
+def write_service_worker(output_path, paths, movies):
+    """Write the service worker for a page, next to the page.
+
+    Args:
+        output_path (str): The path of the page, which is served from the
+                           cache when the browser is offline.
+        paths (Iterable[str]): The paths of the page(s) and the files they
+                               load (see `precache_entries()`).
+        movies (Iterable[Movie]): The movies on the page(s).
+
+    Returns:
+        tuple[str, int, str]: The path of the written service worker, the
+                              number of entries it caches, and its version.
+
+    Raises:
+        IOError: Raised if a file can't be read, or the service worker
+                 can't be written.
+    """
+    # Importing this module shouldn't import every output module
+    from fresh_tomatillos.output import atomic_open
+
+    output_dir = os.path.dirname(output_path)
+    entries = precache_entries(output_dir, paths, movies)
+
+    digest = hashlib.sha1()
+    for url, revision in entries:
+        digest.update('{0}\0{1}\n'.format(url, revision or '').encode(
+            'utf-8'))
+    version = digest.hexdigest()[:REVISION_LENGTH]
+
+    with io.open(SERVICE_WORKER_SOURCE, 'r', encoding='utf-8') as source:
+        script = source.read()
+
+    header = SERVICE_WORKER_HEADER.format(
+        version=json.dumps(version),
+        page=json.dumps(os.path.basename(output_path)),
+        entries=json.dumps([list(entry) for entry in entries],
+                           separators=(',', ':')))
+
+    path = service_worker_path(output_path)
+    with atomic_open(path) as worker_file:
+        worker_file.write(header + script)
+
+    return path, len(entries), version
@@ -0,0 +1,411 @@
+# -*- coding: utf-8 -*-
+"""
+fresh_tomatillos.output
+~~~~~~~~~~~~~~~~~~~~~~~
+
+Implements writing output files atomically, so that readers (such as a
+browser reloading the page) never see a partially written file.
+
+Generated pages are written with `output_file()`, which also leaves a page
+untouched when its content hasn't changed, and can write compressed copies
+of it (such as `page.html.gz`) for web servers to send as they are.
+"""
+
+from __future__ import unicode_literals
+import hashlib
+import io
+import os
+import tempfile
+import threading
+import zlib
+from contextlib import contextmanager
+
+try:
+    import queue  # Python 3
+except ImportError:
+    import Queue as queue  # Python 2
+
+try:
+    import brotli
+except ImportError:
+    brotli = None  # Optional dependency: only gzip copies will be written
+
+try:
+    _replace = os.replace  # Python 3
+except AttributeError:
+    _replace = os.rename  # Python 2
+
+# Permissions for newly created output files, before the umask is applied
+NEW_FILE_MODE = 0o666
+
+# The suffixes of compressed copies, in the order they're written
+GZIP_SUFFIX = '.gz'
+BROTLI_SUFFIX = '.br'
+COMPRESSED_SUFFIXES = (GZIP_SUFFIX, BROTLI_SUFFIX)
+# Brotli's highest qualities are too slow for pages of many megabytes
+BROTLI_QUALITY = 9
+
+# Text written to an OutputWriter is passed to the compressing thread in
+# chunks of at least this many bytes, with at most QUEUED_CHUNKS waiting
+CHUNK_SIZE = 65536
+QUEUED_CHUNKS = 16
+
+# os.umask() can only read the umask by changing it, which would race with
+# other threads creating files, so it is only read once, on import
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def _copy_mode(path, temp_path):
+    """Give a temporary file the permissions of the file it will replace.
+
+    mkstemp() creates files which only the owner can read, so a new file
+    gets the permissions of any other newly created file instead.
+    """
+    try:
+        mode = os.stat(path).st_mode & 0o777
+    except OSError:
+        mode = NEW_FILE_MODE & ~_UMASK
+    os.chmod(temp_path, mode)
+
+
+def _temp_file(path):
+    """Create a temporary file next to `path`, to be renamed over it.
+
+    Returns:
+        tuple[int, str]: The OS-level handle and path of the file.
+    """
+    directory, name = os.path.split(os.path.abspath(path))
+    return tempfile.mkstemp(dir=directory, prefix='.' + name, suffix='.tmp')
+
+
+def _remove(path):
+    """Remove a file, if it exists."""
+    try:
+        os.remove(path)
+    except OSError:
+        if os.path.exists(path):
+            raise
+
+
+def file_digest(path):
+    """Return the SHA-1 digest of a file's contents.
+
+    Args:
+        path (str): The path of the file.
+
+    Returns:
+        Optional[bytes]: The digest, or None if the file doesn't exist.
+
+    Raises:
+        IOError: Raised if the file exists, but can't be read.
+    """
+    digest = hashlib.sha1()
+    try:
+        input_file = io.open(path, 'rb')
+    except (IOError, OSError):
+        if os.path.exists(path):
+            raise
+        return None
+
+    with input_file:
+        for block in iter(lambda: input_file.read(CHUNK_SIZE), b''):
+            digest.update(block)
+    return digest.digest()
+
+
+@contextmanager
+def atomic_open(path, binary=False):
+    """Open a file for writing, replacing `path` only once writing succeeds.
+
+    Data is written to a temporary file in the same directory as `path`,
+    which is then renamed over `path`.  If an exception is raised inside the
+    `with` block, the temporary file is removed and `path` is left as it
+    was.
+
+    Args:
+        path (str): The path of the file to (over)write.
+        binary (bool): Whether to open the file in binary mode, rather than
+                       as UTF-8 text.
+
+    Yields:
+        IO: A writable file object.
+    """
+    handle, temp_path = _temp_file(path)
+    try:
+        _copy_mode(path, temp_path)
+
+        if binary:
+            output_file = io.open(handle, 'wb')
+        else:
+            output_file = io.open(handle, 'w', encoding='utf-8')
+
+        with output_file:
+            yield output_file
+
+        _replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+def compressed_suffixes():
+    """Return the suffixes of the compressed copies `output_file()` writes.
+
+    Returns:
+        tuple[str, ...]: `GZIP_SUFFIX`, followed by `BROTLI_SUFFIX` if the
+                         `brotli` package is installed.
+    """
+    if brotli is None:
+        return (GZIP_SUFFIX,)
+    return COMPRESSED_SUFFIXES
+
+
+def _compressor(suffix):
+    """Return a compressor object for a compressed copy's suffix.
+
+    Returns:
+        tuple[Callable[[bytes], bytes], Callable[[], bytes]]: Functions
+            compressing the next data, and flushing the compressed data
+            that remains.
+    """
+    if suffix == GZIP_SUFFIX:
+        # A wbits value of 16 + MAX_WBITS writes a gzip header and trailer
+        compressor = zlib.compressobj(9, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        return compressor.compress, compressor.flush
+
+    compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+    return compressor.process, compressor.finish
+
+
+class _CompressingThread(object):
+    """Writes compressed copies of a file in a background thread.
+
+    zlib and brotli release the GIL while compressing, so the copies are
+    compressed in parallel with the rest of the file being rendered.
+
+    Constructor Args:
+        path (str): The path of the file being written.  Each copy is
+                    written to a temporary file next to `path + suffix`.
+        suffixes (Sequence[str]): The suffixes of the copies to write.
+    """
+
+    __slots__ = ['paths', 'temp_paths', '_queue', '_thread', '_error']
+
+    def __init__(self, path, suffixes):
+        """Initialize a _CompressingThread instance, and start the thread."""
+        self.paths = [path + suffix for suffix in suffixes]
+        self.temp_paths = []
+        self._queue = queue.Queue(QUEUED_CHUNKS)
+        self._error = None
+
+        outputs = []
+        try:
+            for copy_path, suffix in zip(self.paths, suffixes):
+                handle, temp_path = _temp_file(copy_path)
+                self.temp_paths.append(temp_path)
+                outputs.append((io.open(handle, 'wb'), _compressor(suffix)))
+        except BaseException:
+            for output_file, _ in outputs:
+                output_file.close()
+            self.discard()
+            raise
+
+        self._thread = threading.Thread(target=self._run, args=(outputs,))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self, outputs):
+        """Compress every chunk queued, until None is queued."""
+        try:
+            for chunk in iter(self._queue.get, None):
+                if self._error is not None:
+                    continue  # Keep draining the queue, so put() can't block
+                try:
+                    for output_file, (compress, _) in outputs:
+                        output_file.write(compress(chunk))
+                except Exception as e:  # Re-raised by finish()
+                    self._error = e
+
+            if self._error is None:
+                for output_file, (_, flush) in outputs:
+                    output_file.write(flush())
+        except Exception as e:
+            self._error = e
+        finally:
+            for output_file, _ in outputs:
+                output_file.close()
+
+    def put(self, chunk):
+        """Queue data to be compressed."""
+        self._queue.put(chunk)
+
+    def finish(self):
+        """Wait until every chunk has been compressed and written.
+
+        Raises:
+            Exception: Any exception raised while compressing or writing.
+        """
+        self._queue.put(None)
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+    def discard(self):
+        """Remove the temporary files."""
+        for temp_path in self.temp_paths:
+            _remove(temp_path)
+
+
+class OutputWriter(object):
+    """A writable text file object used by `output_file()`.
+
+    Text is encoded as UTF-8 and written to a temporary file, while its
+    digest is computed (and compressed copies are written, if requested).
+
+    Constructor Args:
+        path (str): The path of the file to (over)write.
+        compress (bool): Whether to write compressed copies of the file.
+
+    Instance Attributes:
+        path (str): The path of the file to (over)write.
+        changed (Optional[bool]): Whether the file's content changed (so it
+            was replaced), or None until the writer is committed.
+        written_paths (list[str]): The paths replaced when committing,
+                                   including any compressed copies.
+    """
+
+    __slots__ = ['path', 'changed', 'written_paths', '_file', '_temp_path',
+                 '_digest', '_chunks', '_chunk_size', '_compressing']
+
+    def __init__(self, path, compress=False):
+        """Initialize an OutputWriter instance."""
+        self.path = path
+        self.changed = None
+        self.written_paths = []
+        self._digest = hashlib.sha1()
+        self._chunks = []
+        self._chunk_size = 0
+
+        handle, self._temp_path = _temp_file(path)
+        self._file = io.open(handle, 'wb')
+        self._compressing = None
+        if compress:
+            try:
+                self._compressing = _CompressingThread(
+                    path, compressed_suffixes())
+            except BaseException:
+                self._file.close()
+                _remove(self._temp_path)
+                raise
+
+    def write(self, text):
+        """Write a Unicode string to the file."""
+        data = text.encode('utf-8')
+        self._digest.update(data)
+        self._file.write(data)
+
+        if self._compressing is not None:
+            self._chunks.append(data)
+            self._chunk_size += len(data)
+            if self._chunk_size >= CHUNK_SIZE:
+                self._compressing.put(b''.join(self._chunks))
+                self._chunks = []
+                self._chunk_size = 0
+
+    def commit(self):
+        """Replace the file (and its copies) if its content changed.
+
+        Compressed copies are also written if they didn't exist yet, and
+        outdated copies are removed when the file changes without them.
+        """
+        try:
+            self._file.close()
+            if self._compressing is not None:
+                if self._chunks:
+                    self._compressing.put(b''.join(self._chunks))
+                self._compressing.finish()
+            # Files of different sizes can't be the same, without reading
+            try:
+                same_size = (os.path.getsize(self.path) ==
+                             os.path.getsize(self._temp_path))
+            except OSError:
+                same_size = False  # There's no file yet
+            self.changed = (not same_size or
+                            file_digest(self.path) != self._digest.digest())
+        except BaseException:
+            self.abort()
+            raise
+
+        # The temporary files which haven't been renamed yet
+        temp_paths = [self._temp_path]
+        copies = []
+        if self._compressing is not None:
+            copies = list(zip(self._compressing.paths,
+                              self._compressing.temp_paths))
+            temp_paths.extend(self._compressing.temp_paths)
+            self._compressing.temp_paths = []
+
+        # Replace any compressed copies, then the file itself, removing the
+        # temporary files left over even if replacing one fails
+        try:
+            for copy_path, temp_path in copies:
+                if self.changed or not os.path.exists(copy_path):
+                    _copy_mode(copy_path, temp_path)
+                    _replace(temp_path, copy_path)
+                    temp_paths.remove(temp_path)
+                    self.written_paths.append(copy_path)
+
+            if self.changed:
+                for suffix in COMPRESSED_SUFFIXES:
+                    if self.path + suffix not in self.written_paths:
+                        _remove(self.path + suffix)
+
+                _copy_mode(self.path, self._temp_path)
+                _replace(self._temp_path, self.path)
+                temp_paths.remove(self._temp_path)
+                self.written_paths.insert(0, self.path)
+        finally:
+            for temp_path in temp_paths:
+                _remove(temp_path)
+
+    def abort(self):
+        """Remove the temporary files, leaving the file as it was."""
+        self._file.close()
+        if self._compressing is not None:
+            try:
+                self._compressing.finish()
+            except Exception:
+                pass  # The copies are being discarded anyway
+            self._compressing.discard()
+        _remove(self._temp_path)
+
+
+@contextmanager
+def output_file(path, compress=False):
+    """Open a generated file for writing, replacing it only if it changed.
+
+    Like `atomic_open()`, text is written to a temporary file, which is
+    renamed over `path` once writing succeeds.  If the text is the same as
+    the current content of `path`, the temporary file is removed instead,
+    so the file (and its modification time) is left as it was.
+
+    Compressed copies (`path + '.gz'`, and `path + '.br'` if the `brotli`
+    package is installed) are compressed by another thread while the text
+    is written.
+
+    Args:
+        path (str): The path of the file to (over)write.
+        compress (bool): Whether to write compressed copies of the file.
+
+    Yields:
+        OutputWriter: A writable text file object, whose `changed`
+                      attribute is set once the `with` block exits.
+    """
+    writer = OutputWriter(path, compress)
+    try:
+        yield writer
+    except BaseException:
+        writer.abort()
+        raise
+    writer.commit()
@@ -0,0 +1,381 @@
+# -*- coding: utf-8 -*-
+"""
+fresh_tomatillos.posters
+~~~~~~~~~~~~~~~~~~~~~~~~
+
+Implements mirroring remote poster images into a local directory, so the
+generated page doesn't hotlink them from their origin servers.
+
+Posters are downloaded concurrently by a bounded pool of threads, each
+reusing one keep-alive connection per host.  Every image is stored under a
+name derived from a hash of its contents, so identical posters are stored
+once and a stored file never changes.  An index in the same directory
+records each URL's ETag and Last-Modified headers, which are sent back as
+conditional request headers on later runs; an unchanged poster costs one
+bodiless 304 response.
+"""
+
+from __future__ import unicode_literals
+import hashlib
+import io
+import json
+import mimetypes
+import os
+import threading
+from collections import namedtuple
+try:
+    from concurrent.futures import ThreadPoolExecutor  # Python 3
+except ImportError:
+    ThreadPoolExecutor = None  # Python 2, without the `futures` backport
+try:
+    from http.client import HTTPConnection, HTTPSConnection  # Python 3
+    from http.client import HTTPException
+    from urllib.parse import urljoin, urlsplit
+except ImportError:
+    from httplib import HTTPConnection, HTTPSConnection  # Python 2
+    from httplib import HTTPException
+    from urlparse import urljoin, urlsplit
+
+from fresh_tomatillos import __version__
+from fresh_tomatillos.output import atomic_open
+
+
+# The directory, next to the generated page, in which posters are mirrored
+POSTERS_DIRNAME = 'posters'
+INDEX_FILENAME = 'index.json'
+INDEX_FORMAT = 1
+
+DEFAULT_WORKERS = 8
+TIMEOUT = 30  # Seconds
+MAX_REDIRECTS = 5
+USER_AGENT = 'fresh_tomatillos/' + __version__
+
+# Prefer short, familiar extensions over mimetypes.guess_extension()
+IMAGE_EXTENSIONS = {
+    'image/gif': '.gif',
+    'image/jpeg': '.jpg',
+    'image/png': '.png',
+    'image/svg+xml': '.svg',
+    'image/webp': '.webp',
+}
+
+
+# The outcome of mirror_urls():
+#   files: {<url>: <mirrored file name>}
+#   errors: {<url>: <error message>} for URLs which couldn't be mirrored
+#   downloaded: the number of images which were downloaded
+#   not_modified: the number of images unchanged since the previous run
+MirrorResult = namedtuple(
+    'MirrorResult', ['files', 'errors', 'downloaded', 'not_modified'])
+
+
+def load_index(store_dir):
+    """Return the index of previously mirrored URLs.
+
+    Args:
+        store_dir (str): The directory containing mirrored posters.
+
+    Returns:
+        dict[str, dict]: Maps each URL to a dict with the keys 'file',
+                         'etag' and 'last_modified'.  Empty if no usable
+                         index exists.
+    """
+    path = os.path.join(store_dir, INDEX_FILENAME)
+    try:
+        with io.open(path, 'r', encoding='utf-8') as index_file:
+            data = json.load(index_file)
+    except (IOError, OSError, ValueError):
+        return {}
+
+    if (not isinstance(data, dict) or
+            data.get('format') != INDEX_FORMAT or
+            not isinstance(data.get('urls'), dict)):
+        return {}
+
+    return data['urls']
+
+
+def save_index(store_dir, index):
+    """Write the index of mirrored URLs.
+
+    Args:
+        store_dir (str): The directory containing mirrored posters.
+        index (dict[str, dict]): The index, as returned by `load_index()`.
+    """
+    path = os.path.join(store_dir, INDEX_FILENAME)
+    with atomic_open(path) as index_file:
+        index_file.write(json.dumps({'format': INDEX_FORMAT, 'urls': index},
+                                    ensure_ascii=False,
+                                    separators=(',', ':')))
+
+
+def is_remote(url):
+    """Return whether a poster URL refers to an HTTP(S) server."""
+    return urlsplit(url).scheme.lower() in ('http', 'https')
+
+
+def _extension(content_type, url):
+    """Return the file extension to use for a downloaded image.
+
+    Args:
+        content_type (str): The Content-Type response header.
+        url (str): The URL the image was downloaded from.
+
+    Returns:
+        Optional[str]: The extension, including its leading dot, or None if
+                       the response is not an image.
+    """
+    media_type = content_type.split(';')[0].strip().lower()
+
+    if media_type in IMAGE_EXTENSIONS:
+        return IMAGE_EXTENSIONS[media_type]
+    if media_type.startswith('image/'):
+        return mimetypes.guess_extension(media_type) or ''
+    if media_type in ('', 'application/octet-stream'):
+        # Trust the URL, as long as it looks like an image
+        extension = os.path.splitext(urlsplit(url).path)[1].lower()
+        if mimetypes.guess_type('poster' + extension)[0] in IMAGE_EXTENSIONS:
+            return '.jpg' if extension == '.jpeg' else extension
+    return None
+
+
+class _Client(object):
+    """Sends requests over one keep-alive connection per host.
+
+    Each instance must only be used by one thread at a time.
+    """
+
+    __slots__ = ['_connections']
+
+    def __init__(self):
+        """Initialize a _Client instance."""
+        self._connections = {}
+
+    def close(self):
+        """Close every open connection."""
+        for connection in self._connections.values():
+            connection.close()
+        self._connections.clear()
+
+    def _connection(self, scheme, netloc):
+        """Return an open (or lazily opened) connection to a host."""
+        key = (scheme, netloc)
+        connection = self._connections.get(key)
+        if connection is None:
+            if scheme == 'https':
+                connection = HTTPSConnection(netloc, timeout=TIMEOUT)
+            else:
+                connection = HTTPConnection(netloc, timeout=TIMEOUT)
+            self._connections[key] = connection
+        return connection
+
+    def get(self, url, headers):
+        """Send a GET request, following redirects.
+
+        Args:
+            url (str): The URL to request.
+            headers (dict[str, str]): Extra request headers.
+
+        Returns:
+            tuple[int, dict[str, str], bytes, str]: The response's status,
+                its headers (with lowercase names), its body and the URL of
+                the final response.
+
+        Raises:
+            IOError: Raised if the request fails or redirects too often.
+            HTTPException: Raised if the server sends an invalid response.
+        """
+        headers = dict(headers)
+        headers['User-Agent'] = USER_AGENT
+
+        for _ in range(MAX_REDIRECTS + 1):
+            split_url = urlsplit(url)
+            target = split_url.path or '/'
+            if split_url.query:
+                target += '?' + split_url.query
+
+            scheme = split_url.scheme.lower()
+            response = None
+            for attempt in (1, 2):
+                connection = self._connection(scheme, split_url.netloc)
+                try:
+                    connection.request('GET', target, headers=headers)
+                    response = connection.getresponse()
+                    body = response.read()
+                    break
+                except (IOError, OSError, HTTPException):
+                    # The server may have closed an idle keep-alive
+                    # connection, so retry once on a new one
+                    connection.close()
+                    del self._connections[(scheme, split_url.netloc)]
+                    if attempt == 2:
+                        raise
+
+            response_headers = dict((name.lower(), value)
+                                    for name, value in response.getheaders())
+
+            if response.status in (301, 302, 303, 307, 308):
+                location = response_headers.get('location')
+                if not location:
+                    break
+                url = urljoin(url, location)
+                if not is_remote(url):
+                    raise IOError('Redirected to a non-HTTP URL: ' + url)
+                continue
+
+            return response.status, response_headers, body, url
+
+        raise IOError('Too many redirects')
+
+
+def _mirror_url(url, entry, store_dir, client):
+    """Download one URL into the store, unless it is unchanged.
+
+    Args:
+        url (str): The URL of the image.
+        entry (Optional[dict]): The URL's entry in the index from the
+                                previous run, if any.
+        store_dir (str): The directory containing mirrored posters.
+        client (_Client): The client with which to send requests.
+
+    Returns:
+        tuple[dict, bool]: The URL's new index entry, and whether the image
+                           was downloaded (as opposed to unchanged).
+
+    Raises:
+        IOError: Raised if the image can't be downloaded or stored.
+        HTTPException: Raised if the server sends an invalid response.
+    """
+    headers = {}
+    if (entry is not None and
+            os.path.isfile(os.path.join(store_dir, entry['file']))):
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+
+    status, response_headers, body, final_url = client.get(url, headers)
+
+    if status == 304 and headers:
+        return entry, False
+    if status != 200:
+        raise IOError('The server responded with HTTP status {0}'.format(
+            status))
+
+    extension = _extension(response_headers.get('content-type', ''),
+                           final_url)
+    if extension is None:
+        raise IOError('The server responded with a non-image file ({0})'
+                      .format(response_headers.get('content-type')))
+
+    # Identical images share one file, which never needs to be rewritten
+    name = hashlib.sha256(body).hexdigest()[:32] + extension
+    path = os.path.join(store_dir, name)
+    if not os.path.isfile(path):
+        with atomic_open(path, binary=True) as image_file:
+            image_file.write(body)
+
+    return {'file': name,
+            'etag': response_headers.get('etag'),
+            'last_modified': response_headers.get('last-modified')}, True
+
+
+def mirror_urls(urls, store_dir, max_workers=DEFAULT_WORKERS):
+    """Mirror remote images into a local directory.
+
+    Images which were mirrored by a previous call are only downloaded again
+    if the server reports that they have changed.
+
+    Args:
+        urls (Iterable[str]): The HTTP(S) URLs of the images.
+        store_dir (str): The directory in which to store the images.  It is
+                         created if it doesn't exist.
+        max_workers (int): The maximum number of concurrent downloads.
+
+    Returns:
+        MirrorResult: The mirrored file names and any errors.
+
+    Raises:
+        IOError: Raised if the store directory or its index can't be
+                 written.
+    """
+    if not os.path.isdir(store_dir):
+        os.makedirs(store_dir)
+
+    urls = sorted(set(urls))
+    index = load_index(store_dir)
+    local = threading.local()
+    clients = []
+    clients_lock = threading.Lock()
+
+    def mirror(url):
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = _Client()
+            with clients_lock:
+                clients.append(client)
+
+        try:
+            return url, _mirror_url(url, index.get(url), store_dir, client)
+        except (IOError, OSError, HTTPException, ValueError) as e:
+            return url, e
+
+    try:
+        if ThreadPoolExecutor is None or max_workers == 1 or len(urls) < 2:
+            outcomes = [mirror(url) for url in urls]
+        else:
+            with ThreadPoolExecutor(max_workers) as executor:
+                outcomes = list(executor.map(mirror, urls))
+    finally:
+        for client in clients:
+            client.close()
+
+    files = {}
+    errors = {}
+    downloaded = 0
+    for url, outcome in outcomes:
+        if isinstance(outcome, Exception):
+            errors[url] = '{0}'.format(outcome) or type(outcome).__name__
+            continue
+
+        entry, was_downloaded = outcome
+        index[url] = entry
+        files[url] = entry['file']
+        downloaded += was_downloaded
+
+    save_index(store_dir, index)
+    return MirrorResult(files, errors, downloaded, len(files) - downloaded)
+
+
+def mirror_posters(movies, store_dir, url_prefix=POSTERS_DIRNAME + '/',
+                   max_workers=DEFAULT_WORKERS):
+    """Mirror the posters of movies, and point the movies at the copies.
+
+    Each movie's `poster_url` is rewritten to `url_prefix` followed by the
+    name of its mirrored file.  Posters which aren't remote, or which
+    couldn't be mirrored, keep their original URLs.
+
+    Args:
+        movies (Iterable[Movie]): The movies whose posters to mirror.
+        store_dir (str): The directory in which to store the images.
+        url_prefix (str): The URL of `store_dir`, relative to the page.
+        max_workers (int): The maximum number of concurrent downloads.
+
+    Returns:
+        MirrorResult: The mirrored file names and any errors.
+
+    Raises:
+        IOError: Raised if the store directory or its index can't be
+                 written.
+    """
+    movies = list(movies)
+    result = mirror_urls((movie.poster_url for movie in movies
+                          if is_remote(movie.poster_url)),
+                         store_dir, max_workers)
+
+    for movie in movies:
+        name = result.files.get(movie.poster_url)
+        if name is not None:
+            movie.poster_url = url_prefix + name
+
+    return result
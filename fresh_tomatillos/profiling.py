@@ -0,0 +1,325 @@
+# -*- coding: utf-8 -*-
+"""
+fresh_tomatillos.profiling
+~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+Implements recording the wall time, CPU time and peak memory of each phase
+of a build, along with counts such as the number of config sections or
+bytes written.
+
+Code which makes up a build marks its phases with `phase()` and its counts
+with `count()`.  Both do nothing unless a Profiler has been activated:
+
+    profiler = Profiler()
+    with profiler.activate():
+        main(argv)
+    print(profiler.table())
+
+Phases may be nested; a nested phase's time is included in its parent's.
+Peak memory is the highest memory traced by `tracemalloc` (Python 3 only)
+while the phase ran.  Tracing memory slows down allocation-heavy code, so
+times measured with `trace_memory=True` are somewhat inflated.
+"""
+
+from __future__ import unicode_literals
+import time
+from contextlib import contextmanager
+
+from fresh_tomatillos import __version__
+
+try:
+    _wall_clock = time.perf_counter  # Python 3
+    _cpu_clock = time.process_time
+except AttributeError:
+    _wall_clock = time.time  # Python 2
+    _cpu_clock = time.clock
+
+
+# The stack of active profilers; only the innermost one records anything
+_active_profilers = []
+
+
+class _NullPhase(object):
+    """A reusable context manager which does nothing."""
+
+    __slots__ = []
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_PHASE = _NullPhase()
+
+
+def phase(name):
+    """Return a context manager recording a phase of the active profiler.
+
+    Args:
+        name (str): The name of the phase, such as 'parse_config'.
+
+    Returns:
+        ContextManager: The phase, or a no-op if no profiler is active.
+    """
+    if not _active_profilers:
+        return _NULL_PHASE
+    return _active_profilers[-1].phase(name)
+
+
+def count(name, value=1):
+    """Add to a count of the innermost phase of the active profiler.
+
+    Args:
+        name (str): The name of the count, such as 'bytes_written'.
+        value (int): The amount to add.
+    """
+    if _active_profilers:
+        _active_profilers[-1].count(name, value)
+
+
+def timed_writer(fileobj, name='write_file'):
+    """Return a file object recording the time spent writing to it.
+
+    Args:
+        fileobj (IO): A writable file object.
+        name (str): The name of the phase to record.
+
+    Returns:
+        IO: A TimedWriter wrapping `fileobj`, or `fileobj` itself if no
+            profiler is active (so unprofiled writes have no overhead).
+    """
+    if not _active_profilers:
+        return fileobj
+    return TimedWriter(fileobj, name)
+
+
+class PhaseRecord(object):
+    """The measurements of one phase.
+
+    Instance Attributes:
+        name (str): The name of the phase.
+        depth (int): How many phases the phase was nested in.
+        wall_seconds (float): The elapsed (wall clock) time.
+        cpu_seconds (float): The CPU time used by this process.
+        peak_bytes (Optional[int]): The peak traced memory, or None if
+                                    memory wasn't traced.
+        counts (dict[str, int]): Counts recorded during the phase.
+    """
+
+    __slots__ = ['name', 'depth', 'wall_seconds', 'cpu_seconds',
+                 'peak_bytes', 'counts']
+
+    def __init__(self, name, depth):
+        """Initialize a PhaseRecord instance."""
+        self.name = name
+        self.depth = depth
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.peak_bytes = None
+        self.counts = {}
+
+    def as_dict(self):
+        """Return the record as a dict, suitable for JSON."""
+        return {'phase': self.name, 'depth': self.depth,
+                'wall_seconds': round(self.wall_seconds, 6),
+                'cpu_seconds': round(self.cpu_seconds, 6),
+                'peak_bytes': self.peak_bytes, 'counts': self.counts}
+
+
+class Profiler(object):
+    """Records the phases of a build.
+
+    Constructor Args:
+        trace_memory (bool): Whether to record peak memory with tracemalloc
+                             (ignored in Python 2).
+
+    Instance Attributes:
+        records (list[PhaseRecord]): The completed phases, in the order in
+                                     which they started.
+        started_at (Optional[str]): When the profiler was activated, as an
+                                    ISO 8601 UTC timestamp.
+    """
+
+    __slots__ = ['records', 'started_at', '_tracemalloc', '_open']
+
+    def __init__(self, trace_memory=True):
+        """Initialize a Profiler instance."""
+        self.records = []
+        self.started_at = None
+        self._tracemalloc = None
+        self._open = []  # [(<record>, <peak_so_far>)]
+
+        # Only import tracemalloc when it's used, as it's slow to import
+        if trace_memory:
+            try:
+                import tracemalloc  # Python 3
+            except ImportError:
+                pass  # Python 2: peak memory is not recorded
+            else:
+                self._tracemalloc = tracemalloc
+
+    @contextmanager
+    def activate(self):
+        """Record phases marked by `phase()` and `count()` within a block."""
+        tracemalloc = self._tracemalloc
+        started_tracing = (tracemalloc is not None and
+                           not tracemalloc.is_tracing())
+        if started_tracing:
+            tracemalloc.start()
+
+        self.started_at = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+        _active_profilers.append(self)
+        try:
+            yield self
+        finally:
+            _active_profilers.remove(self)
+            if started_tracing:
+                tracemalloc.stop()
+
+    def _traced_peak(self):
+        """Return the peak traced memory since the last reset, and reset it.
+
+        On Python versions without `tracemalloc.reset_peak()` (before 3.9),
+        the peak is the highest since tracing started.
+        """
+        tracemalloc = self._tracemalloc
+        if tracemalloc is None:
+            return None
+
+        peak = tracemalloc.get_traced_memory()[1]
+        if hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+        return peak
+
+    def _fold_peak(self):
+        """Fold the peak memory so far into every open phase."""
+        peak = self._traced_peak()
+        if peak is not None:
+            self._open = [(record, max(peak, open_peak))
+                          for record, open_peak in self._open]
+
+    @contextmanager
+    def phase(self, name):
+        """Record the time and memory used by a block of code.
+
+        Args:
+            name (str): The name of the phase.
+        """
+        record = PhaseRecord(name, len(self._open))
+        self.records.append(record)
+
+        # Peaks are tracked per phase, so close out the parent's peak so far
+        self._fold_peak()
+        self._open.append((record, 0))
+
+        wall_started = _wall_clock()
+        cpu_started = _cpu_clock()
+        try:
+            yield record
+        finally:
+            record.wall_seconds = _wall_clock() - wall_started
+            record.cpu_seconds = _cpu_clock() - cpu_started
+
+            self._fold_peak()
+            record, peak = self._open.pop()
+            if self._tracemalloc is not None:
+                record.peak_bytes = peak
+
+    def count(self, name, value=1):
+        """Add to a count of the innermost open phase.
+
+        Counts recorded outside of any phase are added to a 'total' phase.
+
+        Args:
+            name (str): The name of the count.
+            value (int): The amount to add.
+        """
+        if self._open:
+            counts = self._open[-1][0].counts
+        else:
+            if not self.records or self.records[0].name != 'total':
+                self.records.insert(0, PhaseRecord('total', 0))
+            counts = self.records[0].counts
+
+        counts[name] = counts.get(name, 0) + value
+
+    def table(self):
+        """Return the records as a human-readable table.
+
+        Returns:
+            str: One line per phase, with nested phases indented.
+        """
+        lines = ['{0:28} {1:>10} {2:>10} {3:>11}  {4}'.format(
+            'Phase', 'Wall (ms)', 'CPU (ms)', 'Peak (KiB)', 'Counts')]
+
+        for record in self.records:
+            peak = ('{0:,.0f}'.format(record.peak_bytes / 1024.0)
+                    if record.peak_bytes is not None else '-')
+            counts = ', '.join('{0}={1:,}'.format(name, record.counts[name])
+                               for name in sorted(record.counts))
+            lines.append('{0:28} {1:10.1f} {2:10.1f} {3:>11}  {4}'.format(
+                '  ' * record.depth + record.name,
+                record.wall_seconds * 1000, record.cpu_seconds * 1000, peak,
+                counts).rstrip())
+
+        return '\n'.join(lines)
+
+    def json_lines(self):
+        """Return the records as JSON lines, one per phase.
+
+        Every line also identifies the build, so lines from many builds
+        can be appended to one file.
+
+        Returns:
+            str: The JSON lines, each ending with a newline.
+        """
+        import json
+
+        run = {'started_at': self.started_at, 'version': __version__}
+
+        lines = []
+        for record in self.records:
+            data = record.as_dict()
+            data.update(run)
+            lines.append(json.dumps(data, sort_keys=True) + '\n')
+        return ''.join(lines)
+
+
+class TimedWriter(object):
+    """Wraps a writable file object, recording the time spent writing.
+
+    The time is recorded as a phase of the active profiler, nested in the
+    phase which was innermost when the writer was created.
+
+    Constructor Args:
+        fileobj (IO): The file object to wrap.
+        name (str): The name of the phase to record.
+    """
+
+    __slots__ = ['_fileobj', '_record']
+
+    def __init__(self, fileobj, name='write_file'):
+        """Initialize a TimedWriter instance."""
+        self._fileobj = fileobj
+        self._record = None
+
+        if _active_profilers:
+            profiler = _active_profilers[-1]
+            self._record = PhaseRecord(name, len(profiler._open))
+            profiler.records.append(self._record)
+
+    def write(self, data):
+        """Write data to the wrapped file object."""
+        if self._record is None:
+            return self._fileobj.write(data)
+
+        wall_started = _wall_clock()
+        cpu_started = _cpu_clock()
+        result = self._fileobj.write(data)
+        self._record.wall_seconds += _wall_clock() - wall_started
+        self._record.cpu_seconds += _cpu_clock() - cpu_started
+        self._record.counts['writes'] = (
+            self._record.counts.get('writes', 0) + 1)
+        return result
@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+"""
+fresh_tomatillos.readers
+~~~~~~~~~~~~~~~~~~~~~~~~
+
+Implements reading movie data from JSON Lines and CSV files, as an
+alternative to config files.
+
+Records are read one at a time and turned straight into the same movie
+arguments yielded by `movie_args.generate_movie_args()`, so a file is never
+held in memory as a whole.  Every record must have exactly the keys
+`title`, `summary`, `poster` and `youtube` (in any case).  As with the
+sections of a config file, records with missing or extra keys are reported
+together, in one InvalidConfigKeys error raised once the whole file has
+been read.  Unlike config sections, records with the same title are not
+merged: each record is a separate movie.
+
+JSON Lines files hold one JSON object per line (blank lines are ignored):
+
+    {"title": "Frozen", "summary": "...", "poster": "https://...",
+     "youtube": "https://youtu.be/TbQm5doF_Uc"}
+
+CSV files start with a header row naming the columns, in any order:
+
+    title,summary,poster,youtube
+    Frozen,"A queen, shamed for her magic, ...",https://...,TbQm5doF_Uc
+
+The reader for a file is chosen by its extension (see `input_format()`).
+More readers can be added with `register_reader()`.
+"""
+
+from __future__ import unicode_literals
+import codecs
+import csv
+import io
+import json
+import os
+import sys
+
+from fresh_tomatillos import profiling
+from fresh_tomatillos.exceptions import InvalidConfigKeys, InvalidRecord
+from fresh_tomatillos.movie_args import _get_youtube_id
+
+
+# The format of files without a reader: config files, read by get_config()
+CONFIG_FORMAT = 'cfg'
+
+RECORD_KEYS = ('title', 'summary', 'poster', 'youtube')
+VALID_RECORD_KEYS = frozenset(RECORD_KEYS)
+
+# Python 2's csv module only reads bytes
+_CSV_READS_BYTES = sys.version_info[0] == 2
+
+# {<format name>: <reader>} and {<file extension>: <format name>}
+READERS = {}
+EXTENSION_FORMATS = {}
+
+
+def register_reader(format_name, extensions, reader):
+    """Add a reader for another format of movie data file.
+
+    Args:
+        format_name (str): The name of the format, as passed to `--format`.
+        extensions (Iterable[str]): File extensions (such as '.csv') of
+                                    files to read with `reader`.
+        reader (Callable[[BinaryIO, str], Iterator[tuple]]): A function
+            which takes a file opened in binary mode and its path, and
+            yields a `(title, summary, poster_url, youtube_id)` tuple for
+            each movie.  It must close the file when it is finished.
+    """
+    READERS[format_name] = reader
+    for extension in extensions:
+        EXTENSION_FORMATS[extension.lower()] = format_name
+
+
+def input_format(path, format_name=None):
+    """Return the format of a movie data file.
+
+    Args:
+        path (str): The path of the file.
+        format_name (Optional[str]): A format name which overrides the
+                                     file's extension.
+
+    Returns:
+        str: The name of a registered format, or CONFIG_FORMAT.
+
+    Raises:
+        ValueError: Raised if `format_name` is not a known format.
+    """
+    if format_name is None:
+        extension = os.path.splitext(path)[1].lower()
+        return EXTENSION_FORMATS.get(extension, CONFIG_FORMAT)
+
+    if format_name != CONFIG_FORMAT and format_name not in READERS:
+        raise ValueError('Unknown format: {0} (expected one of: {1})'.format(
+            format_name, ', '.join(sorted(list(READERS) + [CONFIG_FORMAT]))))
+
+    return format_name
+
+
+def read_movie_args(path, format_name=None):
+    """Return an iterator of movie arguments read from a movie data file.
+
+    The file is opened immediately, so errors opening it are raised here.
+    Records are read as the iterator is consumed.
+
+    Args:
+        path (str): The path of a file in a registered format.
+        format_name (Optional[str]): The format of the file, if it can't be
+                                     told from the extension.
+
+    Returns:
+        Iterator[tuple[str, str, str, str]]: The arguments for each movie,
+            like those yielded by `generate_movie_args()`.
+
+    Raises:
+        ValueError: Raised if the format has no registered reader.
+        IOError: Raised if the file can't be opened.
+        InvalidRecord: Raised while iterating, if a record can't be parsed.
+        InvalidConfigKeys: Raised after every record has been read, if any
+                           record had missing or extra keys.
+        InvalidVideoID: Raised while iterating, if a record's `youtube`
+                        value is not a valid YouTube video ID or URL.
+    """
+    reader = READERS.get(input_format(path, format_name))
+    if reader is None:
+        raise ValueError('No reader is registered for: ' + path)
+
+    records_file = io.open(path, 'rb')
+    profiling.count('bytes_read', os.fstat(records_file.fileno()).st_size)
+    return reader(records_file, path)
+
+
+class _RecordValidator(object):
+    """Converts records to movie arguments, collecting key errors.
+
+    Instance Attributes:
+        errors (list[tuple]): (<title>, <missing_keys>, <extra_keys>) for
+                              each record with invalid keys, as expected by
+                              InvalidConfigKeys.
+        line_numbers (dict[str, list[int]]): The line numbers of the
+                                             records with invalid keys.
+    """
+
+    __slots__ = ['errors', 'line_numbers']
+
+    def __init__(self):
+        """Initialize a _RecordValidator instance."""
+        self.errors = []
+        self.line_numbers = {}
+
+    def movie_args(self, record, line_number):
+        """Return the movie arguments for a record, if its keys are valid.
+
+        Args:
+            record (dict[str, str]): The record, with lowercase keys.
+            line_number (int): The line of the file on which the record is.
+
+        Returns:
+            Optional[tuple[str, str, str, str]]: The movie arguments, or None
+                                                 if the record's keys are
+                                                 invalid.
+
+        Raises:
+            InvalidVideoID: Raised if the record's `youtube` value is not a
+                            valid YouTube video ID or URL.
+        """
+        if len(record) != len(VALID_RECORD_KEYS) or not all(
+                key in record for key in RECORD_KEYS):
+            keys = frozenset(record)
+            title = record.get('title')
+            if title:
+                self.line_numbers.setdefault(title, []).append(line_number)
+            else:
+                title = '(untitled, line {0})'.format(line_number)
+
+            self.errors.append((title, VALID_RECORD_KEYS - keys,
+                                keys - VALID_RECORD_KEYS))
+            return None
+
+        title = record['title']
+        return (title, record['summary'], record['poster'],
+                _get_youtube_id(record['youtube'], title))
+
+    def finish(self):
+        """Raise an error for every record with invalid keys, if any.
+
+        Raises:
+            InvalidConfigKeys: Raised if any record had invalid keys.
+        """
+        if self.errors:
+            raise InvalidConfigKeys(self.errors, self.line_numbers)
+
+
+def read_jsonl(records_file, path):
+    """Yield movie arguments from a JSON Lines file.
+
+    Args:
+        records_file (BinaryIO): The file, opened in binary mode.  It is
+                                 closed once every record has been read.
+        path (str): The path of the file, used in error messages.
+
+    Yields:
+        tuple[str, str, str, str]: The arguments for each movie.
+    """
+    validator = _RecordValidator()
+
+    with records_file:
+        for line_number, line in enumerate(records_file, 1):
+            if not line.strip():
+                continue
+
+            try:
+                record = json.loads(line.decode('utf-8-sig'))
+            except ValueError as e:
+                raise InvalidRecord(path, line_number,
+                                    'Invalid JSON: {0}'.format(e))
+
+            if not isinstance(record, dict):
+                raise InvalidRecord(path, line_number,
+                                    'Expected a JSON object.')
+
+            lowercase_record = {}
+            for key, value in record.items():
+                if not isinstance(value, type('')):
+                    raise InvalidRecord(
+                        path, line_number,
+                        'Expected a string for "{0}".'.format(key))
+                lowercase_record[key.lower()] = value
+
+            movie_args = validator.movie_args(lowercase_record, line_number)
+            if movie_args is not None:
+                yield movie_args
+
+    validator.finish()
+
+
+def _decode(data, path, line_number):
+    """Decode UTF-8 data read from a file.
+
+    Raises:
+        InvalidRecord: Raised if the data isn't valid UTF-8.
+    """
+    try:
+        return data.decode('utf-8')
+    except UnicodeDecodeError as e:
+        raise InvalidRecord(path, line_number,
+                            'The file is not valid UTF-8: {0}'.format(e))
+
+
+def _csv_rows(records_file, path):
+    """Return a CSV reader of Unicode rows, for a file opened as binary.
+
+    Each line is decoded separately, so a line which isn't valid UTF-8 is
+    reported as an `InvalidRecord` on that line.
+    """
+    if _CSV_READS_BYTES:
+        # Python 2: decode each value after parsing
+        reader = csv.reader(records_file)
+        return reader, ([_decode(value, path, reader.line_num)
+                         for value in row] for row in reader)
+
+    # Any byte order mark is removed from the header row by read_csv()
+    reader = csv.reader(_decode(line, path, line_number)
+                        for line_number, line in enumerate(records_file, 1))
+    return reader, reader
+
+
+def read_csv(records_file, path):
+    """Yield movie arguments from a CSV file with a header row.
+
+    Args:
+        records_file (BinaryIO): The file, opened in binary mode.  It is
+                                 closed once every record has been read.
+        path (str): The path of the file, used in error messages.
+
+    Yields:
+        tuple[str, str, str, str]: The arguments for each movie.
+    """
+    validator = _RecordValidator()
+
+    with records_file:
+        reader, rows = _csv_rows(records_file, path)
+
+        try:
+            header = next(rows, None)
+            if header is None:
+                return  # An empty file has no movies
+
+            if header and header[0].startswith(codecs.BOM_UTF8.decode(
+                    'utf-8')):
+                header[0] = header[0][1:]
+            keys = [name.strip().lower() for name in header]
+            if len(keys) != len(RECORD_KEYS) or set(keys) != set(RECORD_KEYS):
+                raise InvalidRecord(
+                    path, reader.line_num,
+                    'The header row must name exactly these columns: {0}'
+                    ' (found: {1})'.format(', '.join(RECORD_KEYS),
+                                           ', '.join(header)))
+
+            for row in rows:
+                if not row:
+                    continue  # Skip blank lines
+                if len(row) != len(keys):
+                    raise InvalidRecord(
+                        path, reader.line_num,
+                        'Expected {0} values, but found {1}.'.format(
+                            len(keys), len(row)))
+
+                movie_args = validator.movie_args(dict(zip(keys, row)),
+                                                  reader.line_num)
+                if movie_args is not None:
+                    yield movie_args
+        except csv.Error as e:
+            raise InvalidRecord(path, reader.line_num, '{0}'.format(e))
+
+    validator.finish()
+
+
+register_reader('jsonl', ('.jsonl', '.ndjson'), read_jsonl)
+register_reader('csv', ('.csv',), read_csv)
@@ -3,16 +3,140 @@
 fresh_tomatillos.render
 ~~~~~~~~~~~~~~~~~~~~~~~
 
-Provides `compile_movies_page()` to render a movie trailer webpage.
+Provides `compile_movies_page()` to render a movie trailer webpage,
+`stream_movies_page()` to write one to a file object incrementally,
+`stream_virtual_page()` to write a page whose tiles are rendered by the
+browser from embedded JSON data, and `write_paged_site()` to split the
+movies across several pages.
+
+Templates are compiled once per process by `get_templates()` and only
+reloaded when a template or static file changes on disk.  Pages can be
+minified, and can reference their CSS and JavaScript as external files
+instead of including them inline (see `fresh_tomatillos.assets`).
 """
 
 from __future__ import unicode_literals
 import io
+import json
 import os
+from operator import attrgetter
+from string import Formatter
+
+from fresh_tomatillos.output import output_file
 
 
 MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
 
+MAIN_PAGE_PATH = 'templates/main_page.html'
+MOVIE_TILE_PATH = 'templates/movie_tile.html'
+SCRIPTS_PATH = 'static/scripts.js'
+TRAILER_SCRIPT_PATH = 'static/trailer.js'
+TRAILER_FACADE_SCRIPT_PATH = 'static/trailer_facade.js'
+TRAILER_FACADE_STYLES_PATH = 'static/trailer_facade.css'
+STYLES_PATH = 'static/styles.css'
+VIRTUAL_GRID_PATH = 'static/virtual_grid.js'
+VIRTUAL_GRID_STYLES_PATH = 'static/virtual_grid.css'
+SEARCH_SCRIPT_PATH = 'static/search.js'
+SEARCH_STYLES_PATH = 'static/search.css'
+SHELL_STYLES_PATH = 'static/shell.css'
+SHELL_SCRIPT_PATH = 'static/shell.js'
+MODAL_SCRIPT_PATH = 'static/modal.js'
+MODAL_STYLES_PATH = 'static/modal.css'
+INDEX_PAGE_PATH = 'templates/index_page.html'
+
+TEMPLATE_PATHS = (MAIN_PAGE_PATH, MOVIE_TILE_PATH, SCRIPTS_PATH,
+                  TRAILER_SCRIPT_PATH, TRAILER_FACADE_SCRIPT_PATH,
+                  TRAILER_FACADE_STYLES_PATH, STYLES_PATH, VIRTUAL_GRID_PATH,
+                  VIRTUAL_GRID_STYLES_PATH, SEARCH_SCRIPT_PATH,
+                  SEARCH_STYLES_PATH, SHELL_STYLES_PATH, SHELL_SCRIPT_PATH,
+                  MODAL_SCRIPT_PATH, MODAL_STYLES_PATH)
+
+# How static content is included in a page: either inline or as a URL
+INLINE_STYLES = '<style>\n{0}\n    </style>'
+INLINE_SCRIPTS = '<script>\n{0}\n    </script>'
+EXTERNAL_STYLES = '<link rel="stylesheet" href="{0}">'
+EXTERNAL_SCRIPTS = '<script src="{0}"></script>'
+DEFERRED_STYLES = (
+    '<link rel="stylesheet" href="{0}" media="print"'
+    ' onload="this.media=\'all\'">'
+    '\n    <noscript><link rel="stylesheet" href="{0}"></noscript>')
+DEFERRED_SCRIPTS = '<script src="{0}" defer></script>'
+# Registered once the page has loaded, so precaching doesn't slow it down
+REGISTER_SERVICE_WORKER = (
+    '<script>if (\'serviceWorker\' in navigator &&'
+    ' location.protocol !== \'file:\') {{'
+    ' addEventListener(\'load\', function () {{'
+    ' navigator.serviceWorker.register({0}); }}); }}</script>')
+
+# The page's dependencies, loaded from CDNs unless the page is standalone
+CDN_STYLES = (
+    '\n    <!-- Bootstrap 3 -->'
+    '\n    <link rel="stylesheet" href="https://netdna.bootstrapcdn.com'
+    '/bootstrap/3.1.0/css/bootstrap.min.css">'
+    '\n    <link rel="stylesheet" href="https://netdna.bootstrapcdn.com'
+    '/bootstrap/3.1.0/css/bootstrap-theme.min.css">')
+CDN_SCRIPTS = (
+    '\n    <script src="https://code.jquery.com/jquery-1.10.1.min.js">'
+    '</script>'
+    '\n    <script src="https://netdna.bootstrapcdn.com/bootstrap/3.1.0'
+    '/js/bootstrap.min.js"></script>')
+CDN_CLOSE_ICON = (
+    '<img alt="Close video" src="https://lh5.ggpht.com/v4-628SilF0HtHuHdu5'
+    'EzxD7WRqOrrTIDi_MhEG6_qkNtUK5Wg7KPkofp_VJoF7RS2LhxwEFCO1ICHZlc-o_=s0'
+    '#w=24&h=24"/>')
+STANDALONE_CLOSE_ICON = '&times;'
+
+# File names used by write_paged_site()
+INDEX_FILENAME = 'index.html'
+PAGE_FILENAME = 'page-{0:04d}.html'
+SITE_ASSET_URLS = {'styles': 'styles.css', 'scripts': 'scripts.js',
+                   'deferred_styles': 'deferred_styles.css'}
+
+# The search box added to the navigation bar of searchable pages
+SEARCH_BOX = (
+    '\n          <form class="navbar-form navbar-right" role="search"'
+    ' id="movie-search">'
+    '\n            <input type="search" class="form-control"'
+    ' id="movie-search-input" placeholder="Search movies"'
+    ' aria-label="Search movies" autocomplete="off">'
+    '\n            <span id="movie-search-status" aria-live="polite"></span>'
+    '\n          </form>')
+
+# Markup written in place of the movie tiles by stream_virtual_page()
+VIRTUAL_GRID_OPEN = (
+    '<div id="movie-grid" class="virtual-grid"></div>\n'
+    '<script type="application/json" id="movie-data">')
+VIRTUAL_GRID_CLOSE = '</script>'
+
+PAGE_NAV_TEMPLATE = """
+    <nav class="container">
+      <ul class="pager">
+{links}
+      </ul>
+    </nav>"""
+PAGE_NAV_LINK_TEMPLATE = (
+    '        <li class="{css_class}"><a href="{url}">{text}</a></li>')
+PAGE_INDEX_LINK_TEMPLATE = (
+    '        <li><a href="{url}">Page {number}</a>:'
+    ' {first_title} &ndash; {last_title} ({count} movies)</li>')
+
+# Process-wide caches, each validated against the mtime and size of files
+_file_cache = {}  # {<relative_path>: (<signature>, <contents>)}
+# {(<minify>, <standalone>, <trailer_facade>): (<contents>, <PageTemplates>)}
+_templates_cache = {}
+
+
+def _module_path(relative_path):
+    """Return the full path for a path specified relative to this module.
+
+    Args:
+        relative_path (str): The path to the file, relative to this module.
+
+    Returns:
+        str: The absolute, normalized equivalent of `relative_path`.
+    """
+    return os.path.normpath(os.path.join(MODULE_DIR, relative_path))
+
 
 def _read_file(relative_path):
     """Return the contents of a file as a Unicode string.
@@ -23,26 +147,559 @@ def _read_file(relative_path):
     Returns:
         str: The contents of the file.
     """
-    path = os.path.normpath(os.path.join(MODULE_DIR, relative_path))
+    path = _module_path(relative_path)
 
     with io.open(path, 'r', encoding='utf-8') as input_file:
         return input_file.read()
 
 
-def _create_movie_tiles(movies, tile_template):
-    """Return a string containing unique HTML for each movie.
+def _file_signature(relative_path):
+    """Return a value which changes whenever a file is modified.
 
     Args:
-        movies (list[Movie]): The movies for which to render content.
-        tile_template (str): The template string to be used with
-                             `str.format()`.  It should include references
-                             in curly braces to movie attributes, such as
-                             "{movie.title}".
+        relative_path (str): The path to the file, relative to this module.
 
     Returns:
-        str: The concatenation of all rendered movie tiles.
+        tuple[float, int]: The modification time and size of the file.
     """
-    return '\n'.join(tile_template.format(movie=movie) for movie in movies)
+    stat = os.stat(_module_path(relative_path))
+    return stat.st_mtime, stat.st_size
+
+
+def _read_cached_file(relative_path):
+    """Return the contents of a file, reading it only if it has changed.
+
+    Args:
+        relative_path (str): The path to the file, relative to this module.
+
+    Returns:
+        str: The contents of the file.
+    """
+    signature = _file_signature(relative_path)
+    cached = _file_cache.get(relative_path)
+
+    if cached is None or cached[0] != signature:
+        cached = (signature, _read_file(relative_path))
+        _file_cache[relative_path] = cached
+
+    return cached[1]
+
+
+def _split_main_page(main_page, values):
+    """Split the main page template into the HTML before and after the tiles.
+
+    Args:
+        main_page (str): The main page template, containing `{movie_tiles}`
+                         plus the other `str.format()` references.
+        values (dict[str, str]): The HTML for each other reference:
+            'scripts' and 'styles' (which include the page's JavaScript and
+            CSS), 'vendor_scripts' and 'vendor_styles' (which include its
+            dependencies), 'close_icon' (for the trailer modal), 'page_nav'
+            (for navigating between pages, if any) and 'search_box' (if the
+            page has one).
+
+    Returns:
+        tuple[str, str]: The rendered HTML preceding and following the
+                         movie tiles.
+    """
+    head, tail = main_page.split('{movie_tiles}', 1)
+    return head.format(**values), tail.format(**values)
+
+
+class TileTemplate(object):
+    """A movie tile template, compiled once for fast repeated rendering.
+
+    The template is split into its literal text and the movie attributes it
+    references, so rendering a tile is a single `str.join()` with no format
+    string parsing.  Templates using anything other than plain
+    `{movie.<attribute>}` references (such as format specs or conversions)
+    fall back to `str.format()`.
+
+    Constructor Args:
+        source (str): The template string, suitable for `str.format()` with a
+                      `movie` keyword argument, such as "{movie.title}".
+
+    Instance Attributes:
+        source (str): The template string the instance was compiled from.
+    """
+
+    __slots__ = ['source', '_segments', '_get_values']
+
+    def __init__(self, source):
+        """Initialize a TileTemplate instance."""
+        self.source = source
+        literals = []
+        attributes = []
+        compilable = True
+
+        for literal, field, format_spec, conversion in Formatter().parse(
+                source):
+            literals.append(literal)
+
+            if field is None:
+                continue
+
+            root, dot, attribute = field.partition('.')
+
+            if root != 'movie' or not dot or format_spec or conversion:
+                compilable = False
+
+            attributes.append(attribute)
+
+        # Literals belong at even indexes and attribute values at odd ones
+        if len(literals) == len(attributes):
+            literals.append('')
+
+        self._segments = [None] * (len(literals) + len(attributes))
+        self._segments[::2] = literals
+
+        if not compilable:
+            self._get_values = None
+        elif len(attributes) > 1:
+            # attrgetter() returns a tuple when given more than one name
+            self._get_values = attrgetter(*attributes)
+        elif attributes:
+            get_value = attrgetter(attributes[0])
+            self._get_values = lambda movie: (get_value(movie),)
+        else:
+            self._get_values = lambda movie: ()
+
+    def render(self, movie):
+        """Return the HTML for a single movie tile.
+
+        Args:
+            movie (Movie): The movie to render.  Referenced attributes are
+                           expected to be strings.
+
+        Returns:
+            str: The rendered tile.
+        """
+        if self._get_values is None:
+            return self.source.format(movie=movie)
+
+        segments = self._segments[:]
+        segments[1::2] = self._get_values(movie)
+        return ''.join(segments)
+
+
+class PageTemplates(object):
+    """The compiled templates and static content for a movies page.
+
+    Constructor Args:
+        main_page (str): The main page template.
+        movie_tile (str): The movie tile template.
+        scripts (str): JavaScript content to include in the page.
+        trailer_script (str): JavaScript content which plays trailers in
+                              the page's modal.
+        trailer_facade_script (str): JavaScript content which plays
+            trailers in the page's modal, behind a thumbnail facade.
+        trailer_facade_styles (str): CSS content for that facade.
+        styles (str): CSS content to include in the page.
+        virtual_grid (str): JavaScript content which renders movie tiles
+                            from a JSON data island.
+        virtual_grid_styles (str): CSS content for those tiles.
+        search_script (str): JavaScript content which filters the movie
+                             tiles using a search index.
+        search_styles (str): CSS content for the search box.
+        shell_styles (str): CSS content replacing the parts of Bootstrap
+                            used by standalone pages.
+        shell_script (str): JavaScript content replacing `scripts`, without
+                            jQuery, for standalone pages.
+        modal_script (str): JavaScript content replacing Bootstrap's modal
+                            for standalone pages.
+        modal_styles (str): CSS content for that modal.
+        standalone (bool): Whether pages include replacements for jQuery
+            and Bootstrap, instead of loading them from CDNs.  Standalone
+            pages don't need network access, and inline their critical
+            CSS while deferring the rest.
+        trailer_facade (bool): Whether the trailer modal shows a thumbnail
+            and a play button, and only loads YouTube's player when it is
+            pressed, instead of embedding the player right away.
+
+    Instance Attributes:
+        main_page (str): The main page template.
+        scripts (str): JavaScript content to include in the page.
+        trailer_script (str): JavaScript content which plays trailers in
+                              the page's modal.
+        trailer_facade_script (str): JavaScript content which plays
+            trailers in the page's modal, behind a thumbnail facade.
+        trailer_facade_styles (str): CSS content for that facade.
+        styles (str): CSS content to include in the page.
+        virtual_grid (str): JavaScript content which renders movie tiles
+                            from a JSON data island.
+        virtual_grid_styles (str): CSS content for those tiles.
+        search_script (str): JavaScript content which filters the movie
+                             tiles using a search index.
+        search_styles (str): CSS content for the search box.
+        shell_styles (str): CSS content replacing the parts of Bootstrap
+                            used by standalone pages.
+        shell_script (str): JavaScript content replacing `scripts`, without
+                            jQuery, for standalone pages.
+        modal_script (str): JavaScript content replacing Bootstrap's modal
+                            for standalone pages.
+        modal_styles (str): CSS content for that modal.
+        standalone (bool): Whether pages are standalone.
+        trailer_facade (bool): Whether trailers are shown behind a facade.
+        head (str): Rendered HTML preceding the movie tiles, with scripts
+                    and styles inline.
+        tail (str): Rendered HTML following the movie tiles, with scripts
+                    and styles inline.
+        tile (TileTemplate): The compiled movie tile template.
+    """
+
+    __slots__ = ['main_page', 'scripts', 'trailer_script',
+                 'trailer_facade_script', 'trailer_facade_styles', 'styles',
+                 'virtual_grid', 'virtual_grid_styles', 'search_script',
+                 'search_styles', 'shell_styles', 'shell_script',
+                 'modal_script', 'modal_styles', 'standalone',
+                 'trailer_facade', 'head', 'tail', 'tile']
+
+    def __init__(self, main_page, movie_tile, scripts, trailer_script,
+                 trailer_facade_script, trailer_facade_styles, styles,
+                 virtual_grid, virtual_grid_styles, search_script,
+                 search_styles, shell_styles, shell_script, modal_script,
+                 modal_styles, standalone=False, trailer_facade=False):
+        """Initialize a PageTemplates instance."""
+        self.main_page = main_page
+        self.scripts = scripts
+        self.trailer_script = trailer_script
+        self.trailer_facade_script = trailer_facade_script
+        self.trailer_facade_styles = trailer_facade_styles
+        self.styles = styles
+        self.virtual_grid = virtual_grid
+        self.virtual_grid_styles = virtual_grid_styles
+        self.search_script = search_script
+        self.search_styles = search_styles
+        self.shell_styles = shell_styles
+        self.shell_script = shell_script
+        self.modal_script = modal_script
+        self.modal_styles = modal_styles
+        self.standalone = standalone
+        self.trailer_facade = trailer_facade
+        self.head, self.tail = self.page_parts()
+        self.tile = TileTemplate(movie_tile)
+
+    def page_styles(self, virtual=False, search=False):
+        """Return the CSS content for a page, besides its dependencies'.
+
+        Args:
+            virtual (bool): Whether to include the styles for tiles rendered
+                            from a JSON data island.
+            search (bool): Whether to include the search box's styles.
+
+        Returns:
+            str: The CSS content.
+        """
+        styles = self.styles
+        if self.trailer_facade:
+            styles += self.trailer_facade_styles
+        if virtual:
+            styles += self.virtual_grid_styles
+        if search:
+            styles += self.search_styles
+        return styles
+
+    def page_assets(self, virtual=False, search=False):
+        """Return the JavaScript and CSS content for a page.
+
+        Args:
+            virtual (bool): Whether to include the script (and styles)
+                            which render tiles from a JSON data island.
+            search (bool): Whether to include the search box's script and
+                           styles.
+
+        Returns:
+            dict[str, str]: The 'scripts' and 'styles' content.  Standalone
+                            pages inline their styles in `<head>` instead,
+                            so for them, 'styles' is replaced by
+                            'deferred_styles', which aren't needed for the
+                            first paint.
+        """
+        # Standalone pages can't use jQuery
+        scripts = self.shell_script if self.standalone else self.scripts
+        scripts += '\n' + (self.trailer_facade_script if self.trailer_facade
+                           else self.trailer_script)
+        if virtual:
+            scripts += '\n' + self.virtual_grid
+        if search:
+            scripts += '\n' + self.search_script
+        if not self.standalone:
+            return {'scripts': scripts,
+                    'styles': self.page_styles(virtual, search)}
+
+        return {'scripts': self.modal_script + '\n' + scripts,
+                'deferred_styles': self.modal_styles}
+
+    def vendor_parts(self):
+        """Return the HTML which includes the page's dependencies.
+
+        Returns:
+            dict[str, str]: The 'vendor_styles', 'vendor_scripts' and
+                            'close_icon' values for the page templates.
+        """
+        if not self.standalone:
+            return {'vendor_styles': CDN_STYLES,
+                    'vendor_scripts': CDN_SCRIPTS,
+                    'close_icon': CDN_CLOSE_ICON}
+
+        # The critical CSS is always inline
+        return {'vendor_styles': '    ' + INLINE_STYLES.format(
+                    self.shell_styles),
+                'vendor_scripts': '',
+                'close_icon': STANDALONE_CLOSE_ICON}
+
+    def page_parts(self, asset_urls=None, page_nav='', virtual=False,
+                   search_url=None, service_worker_url=None):
+        """Return the HTML before and after the movie tiles for a page.
+
+        Args:
+            asset_urls (Optional[dict[str, str]]): The URLs of external
+                files to reference from the page, for each of the assets
+                returned by `page_assets()` for the same `virtual` and
+                `search_url`.  If omitted, the assets are included inline.
+            page_nav (str): HTML for navigating between pages, if any.
+            virtual (bool): Whether to include the script which renders
+                            tiles from a JSON data island.
+            search_url (Optional[str]): The URL of the page's search index
+                (see `search.write_search_index()`), to add a search box
+                to the page.
+            service_worker_url (Optional[str]): The URL of the page's
+                service worker (see `offline.write_service_worker()`), to
+                register it from the page.
+
+        Returns:
+            tuple[str, str]: The rendered HTML preceding and following the
+                             movie tiles.
+        """
+        values = self.vendor_parts()
+        values['page_nav'] = page_nav
+        values['search_box'] = ''
+
+        # Standalone pages inline all of the CSS needed for the first paint
+        if asset_urls is None or self.standalone:
+            styles = INLINE_STYLES.format(
+                self.page_styles(virtual, search_url is not None))
+        else:
+            styles = EXTERNAL_STYLES.format(asset_urls['styles'])
+
+        # Inline scripts can't be deferred, so neither can the search index
+        # when they depend on it
+        if asset_urls is None:
+            assets = self.page_assets(virtual, search_url is not None)
+            script_template = EXTERNAL_SCRIPTS
+            scripts = INLINE_SCRIPTS.format(assets['scripts'])
+            if self.standalone:
+                deferred_styles = INLINE_STYLES.format(
+                    assets['deferred_styles'])
+        else:
+            script_template = (DEFERRED_SCRIPTS if self.standalone
+                               else EXTERNAL_SCRIPTS)
+            scripts = script_template.format(asset_urls['scripts'])
+            if self.standalone:
+                deferred_styles = DEFERRED_STYLES.format(
+                    asset_urls['deferred_styles'])
+
+        if search_url is not None:
+            scripts = '{0}\n    {1}'.format(
+                script_template.format(search_url), scripts)
+            values['search_box'] = SEARCH_BOX
+
+        # Styles at the end of the page don't delay its first paint
+        if self.standalone:
+            scripts = '{0}\n    {1}'.format(deferred_styles, scripts)
+
+        if service_worker_url is not None:
+            scripts = '{0}\n    {1}'.format(
+                scripts, _register_service_worker(service_worker_url))
+
+        values['scripts'] = scripts
+        values['styles'] = styles
+        return _split_main_page(self.main_page, values)
+
+
+def _register_service_worker(service_worker_url):
+    """Return a script registering a page's service worker, if supported.
+
+    Args:
+        service_worker_url (str): The URL of the service worker.
+
+    Returns:
+        str: The HTML of the script.
+    """
+    return REGISTER_SERVICE_WORKER.format(
+        json.dumps(service_worker_url).replace('<', '\\u003c'))
+
+
+def _read_template(relative_path, minify=False):
+    """Return the contents of a template or static file, using the cache.
+
+    Args:
+        relative_path (str): The path to the file, relative to this module.
+        minify (bool): Whether to minify the contents.
+
+    Returns:
+        str: The contents of the file.
+    """
+    contents = _read_cached_file(relative_path)
+    if not minify:
+        return contents
+
+    # The minifiers are only needed here
+    from fresh_tomatillos.assets import minify_source
+    return minify_source(contents, os.path.splitext(relative_path)[1])
+
+
+def get_templates(minify=False, standalone=False, trailer_facade=False):
+    """Return the compiled page templates, reusing them when possible.
+
+    Compiled templates are cached for the life of the process.  Each call
+    checks the modification time and size of every template and static
+    file, rereading and recompiling only when one of them has changed.
+
+    Args:
+        minify (bool): Whether to minify the templates and static content.
+        standalone (bool): Whether pages should include replacements for
+                           their dependencies, instead of loading them from
+                           CDNs (see `PageTemplates`).
+        trailer_facade (bool): Whether pages show trailers behind a
+                               thumbnail facade (see `PageTemplates`).
+
+    Returns:
+        PageTemplates: The current compiled templates.
+    """
+    contents = tuple(_read_template(path, minify) for path in TEMPLATE_PATHS)
+    key = (minify, standalone, trailer_facade)
+    cached = _templates_cache.get(key)
+
+    if cached is None or cached[0] != contents:
+        cached = (contents, PageTemplates(*contents, standalone=standalone,
+                                          trailer_facade=trailer_facade))
+        _templates_cache[key] = cached
+
+    return cached[1]
+
+
+def write_movies_page(tiles, fileobj, templates, search_url=None,
+                      asset_urls=None, service_worker_url=None):
+    """Write a movies page made of already rendered tiles to a file object.
+
+    Args:
+        tiles (Iterable[str]): The rendered HTML for each movie tile.
+        fileobj (TextIO): A writable text file object.
+        templates (PageTemplates): The templates to render with.
+        search_url (Optional[str]): The URL of the page's search index, if
+                                    the page has a search box.
+        asset_urls (Optional[dict[str, str]]): The URLs of the page's
+            external scripts and styles, if they aren't inline.
+        service_worker_url (Optional[str]): The URL of the page's service
+                                            worker, if it has one.
+    """
+    if (search_url is None and asset_urls is None and
+            service_worker_url is None):
+        head, tail = templates.head, templates.tail
+    else:
+        head, tail = templates.page_parts(
+            asset_urls, search_url=search_url,
+            service_worker_url=service_worker_url)
+    write = fileobj.write
+
+    write(head)
+    for index, tile in enumerate(tiles):
+        if index:
+            write('\n')
+        write(tile)
+    write(tail)
+
+
+def stream_movies_page(movies, fileobj, templates=None, search_url=None,
+                       asset_urls=None, service_worker_url=None):
+    """Write generated HTML for movies page to a file object, tile by tile.
+
+    Only one rendered movie tile is held in memory at a time, so memory use
+    does not grow with the number of movies.
+
+    Args:
+        movies (Iterable[Movie]): The movies to include in the webpage.
+        fileobj (TextIO): A writable text file object.
+        templates (Optional[PageTemplates]): The templates to render with.
+            If omitted, they are loaded with `get_templates()` before
+            anything is written to `fileobj`.
+        search_url (Optional[str]): The URL of the page's search index, if
+                                    the page has a search box.
+        asset_urls (Optional[dict[str, str]]): The URLs of the page's
+            external scripts and styles, if they aren't inline.
+        service_worker_url (Optional[str]): The URL of the page's service
+                                            worker, if it has one.
+    """
+    if templates is None:
+        templates = get_templates()
+
+    render_tile = templates.tile.render
+    write_movies_page((render_tile(movie) for movie in movies),
+                      fileobj, templates, search_url, asset_urls,
+                      service_worker_url)
+
+
+def _movie_json(movie):
+    """Return a compact JSON array describing a movie, safe to embed in HTML.
+
+    Args:
+        movie (Movie): The movie to describe.
+
+    Returns:
+        str: JSON of the form [<title>, <summary>, <poster_url>, <video_id>],
+             followed by <poster_srcset> and <poster_webp_srcset> if the
+             movie has thumbnails, with every "<" escaped so it can't close
+             the enclosing script.
+    """
+    values = [movie.title, movie.summary, movie.poster_url, movie.youtube_id]
+    if movie.thumbnails:
+        values.extend((movie.poster_srcset, movie.poster_webp_srcset))
+
+    return json.dumps(values, ensure_ascii=False,
+                      separators=(',', ':')).replace('<', '\\u003c')
+
+
+def stream_virtual_page(movies, fileobj, templates=None, search_url=None,
+                        asset_urls=None, service_worker_url=None):
+    """Write a movies page which renders only the tiles near the viewport.
+
+    Instead of HTML for every movie tile, the page embeds the movie data as
+    a compact JSON array, from which `static/virtual_grid.js` creates tiles
+    as they scroll into view.  This keeps the page size and the number of
+    DOM nodes small, no matter how many movies there are.
+
+    Args:
+        movies (Iterable[Movie]): The movies to include in the webpage.
+        fileobj (TextIO): A writable text file object.
+        templates (Optional[PageTemplates]): The templates to render with.
+            If omitted, they are loaded with `get_templates()` before
+            anything is written to `fileobj`.
+        search_url (Optional[str]): The URL of the page's search index, if
+                                    the page has a search box.
+        asset_urls (Optional[dict[str, str]]): The URLs of the page's
+            external scripts and styles, if they aren't inline.
+        service_worker_url (Optional[str]): The URL of the page's service
+                                            worker, if it has one.
+    """
+    if templates is None:
+        templates = get_templates()
+
+    head, tail = templates.page_parts(
+        asset_urls, virtual=True, search_url=search_url,
+        service_worker_url=service_worker_url)
+    write = fileobj.write
+
+    write(head)
+    write(VIRTUAL_GRID_OPEN)
+    write('[')
+    for index, movie in enumerate(movies):
+        if index:
+            write(',')
+        write(_movie_json(movie))
+    write(']')
+    write(VIRTUAL_GRID_CLOSE)
+    write(tail)
 
 
 def compile_movies_page(movies):
@@ -54,17 +711,214 @@ def compile_movies_page(movies):
     Returns:
         str: Rendered HTML for a movie trailer page.
     """
-    # Get template and static content.  Each template has `{variable}`
-    # sections meant to be used with `str.format()`.
-    main_page = _read_file('templates/main_page.html')
-    movie_tile = _read_file('templates/movie_tile.html')
-    scripts = _read_file('static/scripts.js')
-    styles = _read_file('static/styles.css')
+    page = io.StringIO()
+    stream_movies_page(movies, page)
+    return page.getvalue()
+
+
+def _page_nav(page_number, page_count):
+    """Return HTML linking a page to its neighbors and to the index page.
+
+    Args:
+        page_number (int): The number of the current page, starting at 1.
+        page_count (int): The total number of pages.
+
+    Returns:
+        str: The rendered navigation HTML.
+    """
+    links = []
+
+    if page_number > 1:
+        links.append(PAGE_NAV_LINK_TEMPLATE.format(
+            css_class='previous', text='&larr; Previous',
+            url=PAGE_FILENAME.format(page_number - 1)))
+
+    links.append(PAGE_NAV_LINK_TEMPLATE.format(
+        css_class='index', text='All pages', url=INDEX_FILENAME))
+
+    if page_number < page_count:
+        links.append(PAGE_NAV_LINK_TEMPLATE.format(
+            css_class='next', text='Next &rarr;',
+            url=PAGE_FILENAME.format(page_number + 1)))
+
+    return PAGE_NAV_TEMPLATE.format(links='\n'.join(links))
+
+
+def _write_page(job):
+    """Render and write a single page of a paged site.
+
+    This is a module-level function so that it can run in a worker process.
+
+    Args:
+        job (tuple): The output directory, the page number, the page count,
+                     the page's movies, their pre-rendered tiles (or None to
+                     render them here), the URLs of the page's assets and
+                     service worker (if any), the `minify`, `standalone`
+                     and `trailer_facade` settings for `get_templates()`,
+                     and whether to write compressed copies of the page.
+
+    Returns:
+        list[str]: The paths of the files which were written: the page and
+                   its compressed copies, unless they were unchanged.
+    """
+    (output_dir, page_number, page_count, movies, tiles, asset_urls,
+     service_worker_url, settings, compress) = job
+    templates = get_templates(*settings)
+    head, tail = templates.page_parts(
+        asset_urls, _page_nav(page_number, page_count),
+        service_worker_url=service_worker_url)
+
+    if tiles is None:
+        tiles = (templates.tile.render(movie) for movie in movies)
+
+    path = os.path.join(output_dir, PAGE_FILENAME.format(page_number))
+    with output_file(path, compress) as page_file:
+        page_file.write(head)
+        page_file.write('\n'.join(tiles))
+        page_file.write(tail)
+
+    return page_file.written_paths
+
+
+def _write_text(path, text, compress=False):
+    """Write a Unicode string to a file as UTF-8, unless it's unchanged.
+
+    Returns:
+        list[str]: The paths of the files which were written (see
+                   `OutputWriter.written_paths`).
+    """
+    with output_file(path, compress) as text_file:
+        text_file.write(text)
+    return text_file.written_paths
+
+
+def write_paged_site(movies, output_dir, page_size, tiles=None,
+                     max_workers=None, minify=False, hashed_assets=False,
+                     standalone=False, service_worker=False, compress=False,
+                     trailer_facade=False):
+    """Write movies across numbered pages, plus an index page and assets.
+
+    Each page holds at most `page_size` movies and links to its neighbors.
+    The CSS and JavaScript are written once, as external files shared by
+    every page.  Pages are rendered in parallel worker processes when
+    possible.
+
+    Args:
+        movies (Sequence[Movie]): The movies to include in the site.
+        output_dir (str): The directory in which to write the site.  It is
+                          created if it doesn't exist.
+        page_size (int): The maximum number of movies on each page.
+        tiles (Optional[Sequence[str]]): Pre-rendered tiles for `movies`,
+                                         such as from an incremental build.
+        max_workers (Optional[int]): The maximum number of processes to use
+                                     for rendering pages.  1 renders every
+                                     page in the current process.
+        minify (bool): Whether to minify the pages and static content.
+            Pre-rendered `tiles` should have been rendered with the same
+            setting.
+        hashed_assets (bool): Whether to write the static content under
+            content-hashed names (see `assets.write_hashed_assets()`), so
+            browsers can cache it forever.
+        standalone (bool): Whether to include replacements for the pages'
+                           dependencies, instead of loading them from CDNs.
+        service_worker (bool): Whether to write a service worker caching
+            every page, asset and poster of the site, registered by every
+            page (see `offline.write_service_worker()`).
+        compress (bool): Whether to write compressed copies of the pages
+                         and the (unhashed) static content, next to them.
+        trailer_facade (bool): Whether the pages show trailers behind a
+                               thumbnail facade (see `PageTemplates`).
+
+    Returns:
+        list[str]: The paths of the files which were written, including
+                   compressed copies, starting with the index page (if it
+                   changed) and ending with the service worker (if any).
+                   Pages and static content which didn't change are left
+                   as they were and aren't included, and neither are
+                   hashed assets which already existed.
+    """
+    templates = get_templates(minify, standalone, trailer_facade)
+    index_page = _read_template(INDEX_PAGE_PATH, minify)
+
+    if not os.path.isdir(output_dir):
+        os.makedirs(output_dir)
+
+    # Write the shared static content once
+    if hashed_assets:
+        from fresh_tomatillos.assets import write_hashed_assets
+        asset_urls, asset_paths = write_hashed_assets(
+            templates.page_assets(), output_dir)
+    else:
+        asset_urls = SITE_ASSET_URLS
+        asset_paths = []
+        for name, content in sorted(templates.page_assets().items()):
+            path = os.path.join(output_dir, SITE_ASSET_URLS[name])
+            asset_paths.extend(_write_text(path, content, compress))
+
+    index_path = os.path.join(output_dir, INDEX_FILENAME)
+    service_worker_url = None
+    if service_worker:
+        from fresh_tomatillos.offline import service_worker_path
+        service_worker_url = os.path.basename(service_worker_path(index_path))
+
+    starts = range(0, len(movies), page_size)
+    page_count = len(starts)
+    settings = (minify, standalone, trailer_facade)
+    jobs = [(output_dir, number, page_count, movies[start:start + page_size],
+             None if tiles is None else tiles[start:start + page_size],
+             asset_urls, service_worker_url, settings, compress)
+            for number, start in enumerate(starts, 1)]
+
+    # Process pools are slow to import, and only needed here
+    try:
+        from concurrent.futures import ProcessPoolExecutor  # Python 3
+    except ImportError:
+        ProcessPoolExecutor = None  # Python 2, without the `futures` backport
+
+    if ProcessPoolExecutor is None or page_count < 2 or max_workers == 1:
+        written_pages = [_write_page(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers) as executor:
+            written_pages = list(executor.map(_write_page, jobs))
+
+    page_links = '\n'.join(
+        PAGE_INDEX_LINK_TEMPLATE.format(
+            url=PAGE_FILENAME.format(number), number=number,
+            first_title=page_movies[0].title,
+            last_title=page_movies[-1].title,
+            count=len(page_movies))
+        for _, number, _, page_movies, _, _, _, _, _ in jobs)
+
+    scripts = ''
+    if service_worker:
+        scripts = '    {0}\n'.format(
+            _register_service_worker(service_worker_url))
+
+    if standalone:
+        styles = INLINE_STYLES.format(templates.page_styles())
+    else:
+        styles = EXTERNAL_STYLES.format(asset_urls['styles'])
+
+    written_paths = _write_text(index_path, index_page.format(
+        vendor_styles=templates.vendor_parts()['vendor_styles'],
+        styles=styles,
+        movie_count=len(movies),
+        page_count=page_count,
+        page_links=page_links,
+        scripts=scripts), compress)
+    for paths in written_pages:
+        written_paths.extend(paths)
+    written_paths.extend(asset_paths)
 
-    # Compile the full movies page, including movie tiles
-    rendered_content = main_page.format(
-        movie_tiles=_create_movie_tiles(movies, movie_tile),
-        scripts=scripts,
-        styles=styles)
+    # Cache every page and asset, whether or not it was just written
+    if service_worker:
+        from fresh_tomatillos.offline import write_service_worker
+        cached_paths = [index_path] + [
+            os.path.join(output_dir, PAGE_FILENAME.format(number))
+            for number in range(1, page_count + 1)] + [
+            os.path.join(output_dir, asset_urls[name])
+            for name in sorted(templates.page_assets())]
+        written_paths.append(
+            write_service_worker(index_path, cached_paths, movies)[0])
 
-    return rendered_content
+    return written_paths
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+fresh_tomatillos.search
+~~~~~~~~~~~~~~~~~~~~~~~
+
+Implements a search index of the movies on a page, built along with the
+page so that `static/search.js` can filter the movie tiles as the user
+types, without scanning the page's text.
+
+The index is an inverted index of the words in each movie's title and
+summary: a sorted list of terms, and for each term the positions of the
+movies containing it.  Because the terms are sorted, every term starting
+with a given prefix is found with a binary search, so a query matches
+movies whose words *start with* each word of the query.  Words are
+compared in lowercase, without accents or HTML markup.
+
+The index is written next to the page as a JavaScript file (so that it
+can be loaded from a `file://` page, where browsers block `fetch()`),
+assigning a JSON object to `window.freshTomatillosSearchIndex`:
+
+    {"version": 1, "count": <movie count>, "terms": [<term>, ...],
+     "postings": ["<first position>,<difference to the next>,...", ...]}
+
+Positions are stored as the differences between consecutive positions,
+which keeps the postings short for common terms.
+"""
+
+from __future__ import unicode_literals
+import json
+import os
+import re
+import unicodedata
+from array import array
+from bisect import bisect_left
+try:
+    from html import unescape  # Python 3
+except ImportError:
+    from HTMLParser import HTMLParser  # Python 2
+    unescape = HTMLParser().unescape
+
+from fresh_tomatillos.output import atomic_open
+
+
+SEARCH_INDEX_VERSION = 1
+SEARCH_INDEX_SUFFIX = '.search.js'
+SEARCH_INDEX_TEMPLATE = 'window.freshTomatillosSearchIndex = {0};\n'
+
+# Keep in sync with tokenize() in static/search.js
+_TAG_RE = re.compile(r'<[^>]*>')
+_COMBINING_MARKS_RE = re.compile('[\u0300-\u036f]')
+_WORD_RE = re.compile(r'[^\W_]+', re.UNICODE)
+
+
+def tokenize(text):
+    """Return the searchable words in some text.
+
+    Args:
+        text (str): A title or summary, which may contain HTML.
+
+    Returns:
+        list[str]: The words, in lowercase and without accents.
+    """
+    if '<' in text:
+        text = _TAG_RE.sub(' ', text)
+    if '&' in text:
+        text = unescape(text)
+
+    text = _COMBINING_MARKS_RE.sub('', unicodedata.normalize('NFKD', text))
+    return _WORD_RE.findall(text.lower())
+
+
+def search_index_path(output_path):
+    """Return the path of the search index for a page.
+
+    Args:
+        output_path (str): The path of the page, such as `movies.html`.
+
+    Returns:
+        str: The path of its search index, such as `movies.search.js`.
+    """
+    return os.path.splitext(output_path)[0] + SEARCH_INDEX_SUFFIX
+
+
+class SearchIndex(object):
+    """An inverted index of the words in movies' titles and summaries.
+
+    Constructor Args:
+        movies (Iterable[Movie]): The movies to index, in page order.
+
+    Instance Attributes:
+        movie_count (int): The number of movies indexed.
+        terms (list[str]): Every indexed word, in sorted order.
+    """
+
+    __slots__ = ['movie_count', 'terms', '_postings']
+
+    def __init__(self, movies=()):
+        """Initialize a SearchIndex instance."""
+        postings = {}  # {<term>: array of the positions of movies}
+        position = -1
+
+        for position, movie in enumerate(movies):
+            for term in set(tokenize(movie.title + ' ' + movie.summary)):
+                positions = postings.get(term)
+                if positions is None:
+                    positions = postings[term] = array(str('I'))
+                positions.append(position)
+
+        self.movie_count = position + 1
+        self.terms = sorted(postings)
+        self._postings = postings
+
+    def _prefix_matches(self, prefix):
+        """Return the positions of the movies with a word starting `prefix`.
+
+        Args:
+            prefix (str): A lowercase word, without accents.
+
+        Returns:
+            set[int]: The positions of the matching movies.
+        """
+        terms = self.terms
+        matches = set()
+
+        for index in range(bisect_left(terms, prefix), len(terms)):
+            if not terms[index].startswith(prefix):
+                break
+            matches.update(self._postings[terms[index]])
+
+        return matches
+
+    def lookup(self, query):
+        """Return the movies matching a query, as `static/search.js` does.
+
+        Args:
+            query (str): Words, each of which must start a word of a movie's
+                         title or summary.
+
+        Returns:
+            Optional[list[int]]: The positions of the matching movies, in
+                                 page order, or None if the query has no
+                                 words (so every movie matches).
+        """
+        words = tokenize(query)
+        if not words:
+            return None
+
+        matches = self._prefix_matches(words[0])
+        for word in words[1:]:
+            if not matches:
+                break
+            matches.intersection_update(self._prefix_matches(word))
+
+        return sorted(matches)
+
+    def as_dict(self):
+        """Return the index as a dict, in the format described above."""
+        encoded_postings = []
+
+        for term in self.terms:
+            positions = self._postings[term]
+            # Store the first position, then the gap to each following one
+            gaps = [positions[0]]
+            gaps.extend(position - previous for previous, position in
+                        zip(positions, positions[1:]))
+            encoded_postings.append(','.join(map(str, gaps)))
+
+        return {'version': SEARCH_INDEX_VERSION, 'count': self.movie_count,
+                'terms': self.terms, 'postings': encoded_postings}
+
+    def to_script(self):
+        """Return JavaScript which makes the index available to the page.
+
+        Returns:
+            str: A script assigning the index to
+                 `window.freshTomatillosSearchIndex`.
+        """
+        data = json.dumps(self.as_dict(), ensure_ascii=False,
+                          separators=(',', ':'), sort_keys=True)
+        # These are valid in JSON strings, but not in older JavaScript
+        data = data.replace('\u2028', '\\u2028').replace(
+            '\u2029', '\\u2029')
+        return SEARCH_INDEX_TEMPLATE.format(data)
+
+
+def write_search_index(movies, output_path):
+    """Build the search index for a page, and write it next to the page.
+
+    Args:
+        movies (Iterable[Movie]): The movies on the page, in page order.
+        output_path (str): The path of the page.
+
+    Returns:
+        tuple[str, SearchIndex, int]: The path of the written index, the
+                                      index, and its size in bytes.
+
+    Raises:
+        IOError: Raised if the index can't be written.
+    """
+    index = SearchIndex(movies)
+    data = index.to_script().encode('utf-8')
+    path = search_index_path(output_path)
+
+    with atomic_open(path, binary=True) as index_file:
+        index_file.write(data)
+
+    return path, index, len(data)
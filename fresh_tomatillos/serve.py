@@ -0,0 +1,348 @@
+# -*- coding: utf-8 -*-
+"""
+fresh_tomatillos.serve
+~~~~~~~~~~~~~~~~~~~~~~
+
+Implements a small threaded HTTP server for the generated page(s).
+
+Each file is read and compressed (with gzip, and with brotli if the
+`brotli` package is installed) once, the first time it is requested after
+it changes on disk.  Responses carry an ETag derived from the file's
+contents, so browsers revalidating an unchanged file get a bodiless 304
+response.  Files whose names contain a content hash, such as
+`styles.0123abcd.css` (or the mirrored posters and their thumbnails, named
+after a hash of their contents), are marked as cacheable forever.
+"""
+
+from __future__ import unicode_literals
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+import zlib
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer  # Python 3
+    from socketserver import ThreadingMixIn
+    from urllib.parse import unquote, urlsplit
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer  # Python 2
+    from SocketServer import ThreadingMixIn
+    from urllib import unquote
+    from urlparse import urlsplit
+
+try:
+    import brotli
+except ImportError:
+    brotli = None  # Optional dependency: only gzip will be offered
+
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8000
+
+# Files named like `styles.0123abcd.css`, `posters/0123abcd.jpg` or
+# `thumbnails/0123abcd-220.jpg` never change, so they can be cached without
+# revalidation
+HASHED_NAME_PATTERN = re.compile(
+    r'(?:^|[./])[0-9a-f]{8,}(?:-[0-9]+)?\.[^./]+$')
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+
+# Content types worth compressing; images are already compressed
+COMPRESSIBLE_TYPES = frozenset([
+    'application/javascript', 'application/json', 'application/xml',
+    'image/svg+xml', 'text/css', 'text/html', 'text/javascript',
+    'text/plain'])
+
+
+def _gzip(data):
+    """Return `data` compressed in the gzip format."""
+    # A wbits value of 16 + MAX_WBITS writes a gzip header and trailer
+    compressor = zlib.compressobj(9, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+def _content_type(name):
+    """Return the Content-Type header value for a file name."""
+    content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    if content_type.startswith('text/') or content_type in (
+            'application/javascript', 'application/json'):
+        content_type += '; charset=utf-8'
+    return content_type
+
+
+class Artifact(object):
+    """One file to be served, with each of its precompressed encodings.
+
+    Constructor Args:
+        name (str): The name of the file, used to choose its content type
+                    and caching policy.
+        data (bytes): The contents of the file.
+
+    Instance Attributes:
+        content_type (str): The value of the Content-Type header.
+        cache_control (str): The value of the Cache-Control header.
+        etag (str): A quoted hash of the (uncompressed) contents.
+        encodings (dict[str, bytes]): The body of the file for each content
+                                      coding, with None for no coding.
+    """
+
+    __slots__ = ['content_type', 'cache_control', 'etag', 'encodings']
+
+    def __init__(self, name, data):
+        """Initialize an Artifact instance."""
+        self.content_type = _content_type(name)
+        self.etag = '"{0}"'.format(hashlib.sha1(data).hexdigest()[:20])
+        self.encodings = {None: data}
+
+        if HASHED_NAME_PATTERN.search(name):
+            self.cache_control = IMMUTABLE_CACHE_CONTROL
+        else:
+            self.cache_control = REVALIDATE_CACHE_CONTROL
+
+        if self.content_type.split(';')[0] in COMPRESSIBLE_TYPES:
+            compressed = {'gzip': _gzip(data)}
+            if brotli is not None:
+                compressed['br'] = brotli.compress(data)
+
+            for coding, body in compressed.items():
+                # Don't bother with encodings which don't save any bytes
+                if len(body) < len(data):
+                    self.encodings[coding] = body
+
+    def negotiate(self, accept_encoding):
+        """Choose the smallest encoding accepted by the client.
+
+        Args:
+            accept_encoding (str): The Accept-Encoding request header.
+
+        Returns:
+            tuple[Optional[str], bytes, str]: The content coding (or None),
+                the response body, and the ETag for that representation.
+        """
+        accepted = set()
+        for item in accept_encoding.split(','):
+            coding, _, params = item.partition(';')
+            name, _, quality = params.strip().partition('=')
+            try:
+                refused = name.strip() == 'q' and float(quality) == 0
+            except ValueError:
+                refused = False
+            if not refused:
+                accepted.add(coding.strip().lower())
+
+        best = None
+        for coding in self.encodings:
+            if coding in accepted and (
+                    best is None or
+                    len(self.encodings[coding]) < len(self.encodings[best])):
+                best = coding
+
+        if best is None:
+            return None, self.encodings[None], self.etag
+
+        # Each representation needs its own strong validator
+        return best, self.encodings[best], self.etag[:-1] + '-' + best + '"'
+
+
+class ArtifactStore(object):
+    """The files served from one directory, compressed once per change.
+
+    Only files directly inside the directory (or directly inside one of
+    the listed subdirectories) can be served, so a request can never reach
+    a file elsewhere on the system.
+
+    Constructor Args:
+        root_dir (str): The directory containing the files to serve.
+        index_name (str): The file served for the root URL, "/".
+        names (Optional[Iterable[str]]): If given, only these files may be
+                                         served from `root_dir` itself.
+        subdirs (Iterable[str]): Subdirectories of `root_dir` from which
+                                 any file may be served.
+    """
+
+    __slots__ = ['root_dir', 'index_name', 'names', 'subdirs', '_artifacts',
+                 '_lock']
+
+    def __init__(self, root_dir, index_name, names=None, subdirs=()):
+        """Initialize an ArtifactStore instance."""
+        self.root_dir = root_dir
+        self.index_name = index_name
+        self.names = None if names is None else frozenset(names)
+        self.subdirs = frozenset(subdirs)
+        self._artifacts = {}  # {<name>: (<signature>, <Artifact>)}
+        self._lock = threading.Lock()
+
+    def _name(self, url_path):
+        """Return the file name for a URL path, or None if it's invalid."""
+        name = unquote(url_path).lstrip('/') or self.index_name
+        subdir, _, base_name = name.rpartition('/')
+
+        if subdir:
+            if subdir not in self.subdirs:
+                return None
+        elif self.names is not None and name not in self.names:
+            return None
+
+        # The OS rejects names containing NUL bytes with a ValueError
+        if (not base_name or '\\' in base_name or '\0' in base_name or
+                base_name.startswith('.')):
+            return None
+        return name
+
+    def get(self, url_path):
+        """Return the Artifact for a URL path.
+
+        The file is only read again if its modification time or size has
+        changed since it was last served, such as after a rebuild.
+
+        Args:
+            url_path (str): The path component of a request URL.
+
+        Returns:
+            Optional[Artifact]: The artifact, or None if there is no file to
+                                serve for `url_path`.
+        """
+        name = self._name(url_path)
+        if name is None:
+            return None
+
+        path = os.path.join(self.root_dir, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        signature = (stat.st_mtime, stat.st_size)
+
+        cached = self._artifacts.get(name)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+        # Only one thread should compress each new version of a file
+        with self._lock:
+            cached = self._artifacts.get(name)
+            if cached is not None and cached[0] == signature:
+                return cached[1]
+
+            try:
+                with open(path, 'rb') as artifact_file:
+                    data = artifact_file.read()
+            except (IOError, OSError):
+                return None
+
+            artifact = Artifact(name, data)
+            self._artifacts[name] = (signature, artifact)
+            return artifact
+
+
+def _etag_matches(if_none_match, etag):
+    """Return whether an If-None-Match request header matches an ETag."""
+    if if_none_match.strip() == '*':
+        return True
+
+    # Weak comparison, as required for If-None-Match
+    return any(tag.strip().replace('W/', '', 1) == etag
+               for tag in if_none_match.split(','))
+
+
+class ArtifactRequestHandler(BaseHTTPRequestHandler):
+    """Answers GET and HEAD requests from an ArtifactStore.
+
+    Subclasses created by `make_server()` set the `store` class attribute.
+    """
+
+    # Allow keep-alive connections, since every response has a length
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately; don't delay small bodies
+    disable_nagle_algorithm = True
+    server_version = 'FreshTomatillos'
+    store = None
+
+    def _respond(self, include_body):
+        """Send the response for the requested URL."""
+        artifact = self.store.get(urlsplit(self.path).path)
+
+        if artifact is None:
+            body = b'Not Found\n'
+            self.send_response(404)
+            self.send_header('Content-Type', 'text/plain; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            if include_body:
+                self.wfile.write(body)
+            return
+
+        coding, body, etag = artifact.negotiate(
+            self.headers.get('Accept-Encoding', ''))
+        if_none_match = self.headers.get('If-None-Match')
+        not_modified = (if_none_match is not None and
+                        _etag_matches(if_none_match, etag))
+
+        self.send_response(304 if not_modified else 200)
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', artifact.cache_control)
+        if len(artifact.encodings) > 1:
+            self.send_header('Vary', 'Accept-Encoding')
+
+        if not_modified:
+            self.end_headers()
+            return
+
+        self.send_header('Content-Type', artifact.content_type)
+        if coding is not None:
+            self.send_header('Content-Encoding', coding)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if include_body:
+            self.wfile.write(body)
+
+    def do_GET(self):
+        """Answer a GET request."""
+        self._respond(include_body=True)
+
+    def do_HEAD(self):
+        """Answer a HEAD request."""
+        self._respond(include_body=False)
+
+    def log_message(self, format, *args):
+        """Don't log every request; a page load makes several of them."""
+        pass
+
+
+class ArtifactServer(ThreadingMixIn, HTTPServer):
+    """An HTTP server which answers each request in a new thread."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def make_server(store, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """Return an HTTP server for the files in an ArtifactStore.
+
+    Call `serve_forever()` on the result to start answering requests.
+
+    Args:
+        store (ArtifactStore): The files to serve.
+        host (str): The address to listen on.  Use '0.0.0.0' to make the
+                    page reachable from other computers.
+        port (int): The port to listen on, or 0 to use any free port.
+
+    Returns:
+        ArtifactServer: The (bound, but not yet serving) server.
+
+    Raises:
+        socket.error: Raised if the address can't be bound.
+    """
+    class BoundRequestHandler(ArtifactRequestHandler):
+        pass
+    BoundRequestHandler.store = store
+
+    return ArtifactServer((host, port), BoundRequestHandler)
+
+
+def server_url(server):
+    """Return the root URL of a server created by `make_server()`."""
+    host, port = server.server_address[:2]
+    if host in ('0.0.0.0', ''):
+        host = '127.0.0.1'
+    return 'http://{0}:{1}/'.format(host, port)
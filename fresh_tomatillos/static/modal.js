@@ -0,0 +1,66 @@
+// Open and close the trailer modal, in place of Bootstrap's scripts
+(function () {
+    var backdrop = null;
+    var openModal = null;
+
+    function closest(element, selector) {
+        while (element && element.nodeType === 1) {
+            if (element.matches(selector)) {
+                return element;
+            }
+            element = element.parentNode;
+        }
+        return null;
+    }
+
+    // Bootstrap's events are dispatched too, for trailer.js
+    function dispatch(modal, type) {
+        var event = document.createEvent('Event');
+        event.initEvent(type, false, false);
+        modal.dispatchEvent(event);
+    }
+
+    function show(modal) {
+        openModal = modal;
+        dispatch(modal, 'show.bs.modal');
+        backdrop = document.createElement('div');
+        backdrop.className = 'modal-backdrop in';
+        document.body.appendChild(backdrop);
+        document.body.classList.add('modal-open');
+        modal.classList.add('in');
+    }
+
+    function hide() {
+        if (!openModal) {
+            return;
+        }
+        dispatch(openModal, 'hide.bs.modal');
+        openModal.classList.remove('in');
+        document.body.classList.remove('modal-open');
+        document.body.removeChild(backdrop);
+        openModal = backdrop = null;
+    }
+
+    document.addEventListener('click', function (event) {
+        var toggle = closest(event.target, '[data-toggle="modal"]');
+        if (toggle && toggle.hasAttribute('data-target')) {
+            var modal = document.querySelector(
+                toggle.getAttribute('data-target'));
+            if (modal) {
+                event.preventDefault();
+                show(modal);
+            }
+        } else if (openModal && (event.target === openModal ||
+                closest(event.target, '[data-dismiss="modal"]'))) {
+            // A click outside of the dialog, or on its close button
+            event.preventDefault();
+            hide();
+        }
+    });
+
+    document.addEventListener('keydown', function (event) {
+        if (event.key === 'Escape' || event.keyCode === 27) {
+            hide();
+        }
+    });
+}());
@@ -0,0 +1,171 @@
+// Filter the movie tiles as the user types, using the prebuilt search index
+(function () {
+    var index = window.freshTomatillosSearchIndex;
+    var input = document.getElementById('movie-search-input');
+    var form = document.getElementById('movie-search');
+    var status = document.getElementById('movie-search-status');
+
+    if (!index || !input) {
+        return;
+    }
+
+    // See fresh_tomatillos/search.py for the format of the index
+    var terms = index.terms;
+    var decodedPostings = {};
+
+    // Keep in sync with tokenize() in search.py
+    var combiningMarks = /[\u0300-\u036f]/g;
+    var wordPattern;
+    try {
+        wordPattern = new RegExp('[\\p{L}\\p{N}]+', 'gu');
+    } catch (error) {
+        wordPattern = /[a-z0-9]+/g;  // No Unicode property support
+    }
+
+    // Movies matched by the current query get the highest marks, so marks
+    // never need to be cleared between queries
+    var marks = new Uint32Array(index.count);
+    var nextMark = 1;
+
+    // The virtual grid filters its own data (see virtual_grid.js)
+    var grid = window.freshTomatillosGrid;
+    var tiles = grid ? null : document.querySelectorAll('main .movie-tile');
+    var hiddenTiles = tiles && new Uint8Array(tiles.length);
+
+    var now = window.performance ? function () {
+        return window.performance.now();
+    } : Date.now;
+
+    function tokenize(text) {
+        if (text.normalize) {
+            text = text.normalize('NFKD');
+        }
+        return text.replace(combiningMarks, '').toLowerCase()
+            .match(wordPattern) || [];
+    }
+
+    function postings(termIndex) {
+        var positions = decodedPostings[termIndex];
+        if (!positions) {
+            var gaps = index.postings[termIndex].split(',');
+            var position = 0;
+            positions = new Array(gaps.length);
+            for (var i = 0; i < gaps.length; i++) {
+                position += +gaps[i];
+                positions[i] = position;
+            }
+            decodedPostings[termIndex] = positions;
+        }
+        return positions;
+    }
+
+    // Return the index of the first term which is not before `prefix`
+    function firstTerm(prefix) {
+        var low = 0;
+        var high = terms.length;
+        while (low < high) {
+            var middle = (low + high) >>> 1;
+            if (terms[middle] < prefix) {
+                low = middle + 1;
+            } else {
+                high = middle;
+            }
+        }
+        return low;
+    }
+
+    // Call `visit` with the position of each movie which has a word that
+    // starts with `prefix` (possibly more than once)
+    function eachMatch(prefix, visit) {
+        for (var t = firstTerm(prefix); t < terms.length &&
+                terms[t].lastIndexOf(prefix, 0) === 0; t++) {
+            var positions = postings(t);
+            for (var i = 0; i < positions.length; i++) {
+                visit(positions[i]);
+            }
+        }
+    }
+
+    // Return the positions of the movies matching every word, in order, or
+    // null if there are no words
+    function lookup(query) {
+        var words = tokenize(query);
+        if (!words.length) {
+            return null;
+        }
+
+        // A movie's mark counts the query words it has matched so far
+        var base = nextMark;
+        nextMark += words.length + 1;
+
+        words.forEach(function (word, wordIndex) {
+            eachMatch(word, function (position) {
+                if (wordIndex === 0 ? marks[position] < base :
+                        marks[position] === base + wordIndex - 1) {
+                    marks[position] = base + wordIndex;
+                }
+            });
+        });
+
+        var matchMark = base + words.length - 1;
+        var matches = [];
+        eachMatch(words[words.length - 1], function (position) {
+            if (marks[position] === matchMark) {
+                marks[position] = matchMark + 1;  // Only collect it once
+                matches.push(position);
+            }
+        });
+        return matches.sort(function (a, b) { return a - b; });
+    }
+
+    function showTiles(matches) {
+        var matched = new Uint8Array(tiles.length);
+        if (matches) {
+            matches.forEach(function (position) {
+                matched[position] = 1;
+            });
+        }
+
+        // Only touch the tiles whose visibility changed
+        for (var position = 0; position < tiles.length; position++) {
+            var hide = matches && !matched[position] ? 1 : 0;
+            if (hide !== hiddenTiles[position]) {
+                tiles[position].classList.toggle('search-hidden', !!hide);
+                hiddenTiles[position] = hide;
+            }
+        }
+    }
+
+    function search() {
+        var started = now();
+        var matches = lookup(input.value);
+        var elapsed = now() - started;
+
+        if (grid) {
+            grid.filter(matches);
+        } else {
+            showTiles(matches);
+        }
+
+        status.textContent = matches === null ? '' :
+            matches.length + ' of ' + index.count + ' movies (' +
+            elapsed.toFixed(2) + ' ms)';
+        return matches;
+    }
+
+    input.addEventListener('input', search);
+
+    // Jump to the first match when Enter is pressed
+    form.addEventListener('submit', function (event) {
+        event.preventDefault();
+        var matches = search();
+        if (!matches || !matches.length) {
+            return;
+        }
+        if (grid) {
+            grid.scrollToStart();
+        } else {
+            tiles[matches[0]].scrollIntoView();
+        }
+    });
+}());
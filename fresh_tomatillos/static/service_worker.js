@@ -0,0 +1,121 @@
+// Keep the generated page and everything it loads in the browser's cache.
+// The build prepends PRECACHE_VERSION, PRECACHE_PAGE and PRECACHE_ENTRIES
+// (see fresh_tomatillos/offline.py).
+var CACHE_PREFIX = 'fresh-tomatillos ' + self.registration.scope + ' ';
+var CACHE_NAME = CACHE_PREFIX + PRECACHE_VERSION;
+// A cache entry recording the revision of every other entry
+var REVISIONS_URL = '__precache_revisions__';
+
+var scope = self.registration.scope;
+var precached = {};  // {<absolute URL>: true}
+PRECACHE_ENTRIES.forEach(function (entry) {
+    precached[new URL(entry[0], scope).href] = true;
+});
+
+function isSameOrigin(url) {
+    return new URL(url, scope).origin === self.location.origin;
+}
+
+// Return the most recent previous cache of this page, or undefined
+function previousCache() {
+    return caches.keys().then(function (names) {
+        var previous = names.filter(function (name) {
+            return name.indexOf(CACHE_PREFIX) === 0 && name !== CACHE_NAME;
+        }).pop();
+        return previous && caches.open(previous);
+    });
+}
+
+function fetchEntry(cache, url) {
+    // Bypass the HTTP cache, which may hold an older revision; posters on
+    // other websites can only be fetched (and cached) as opaque responses
+    var request = isSameOrigin(url) ?
+        new Request(url, {cache: 'reload'}) :
+        new Request(url, {mode: 'no-cors'});
+
+    var stored = fetch(request).then(function (response) {
+        if (!response.ok && response.type !== 'opaque') {
+            throw new Error('Unable to precache ' + url);
+        }
+        return cache.put(url, response);
+    });
+
+    // Don't fail the whole install if another website is unavailable
+    return isSameOrigin(url) ? stored : stored.catch(function () {});
+}
+
+// Copy unchanged entries from the previous cache, and fetch the rest
+function precache() {
+    return Promise.all([caches.open(CACHE_NAME), previousCache()])
+        .then(function (opened) {
+            var cache = opened[0];
+            var previous = opened[1];
+            var revisions = {};
+
+            var previousRevisions = previous ?
+                previous.match(REVISIONS_URL).then(function (response) {
+                    return response ? response.json() : {};
+                }) : Promise.resolve({});
+
+            return previousRevisions.then(function (previousRevisions) {
+                return Promise.all(PRECACHE_ENTRIES.map(function (entry) {
+                    var url = entry[0];
+                    var revision = revisions[url] = entry[1] || '';
+                    if (previousRevisions[url] !== revision) {
+                        return fetchEntry(cache, url);
+                    }
+                    return previous.match(url).then(function (response) {
+                        return response ? cache.put(url, response) :
+                            fetchEntry(cache, url);
+                    });
+                }));
+            }).then(function () {
+                return cache.put(REVISIONS_URL,
+                                 new Response(JSON.stringify(revisions)));
+            });
+        });
+}
+
+self.addEventListener('install', function (event) {
+    event.waitUntil(precache().then(function () {
+        return self.skipWaiting();
+    }));
+});
+
+// Delete the caches of previous builds
+self.addEventListener('activate', function (event) {
+    event.waitUntil(caches.keys().then(function (names) {
+        return Promise.all(names.filter(function (name) {
+            return name.indexOf(CACHE_PREFIX) === 0 && name !== CACHE_NAME;
+        }).map(function (name) {
+            return caches.delete(name);
+        }));
+    }).then(function () {
+        return self.clients.claim();
+    }));
+});
+
+self.addEventListener('fetch', function (event) {
+    var request = event.request;
+    if (request.method !== 'GET') {
+        return;
+    }
+
+    // Pages come from the network when possible, so a rebuilt catalog
+    // shows up at once, and from the cache when offline
+    if (request.mode === 'navigate') {
+        event.respondWith(fetch(request).catch(function () {
+            return caches.open(CACHE_NAME).then(function (cache) {
+                return cache.match(request).then(function (response) {
+                    return response || cache.match(PRECACHE_PAGE);
+                });
+            });
+        }));
+    } else if (precached[request.url]) {
+        event.respondWith(caches.open(CACHE_NAME).then(function (cache) {
+            return cache.match(request).then(function (response) {
+                return response || fetch(request);
+            });
+        }));
+    }
+});
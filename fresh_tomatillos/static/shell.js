@@ -0,0 +1,29 @@
+// Set up the movie tiles without jQuery, in place of scripts.js, for
+// standalone pages
+(function () {
+    var tiles = document.querySelectorAll('main .movie-tile');
+    var useModal = 'matchMedia' in window;
+    var i;
+
+    // We'll show videos in a modal for modern browsers with JavaScript
+    // enabled (see trailer.js or trailer_facade.js)
+    for (i = 0; i < tiles.length; i++) {
+        if (useModal) {
+            // Disable video links
+            tiles[i].querySelector('a').removeAttribute('href');
+        } else {
+            // Prevent video modal from opening, since it is not supported
+            tiles[i].removeAttribute('data-target');
+        }
+    }
+
+    // Fade in the first movie tiles, one after another (later tiles are
+    // usually out of view, so they just appear)
+    var ANIMATED_TILES = 12;
+    if (useModal) {
+        for (i = 0; i < tiles.length && i < ANIMATED_TILES; i++) {
+            tiles[i].style.animationDelay = (i * 100) + 'ms';
+            tiles[i].classList.add('tile-enter');
+        }
+    }
+}());
@@ -0,0 +1,54 @@
+// Play trailers in the modal, starting the YouTube player as it opens
+// (trailer_facade.js is used instead by pages built with --trailer-facade)
+(function () {
+    var modal = document.getElementById('trailer');
+    var container = document.getElementById('trailer-video-container');
+
+    // Videos are only shown in a modal for modern browsers (see scripts.js)
+    if (!modal || !container || !('matchMedia' in window)) {
+        return;
+    }
+
+    function findTile(element) {
+        while (element && element.nodeType === 1) {
+            if (element.classList.contains('movie-tile')) {
+                return element;
+            }
+            element = element.parentNode;
+        }
+        return null;
+    }
+
+    // Start playing the video whenever the trailer modal is opened
+    function open(event) {
+        var tile = findTile(event.target);
+        if (!tile || !tile.hasAttribute('data-target')) {
+            return;
+        }
+
+        var frame = document.createElement('iframe');
+        frame.id = 'trailer-video';
+        frame.setAttribute('type', 'text-html');
+        frame.setAttribute('frameborder', '0');
+        frame.src = 'https://www.youtube.com/embed/' +
+            encodeURIComponent(tile.getAttribute('data-trailer-youtube-id')) +
+            '?autoplay=1&html5=1';
+        container.innerHTML = '';
+        container.appendChild(frame);
+    }
+
+    // Remove the player itself when the modal is closed, as this is the only
+    // reliable way to ensure the video stops playing in IE
+    function close() {
+        container.innerHTML = '';
+    }
+
+    document.addEventListener('click', open);
+
+    // Bootstrap's modal events are jQuery events, while modal.js (used
+    // instead of Bootstrap by standalone pages) dispatches DOM events
+    if (window.jQuery) {
+        window.jQuery(modal).on('hide.bs.modal', close);
+    }
+    modal.addEventListener('hide.bs.modal', close);
+}());
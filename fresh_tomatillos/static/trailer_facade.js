@@ -0,0 +1,196 @@
+// Play trailers in the modal, behind a lightweight thumbnail "facade"
+(function () {
+    var modal = document.getElementById('trailer');
+    var container = document.getElementById('trailer-video-container');
+
+    // Videos are only shown in a modal for modern browsers (see scripts.js)
+    if (!modal || !container || !('matchMedia' in window)) {
+        return;
+    }
+
+    var ORIGINS = ['https://www.youtube.com', 'https://i.ytimg.com',
+                   'https://www.google.com'];
+    var API_URL = 'https://www.youtube.com/iframe_api';
+
+    var facade = document.createElement('button');
+    facade.type = 'button';
+    facade.className = 'trailer-facade';
+    facade.setAttribute('aria-label', 'Play trailer');
+    var thumbnail = document.createElement('img');
+    thumbnail.alt = '';
+    var playIcon = document.createElement('span');
+    playIcon.className = 'trailer-play';
+    facade.appendChild(thumbnail);
+    facade.appendChild(playIcon);
+
+    var playerElement = document.createElement('div');
+    playerElement.id = 'trailer-video';
+    container.appendChild(playerElement);
+    container.appendChild(facade);
+
+    var videoId = null;
+    var warmed = false;
+    var warmedThumbnails = {};
+    var api = null;  // 'loading', 'ready' or 'failed'
+    var player = null;
+    var playerVideoId = null;  // The trailer the player was created for
+    var playerReady = false;
+    var fallbackFrame = null;
+    var playRequested = false;  // Until the modal is closed
+
+    function thumbnailUrl(id) {
+        return 'https://i.ytimg.com/vi/' + encodeURIComponent(id) +
+            '/hqdefault.jpg';
+    }
+
+    function findTile(element) {
+        while (element && element.nodeType === 1) {
+            if (element.classList.contains('movie-tile')) {
+                return element;
+            }
+            element = element.parentNode;
+        }
+        return null;
+    }
+
+    function addHint(rel, href) {
+        var link = document.createElement('link');
+        link.rel = rel;
+        link.href = href;
+        document.head.appendChild(link);
+    }
+
+    // Set up connections to YouTube (once), and fetch the tile's thumbnail,
+    // as soon as a tile is about to be clicked
+    function warm(event) {
+        var tile = findTile(event.target);
+        if (!tile) {
+            return;
+        }
+
+        if (!warmed) {
+            warmed = true;
+            ORIGINS.forEach(function (origin) {
+                addHint('preconnect', origin);
+                addHint('dns-prefetch', origin);
+            });
+        }
+
+        var id = tile.getAttribute('data-trailer-youtube-id');
+        if (id && !warmedThumbnails[id]) {
+            warmedThumbnails[id] = true;
+            new Image().src = thumbnailUrl(id);
+        }
+    }
+
+    function loadApi() {
+        if (api) {
+            return;
+        }
+        api = 'loading';
+
+        var previousReady = window.onYouTubeIframeAPIReady;
+        window.onYouTubeIframeAPIReady = function () {
+            api = 'ready';
+            if (previousReady) {
+                previousReady();
+            }
+            if (playRequested) {
+                play();
+            }
+        };
+
+        var script = document.createElement('script');
+        script.src = API_URL;
+        script.async = true;
+        script.onerror = function () {
+            api = 'failed';
+            if (playRequested) {
+                play();
+            }
+        };
+        document.head.appendChild(script);
+    }
+
+    // Embed the player directly if the API can't be loaded, as before
+    function playInFrame() {
+        if (!fallbackFrame) {
+            fallbackFrame = document.createElement('iframe');
+            fallbackFrame.setAttribute('frameborder', '0');
+            fallbackFrame.setAttribute('allow', 'autoplay; fullscreen');
+            container.replaceChild(fallbackFrame, playerElement);
+        }
+        fallbackFrame.src = 'https://www.youtube.com/embed/' +
+            encodeURIComponent(videoId) + '?autoplay=1&html5=1';
+    }
+
+    function play() {
+        playRequested = true;
+        container.classList.add('trailer-playing');
+
+        if (api === 'failed') {
+            playInFrame();
+        } else if (api !== 'ready') {
+            loadApi();  // play() is called again once the API is ready
+        } else if (player && playerReady) {
+            // Switch trailers without creating another player
+            player.loadVideoById(videoId);
+        } else if (!player) {
+            playerVideoId = videoId;
+            player = new window.YT.Player(playerElement, {
+                videoId: videoId,
+                playerVars: {playsinline: 1, rel: 0},
+                events: {
+                    onReady: function () {
+                        playerReady = true;
+                        // Unless the modal was closed (or the trailer
+                        // changed) while the player was being created
+                        if (playRequested && videoId !== playerVideoId) {
+                            player.loadVideoById(videoId);
+                        } else if (playRequested) {
+                            player.playVideo();
+                        }
+                    }
+                }
+            });
+        }
+    }
+
+    // Show the trailer's thumbnail whenever the trailer modal is opened
+    function open(event) {
+        var tile = findTile(event.target);
+        if (!tile || !tile.hasAttribute('data-target')) {
+            return;
+        }
+
+        videoId = tile.getAttribute('data-trailer-youtube-id');
+        thumbnail.src = thumbnailUrl(videoId);
+        container.classList.remove('trailer-playing');
+        loadApi();  // The player itself is only created on play
+    }
+
+    // Stop the video when the modal is closed, keeping the player for reuse
+    function close() {
+        playRequested = false;
+        container.classList.remove('trailer-playing');
+        if (player && playerReady) {
+            player.stopVideo();
+        }
+        if (fallbackFrame) {
+            fallbackFrame.src = 'about:blank';
+        }
+    }
+
+    document.addEventListener('mouseover', warm);
+    document.addEventListener('focusin', warm);
+    document.addEventListener('touchstart', warm, {passive: true});
+    document.addEventListener('click', open);
+    facade.addEventListener('click', play);
+
+    // Bootstrap's modal events are jQuery events, while modal.js (used
+    // instead of Bootstrap by standalone pages) dispatches DOM events
+    if (window.jQuery) {
+        window.jQuery(modal).on('hide.bs.modal', close);
+    }
+    modal.addEventListener('hide.bs.modal', close);
+}());
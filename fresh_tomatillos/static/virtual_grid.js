@@ -0,0 +1,169 @@
+// Render only the movie tiles near the viewport, using the JSON data island
+(function () {
+    var dataElement = document.getElementById('movie-data');
+    var grid = document.getElementById('movie-grid');
+
+    if (!dataElement || !grid) {
+        return;
+    }
+
+    // Each movie is [title, summary, poster_url, youtube_id], followed by
+    // [poster_srcset, poster_webp_srcset] if it has thumbnails
+    var allMovies = JSON.parse(dataElement.textContent);
+    // The movies shown, which search.js may narrow down
+    var movies = allMovies;
+
+    // Keep in sync with the `.virtual-row` height in virtual_grid.css
+    var ROW_HEIGHT = 560;
+    // Keep in sync with the poster `sizes` in media.py
+    var POSTER_SIZES = '220px';
+    // Extra rows to render above and below the viewport
+    var OVERSCAN_ROWS = 2;
+
+    // Videos are shown in a modal for modern browsers (see scripts.js)
+    var useModal = 'matchMedia' in window;
+
+    var columns = 0;
+    var renderedRows = {};
+    var updateScheduled = false;
+
+    // Match the Bootstrap classes on each tile: col-md-6 col-lg-4
+    function columnCount() {
+        var width = window.innerWidth;
+        return width >= 1200 ? 3 : width >= 992 ? 2 : 1;
+    }
+
+    // Build the same markup as templates/movie_tile.html
+    function createTile(movie) {
+        var tile = document.createElement('article');
+        tile.className = 'col-md-6 col-lg-4 movie-tile text-center';
+        tile.setAttribute('data-trailer-youtube-id', movie[3]);
+
+        var link = document.createElement('a');
+        if (useModal) {
+            tile.setAttribute('data-toggle', 'modal');
+            tile.setAttribute('data-target', '#trailer');
+        } else {
+            link.href = 'https://www.youtube.com/watch?v=' + movie[3];
+            link.target = '_blank';
+        }
+
+        var poster = document.createElement('img');
+        poster.alt = '';
+        poster.width = 220;
+        poster.height = 342;
+        poster.setAttribute('loading', 'lazy');
+
+        // Only posters with thumbnails are wrapped in a <picture>
+        if (movie.length > 4) {
+            var picture = document.createElement('picture');
+            var webpSource = document.createElement('source');
+            webpSource.type = 'image/webp';
+            webpSource.setAttribute('srcset', movie[5]);
+            webpSource.setAttribute('sizes', POSTER_SIZES);
+            picture.appendChild(webpSource);
+            poster.setAttribute('srcset', movie[4]);
+            poster.setAttribute('sizes', POSTER_SIZES);
+            poster.src = movie[2];
+            picture.appendChild(poster);
+            link.appendChild(picture);
+        } else {
+            poster.src = movie[2];
+            link.appendChild(poster);
+        }
+
+        var title = document.createElement('h2');
+        title.innerHTML = movie[0];
+        var summary = document.createElement('p');
+        summary.innerHTML = movie[1];
+
+        tile.appendChild(link);
+        tile.appendChild(title);
+        tile.appendChild(summary);
+        return tile;
+    }
+
+    function createRow(rowIndex) {
+        var row = document.createElement('div');
+        row.className = 'row virtual-row';
+        row.style.top = (rowIndex * ROW_HEIGHT) + 'px';
+
+        var end = Math.min(movies.length, (rowIndex + 1) * columns);
+        for (var i = rowIndex * columns; i < end; i++) {
+            row.appendChild(createTile(movies[i]));
+        }
+        return row;
+    }
+
+    function clearRows() {
+        for (var rowIndex in renderedRows) {
+            grid.removeChild(renderedRows[rowIndex]);
+        }
+        renderedRows = {};
+    }
+
+    function update() {
+        updateScheduled = false;
+
+        var newColumns = columnCount();
+        if (newColumns !== columns) {
+            columns = newColumns;
+            clearRows();
+        }
+
+        var rowCount = Math.ceil(movies.length / columns);
+        grid.style.height = (rowCount * ROW_HEIGHT) + 'px';
+
+        // Find the rows which intersect the viewport
+        var gridTop = grid.getBoundingClientRect().top;
+        var first = Math.floor(-gridTop / ROW_HEIGHT) - OVERSCAN_ROWS;
+        var last = Math.floor((window.innerHeight - gridTop) / ROW_HEIGHT) +
+            OVERSCAN_ROWS;
+        first = Math.max(0, first);
+        last = Math.min(rowCount - 1, last);
+
+        // Remove rows which scrolled out of range, then add missing rows
+        for (var rowIndex in renderedRows) {
+            if (rowIndex < first || rowIndex > last) {
+                grid.removeChild(renderedRows[rowIndex]);
+                delete renderedRows[rowIndex];
+            }
+        }
+        for (var i = first; i <= last; i++) {
+            if (!renderedRows[i]) {
+                renderedRows[i] = grid.appendChild(createRow(i));
+            }
+        }
+    }
+
+    function scheduleUpdate() {
+        if (!updateScheduled) {
+            updateScheduled = true;
+            if (window.requestAnimationFrame) {
+                window.requestAnimationFrame(update);
+            } else {
+                setTimeout(update, 16);
+            }
+        }
+    }
+
+    window.addEventListener('scroll', scheduleUpdate);
+    window.addEventListener('resize', scheduleUpdate);
+    update();
+
+    // Used by search.js to show only the movies matching a search
+    window.freshTomatillosGrid = {
+        // Show the movies at the given positions, or every movie for null
+        filter: function (positions) {
+            movies = positions === null ? allMovies :
+                positions.map(function (position) {
+                    return allMovies[position];
+                });
+            clearRows();
+            update();
+        },
+        scrollToStart: function () {
+            grid.scrollIntoView();
+        }
+    };
+}());
@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+"""
+fresh_tomatillos.thumbnails
+~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+Implements generating downscaled copies of locally available poster
+images, so pages load posters at the size they're shown rather than at
+their full (often multi-megabyte) size.
+
+Each poster gets a copy at 1x and 2x the width at which it is shown, both
+as WebP and in a fallback format (JPEG, or PNG for images with
+transparency).  Copies are named after a hash of the source image and
+their width, so they are only generated once per source image.  Images are
+processed in parallel worker processes when possible.
+
+Requires the Pillow package, which is an optional dependency.
+"""
+
+from __future__ import unicode_literals
+import hashlib
+import os
+from collections import namedtuple
+try:
+    from concurrent.futures import ProcessPoolExecutor  # Python 3
+except ImportError:
+    ProcessPoolExecutor = None  # Python 2, without the `futures` backport
+try:
+    from urllib.parse import unquote, urlsplit  # Python 3
+    from urllib.request import url2pathname
+except ImportError:
+    from urllib import unquote, url2pathname  # Python 2
+    from urlparse import urlsplit
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None  # Optional dependency: thumbnails are unavailable
+
+from fresh_tomatillos.output import atomic_open
+
+
+# The directory, next to the generated page, in which thumbnails are saved
+THUMBNAILS_DIRNAME = 'thumbnails'
+
+# 1x and 2x the width at which posters are shown in movie tiles
+THUMBNAIL_WIDTHS = (220, 440)
+
+THUMBNAIL_NAME = '{hash}-{width}{extension}'
+WEBP_OPTIONS = {'format': 'WEBP', 'quality': 80, 'method': 4}
+JPEG_OPTIONS = {'format': 'JPEG', 'quality': 82, 'optimize': True,
+                'progressive': True}
+PNG_OPTIONS = {'format': 'PNG', 'optimize': True}
+
+# The errors which mean a single image can't be used, rather than that
+# thumbnails can't be generated at all.  Pillow raises DecompressionBombError
+# (since 5.0) for images large enough to exhaust memory.
+IMAGE_ERRORS = (IOError, OSError, ValueError)
+if Image is not None and hasattr(Image, 'DecompressionBombError'):
+    IMAGE_ERRORS += (Image.DecompressionBombError,)
+
+
+# The outcome of add_thumbnails():
+#   thumbnail_count: the number of movies which were given thumbnails
+#   errors: {<poster path>: <error message>} for unusable images
+ThumbnailResult = namedtuple('ThumbnailResult', ['thumbnail_count', 'errors'])
+
+
+def pillow_available():
+    """Return whether thumbnails can be generated (Pillow is installed)."""
+    return Image is not None
+
+
+def local_poster_path(poster_url, page_dir):
+    """Return the path of a poster on this computer, if it is local.
+
+    Args:
+        poster_url (str): A movie's poster URL: either a `file:` URL or a
+                          URL relative to the page.
+        page_dir (str): The directory containing the generated page.
+
+    Returns:
+        Optional[str]: The path of the poster file, or None if the poster
+                       is remote or doesn't exist.
+    """
+    split_url = urlsplit(poster_url)
+
+    if split_url.scheme == 'file':
+        path = url2pathname(split_url.path)
+    elif not split_url.scheme and not split_url.netloc:
+        path = os.path.join(page_dir, url2pathname(unquote(split_url.path)))
+    else:
+        return None
+
+    return path if os.path.isfile(path) else None
+
+
+def _hash_file(path):
+    """Return a short hex digest of the contents of a file."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as source_file:
+        for chunk in iter(lambda: source_file.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:32]
+
+
+def _save(image, path, options):
+    """Save an image atomically, so a partial file is never left behind."""
+    with atomic_open(path, binary=True) as image_file:
+        image.save(image_file, **options)
+
+
+def make_thumbnails(job):
+    """Generate the thumbnails of one image, unless they already exist.
+
+    This is a module-level function so that it can run in a worker process.
+
+    Args:
+        job (tuple[str, str]): The path of the source image and the
+                               directory in which to save its thumbnails.
+
+    Returns:
+        tuple[str, list[tuple[int, str, str]]]: The source path, and the
+            (width, fallback_name, webp_name) of each thumbnail.  There are
+            no thumbnails for images which are already small enough.
+
+    Raises:
+        IOError: Raised if the image can't be read, decoded or saved.
+        PIL.Image.DecompressionBombError: Raised if the image is too large
+            to decode safely.
+    """
+    source_path, thumbnails_dir = job
+    source_hash = _hash_file(source_path)
+
+    # Opening an image only reads its header; pixels are decoded on demand
+    with Image.open(source_path) as image:
+        return source_path, _resize(image, source_hash, thumbnails_dir)
+
+
+def _resize(image, source_hash, thumbnails_dir):
+    """Save the missing thumbnails of an opened image.
+
+    Args:
+        image (PIL.Image.Image): The source image.
+        source_hash (str): A digest of the source image file.
+        thumbnails_dir (str): The directory in which to save thumbnails.
+
+    Returns:
+        list[tuple[int, str, str]]: The (width, fallback_name, webp_name) of
+                                    each thumbnail.
+    """
+    source_width, source_height = image.size
+    transparent = (image.mode in ('RGBA', 'LA', 'PA') or
+                   'transparency' in image.info)
+
+    if transparent:
+        fallback_extension, fallback_options = '.png', PNG_OPTIONS
+    else:
+        fallback_extension, fallback_options = '.jpg', JPEG_OPTIONS
+
+    thumbnails = []
+    missing = []  # [(<size>, <paths>)]
+
+    for width in THUMBNAIL_WIDTHS:
+        if width >= source_width:
+            break  # Never scale images up
+
+        height = max(1, int(round(
+            source_height * width / float(source_width))))
+        names = (THUMBNAIL_NAME.format(hash=source_hash, width=width,
+                                       extension=fallback_extension),
+                 THUMBNAIL_NAME.format(hash=source_hash, width=width,
+                                       extension='.webp'))
+        thumbnails.append((width,) + names)
+
+        paths = [os.path.join(thumbnails_dir, name) for name in names]
+        if not all(os.path.isfile(path) for path in paths):
+            missing.append(((width, height), paths))
+
+    if missing:
+        # Let JPEG decoding skip detail which would be scaled away anyway
+        image.draft('RGB', missing[-1][0])
+        decoded = image.convert('RGBA' if transparent else 'RGB')
+
+        for size, paths in missing:
+            thumbnail = decoded.resize(size, Image.LANCZOS)
+            _save(thumbnail, paths[0], fallback_options)
+            _save(thumbnail, paths[1], WEBP_OPTIONS)
+
+    return thumbnails
+
+
+def generate_thumbnails(paths, thumbnails_dir, max_workers=None):
+    """Generate thumbnails for several images in parallel.
+
+    Args:
+        paths (Iterable[str]): The paths of the source images.
+        thumbnails_dir (str): The directory in which to save thumbnails.  It
+                              is created if it doesn't exist.
+        max_workers (Optional[int]): The maximum number of processes to use.
+                                     1 processes every image in the current
+                                     process.
+
+    Returns:
+        tuple[dict, dict]: The thumbnails for each source path (as returned
+            by `make_thumbnails()`), and an error message for each source
+            path whose thumbnails couldn't be generated.
+
+    Raises:
+        RuntimeError: Raised if Pillow is not installed.
+        IOError: Raised if the thumbnails directory can't be created.
+    """
+    if Image is None:
+        raise RuntimeError('Generating thumbnails requires Pillow')
+
+    if not os.path.isdir(thumbnails_dir):
+        os.makedirs(thumbnails_dir)
+
+    jobs = [(path, thumbnails_dir) for path in sorted(set(paths))]
+    thumbnails = {}
+    errors = {}
+
+    def collect(job, future_result):
+        try:
+            source_path, source_thumbnails = future_result()
+        except IMAGE_ERRORS as e:
+            errors[job[0]] = '{0}'.format(e) or type(e).__name__
+        else:
+            thumbnails[source_path] = source_thumbnails
+
+    if ProcessPoolExecutor is None or len(jobs) < 2 or max_workers == 1:
+        for job in jobs:
+            collect(job, lambda: make_thumbnails(job))
+    else:
+        with ProcessPoolExecutor(max_workers) as executor:
+            futures = [(job, executor.submit(make_thumbnails, job))
+                       for job in jobs]
+            for job, future in futures:
+                collect(job, future.result)
+
+    return thumbnails, errors
+
+
+def add_thumbnails(movies, page_dir, max_workers=None):
+    """Generate poster thumbnails, and add them to the movies.
+
+    Only posters available on this computer (such as those saved by
+    `posters.mirror_posters()`) get thumbnails.  Each such movie's
+    `poster_url` is pointed at its smallest fallback thumbnail, for
+    browsers which don't support `srcset`.
+
+    Args:
+        movies (Iterable[Movie]): The movies whose posters to downscale.
+        page_dir (str): The directory containing the generated page.
+            Thumbnails are saved in a subdirectory of it.
+        max_workers (Optional[int]): The maximum number of processes to use.
+
+    Returns:
+        ThumbnailResult: The number of movies given thumbnails, and any
+                         errors.
+
+    Raises:
+        RuntimeError: Raised if Pillow is not installed.
+        IOError: Raised if the thumbnails directory can't be created.
+    """
+    movie_paths = [(movie, local_poster_path(movie.poster_url, page_dir))
+                   for movie in movies]
+    thumbnails, errors = generate_thumbnails(
+        (path for _, path in movie_paths if path is not None),
+        os.path.join(page_dir, THUMBNAILS_DIRNAME), max_workers)
+
+    url_prefix = THUMBNAILS_DIRNAME + '/'
+    thumbnail_count = 0
+
+    for movie, path in movie_paths:
+        if not thumbnails.get(path):
+            continue
+
+        movie.thumbnails = tuple(
+            (width, url_prefix + fallback_name, url_prefix + webp_name)
+            for width, fallback_name, webp_name in thumbnails[path])
+        movie.poster_url = movie.thumbnails[0][1]
+        thumbnail_count += 1
+
+    return ThumbnailResult(thumbnail_count, errors)
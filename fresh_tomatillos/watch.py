@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+"""
+fresh_tomatillos.watch
+~~~~~~~~~~~~~~~~~~~~~~
+
+Implements watch mode, which rebuilds the movies page whenever the config
+file, a template, or a static file changes.
+
+Everything from the previous build stays in memory between rebuilds: the
+compiled templates (see `render.get_templates()`) and the manifest of
+rendered movie tiles (see `incremental`).  A config change only re-renders
+the movies whose sections changed, and a template change skips re-reading
+the config file entirely.
+"""
+
+from __future__ import unicode_literals
+import os
+import time
+from collections import namedtuple
+try:
+    from configparser import Error as ConfigParserError  # Python 3
+except ImportError:
+    from ConfigParser import Error as ConfigParserError  # Python 2
+
+from fresh_tomatillos.exceptions import ConfigError
+from fresh_tomatillos.get_config import get_config
+from fresh_tomatillos.incremental import (
+    BuildManifest, build_movie_tiles, templates_fingerprint)
+from fresh_tomatillos.output import atomic_open
+from fresh_tomatillos.render import (
+    MODULE_DIR, get_templates, stream_virtual_page, write_movies_page)
+
+try:
+    _timer = time.perf_counter  # Python 3
+except AttributeError:
+    _timer = time.time  # Python 2
+
+# Directories whose files are read by `render.get_templates()`
+TEMPLATE_DIRS = tuple(os.path.join(MODULE_DIR, name)
+                      for name in ('templates', 'static'))
+
+# Seconds to wait between checks for changed files
+DEFAULT_INTERVAL = 0.25
+
+
+RebuildReport = namedtuple(
+    'RebuildReport',
+    ['changed_paths', 'movie_count', 'rendered_count', 'seconds'])
+
+
+def _signature(path):
+    """Return a value which changes whenever a file is modified.
+
+    Args:
+        path (str): The path of the file.
+
+    Returns:
+        Optional[tuple[float, int]]: The modification time and size of the
+                                     file, or None if it can't be found.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime, stat.st_size
+
+
+def _snapshot(config_path):
+    """Return the signatures of the config file and every template file.
+
+    Args:
+        config_path (str): The path of the config file.
+
+    Returns:
+        dict[str, Optional[tuple]]: A signature for each watched path.
+    """
+    snapshot = {config_path: _signature(config_path)}
+
+    for directory in TEMPLATE_DIRS:
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            snapshot[path] = _signature(path)
+
+    return snapshot
+
+
+class _WatchState(object):
+    """The state kept in memory between rebuilds.
+
+    Constructor Args:
+        config_path (str): The path of the config file.
+        output_path (str): The path of the generated HTML file.
+        fast_config (bool): Whether to read the config with FastConfig.
+        virtual (bool): Whether to generate a virtualized page.
+    """
+
+    __slots__ = ['config_path', 'output_path', 'fast_config', 'virtual',
+                 'config', 'manifest']
+
+    def __init__(self, config_path, output_path, fast_config, virtual):
+        """Initialize a _WatchState instance."""
+        self.config_path = config_path
+        self.output_path = output_path
+        self.fast_config = fast_config
+        self.virtual = virtual
+        self.config = None
+        self.manifest = None
+
+    def rebuild(self, config_changed):
+        """Rebuild the movies page, reusing as much state as possible.
+
+        Args:
+            config_changed (bool): Whether the config file must be re-read.
+
+        Returns:
+            tuple[int, int]: The number of movies on the page and the number
+                             of them that were rendered by this rebuild.
+
+        Raises:
+            ConfigError: Raised if the config file contains an error.
+            ConfigParserError: Raised if the config file can't be parsed,
+                               or repeats a section or option.
+            UnicodeDecodeError: Raised if the config file isn't valid
+                                UTF-8.
+            IOError: Raised if a file can't be read or written.
+        """
+        if config_changed or self.config is None:
+            # Forget the old config, so it is re-read after an error
+            self.config = None
+            self.config = get_config(
+                self.config_path, ('summary', 'poster', 'youtube'),
+                fast=self.fast_config)
+
+        templates = get_templates()
+        fingerprint = templates_fingerprint(templates)
+
+        if self.manifest is None or self.manifest.fingerprint != fingerprint:
+            previous = BuildManifest(fingerprint)
+        else:
+            previous = self.manifest
+
+        movies, tiles, manifest, rendered = build_movie_tiles(
+            self.config, templates, previous)
+
+        with atomic_open(self.output_path) as output_file:
+            if self.virtual:
+                stream_virtual_page(movies, output_file, templates)
+            else:
+                write_movies_page(tiles, output_file, templates)
+
+        # Only keep the new state once the build has fully succeeded
+        self.manifest = manifest
+        return len(movies), rendered
+
+
+def watch(config_path, output_path, fast_config=False, virtual=False,
+          interval=DEFAULT_INTERVAL, on_build=None, on_error=None):
+    """Build the movies page, then rebuild it whenever its sources change.
+
+    The config file and the template and static directories are polled for
+    changes every `interval` seconds.  The output file is replaced
+    atomically on each rebuild.  Errors in a build are reported through
+    `on_error`, after which watching continues.  This function only returns
+    by raising an exception, such as KeyboardInterrupt.
+
+    Args:
+        config_path (str): The path of the config file.
+        output_path (str): The path of the generated HTML file.
+        fast_config (bool): Whether to read the config with FastConfig.
+        virtual (bool): Whether to generate a virtualized page (see
+                        `render.stream_virtual_page()`).
+        interval (float): Seconds to wait between checks for changes.
+        on_build (Optional[Callable[[RebuildReport], None]]): Called after
+            every successful build, including the first one.
+        on_error (Optional[Callable[[Exception], None]]): Called with the
+            exception raised by a failed build.
+    """
+    state = _WatchState(config_path, output_path, fast_config, virtual)
+    snapshot = {}
+
+    while True:
+        current = _snapshot(config_path)
+
+        if current != snapshot:
+            changed_paths = sorted(path for path in current
+                                   if current[path] != snapshot.get(path))
+            snapshot = current
+            started = _timer()
+
+            try:
+                movie_count, rendered_count = state.rebuild(
+                    config_changed=config_path in changed_paths)
+            except (ConfigError, ConfigParserError, IOError, OSError,
+                    ValueError) as e:
+                if on_error is not None:
+                    on_error(e)
+            else:
+                if on_build is not None:
+                    on_build(RebuildReport(changed_paths, movie_count,
+                                           rendered_count, _timer() - started))
+
+        time.sleep(interval)
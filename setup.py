@@ -28,6 +28,8 @@ setup(
     ],
     packages=['fresh_tomatillos'],
     package_data={'': ['templates/*', 'static/*']},
+    extras_require={
+        'thumbnails': ['Pillow']},
     entry_points={
         'console_scripts': [
             'fresh_tomatillos = fresh_tomatillos.__main__:main']}